@@ -1,18 +1,74 @@
 #!/usr/bin/env python3
 # coding: utf-8
 
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from typing import Optional, List
-import subprocess
 import json
 import os
+import asyncio
 from datetime import datetime
 import uuid
 from enum import Enum
-from sqlalchemy import text
-app = FastAPI(title="API de Optimización Terminal")
+from functools import lru_cache
+import traceback
+import codecs
+import time
+import logging
+from contextlib import asynccontextmanager
+from pool_trabajadores import (
+    PoolTrabajadores, ejecutar_pipeline_en_trabajador, ejecutar_barrido_en_trabajador, ruta_log, eliminar_log,
+    eliminar_artefactos, resolver_turno_en_trabajador, resolver_semana_en_trabajador
+)
+from cola_trabajos import ColaTrabajos, Despachador
+import progreso
+import metricas
+from descargas import stream_zip, interpretar_rango, leer_rango
+from paginacion import HISTORIAL
+
+logger = logging.getLogger(__name__)
+
+# Cola de trabajos durable (SQLite): sobrevive reinicios, limita la
+# concurrencia (MAX_CONCURRENCIA) y deduplica solicitudes idénticas.
+cola = ColaTrabajos()
+
+# Pool de procesos persistente: los trabajos se despachan como llamadas
+# estructuradas a procesos que ya tienen pandas/pyomo/gurobipy importados.
+pool = PoolTrabajadores(max_trabajadores=cola.max_concurrencia)
+
+# Pool aparte para las resoluciones interactivas (un turno / una semana), de
+# modo que no esperen detrás de los trabajos largos de la cola.
+pool_interactivo = PoolTrabajadores(
+    max_trabajadores=int(os.getenv("POOL_INTERACTIVO", "1")), publicar_eventos=False
+)
+
+# Eventos de progreso por tarea en memoria acotada (ring buffer por tarea)
+buffer_eventos = progreso.BufferEventos()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(pool.iniciar)
+    await run_in_threadpool(pool_interactivo.iniciar)
+    receptor = progreso.ReceptorEventos(pool.eventos, buffer_eventos, _registrar_evento)
+    receptor.iniciar()
+    # El pool interactivo no publica progreso, solo métricas
+    receptor_interactivo = progreso.ReceptorEventos(pool_interactivo.eventos, buffer_eventos)
+    receptor_interactivo.iniciar()
+    despachador.iniciar()
+    purga = asyncio.create_task(_purgar_periodicamente())
+    yield
+    purga.cancel()
+    despachador.detener()
+    receptor.detener()
+    receptor_interactivo.detener()
+    await run_in_threadpool(pool_interactivo.cerrar)
+    await run_in_threadpool(pool.cerrar)
+
+app = FastAPI(title="API de Optimización Terminal", lifespan=lifespan)
 
 # Configurar CORS
 app.add_middleware(
@@ -23,12 +79,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class GZipSelectivo(GZipMiddleware):
+    """Comprime las respuestas excepto los streams SSE (deben llegar sin buffer) y las
+    descargas de resultados (ya comprimidas y con Range sobre los bytes originales)"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and (
+            scope["path"].endswith("/eventos") or scope["path"].startswith("/resultados/")
+        ):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(GZipSelectivo, minimum_size=1024)
+
 # Modelos de datos
 class EstadoOptimizacion(str, Enum):
     PENDIENTE = "pendiente"
     EJECUTANDO = "ejecutando"
     COMPLETADO = "completado"
     ERROR = "error"
+    CANCELADO = "cancelado"
 
 class SolicitudOptimizacion(BaseModel):
     anio: int
@@ -36,6 +107,32 @@ class SolicitudOptimizacion(BaseModel):
     criterio: str = "criterioII"
     semanas: Optional[List[str]] = None
     usar_db: bool = True
+    prioridad: int = 0
+    forzar: bool = False  # ignorar resultados en cache y resolver de nuevo
+
+class SolicitudBarrido(BaseModel):
+    anio: int
+    participaciones: List[int] = Field(min_length=1)
+    criterios: List[str] = Field(["criterioII"], min_length=1)
+    semanas: Optional[List[str]] = None
+    usar_db: bool = True
+    prioridad: int = 0
+    forzar: bool = False
+
+class SolicitudTurno(BaseModel):
+    semana: str
+    turno: int = Field(ge=1, le=21)
+    participacion: int
+    tiempo_limite: float = Field(10.0, gt=0, le=120)  # TimeLimit de Gurobi (s)
+    forzar: bool = False
+
+class SolicitudSemana(BaseModel):
+    semana: str
+    participacion: int
+    criterio: str = "criterioII"
+    anio: Optional[int] = None  # por defecto, el año ISO de la semana
+    tiempo_limite: float = Field(30.0, gt=0, le=600)
+    forzar: bool = False
 
 class RespuestaOptimizacion(BaseModel):
     id_tarea: str
@@ -52,136 +149,359 @@ class EstadoTarea(BaseModel):
     fecha_inicio: datetime
     fecha_fin: Optional[datetime] = None
 
-# Almacenamiento en memoria de tareas (en producción usar Redis o DB)
-tareas = {}
+# Sondeo del buffer en el stream SSE y cada cuánto enviar un comentario keep-alive
+INTERVALO_EVENTOS = 0.5
+INTERVALO_KEEPALIVE = 15
+
+# Función del pool que ejecuta cada tipo de trabajo de la cola
+FUNCIONES_TRABAJO = {
+    "pipeline": ejecutar_pipeline_en_trabajador,
+    "barrido": ejecutar_barrido_en_trabajador,
+}
 
-def ejecutar_optimizacion_async(id_tarea: str, solicitud: SolicitudOptimizacion):
-    """Ejecuta la optimización en segundo plano"""
+def _lanzar_trabajo(trabajo: dict):
+    """Despacha un trabajo de la cola al pool como llamada estructurada"""
+    trabajo["lanzado"] = time.monotonic()
+    funcion = FUNCIONES_TRABAJO[trabajo["tipo"]]
+    return pool.enviar(funcion, trabajo["id_tarea"], trabajo["parametros"], cola.ruta)
+
+def _medir_trabajo(trabajo: dict, estado: str):
+    metricas.contar("optimizacion_trabajos_total", estado=estado)
+    if "lanzado" in trabajo:
+        metricas.observar("optimizacion_trabajo_segundos", time.monotonic() - trabajo["lanzado"])
+
+def _completar_trabajo(trabajo: dict, futuro):
+    """Registra en la cola el resultado (o el error) de un trabajo terminado"""
+    id_tarea = trabajo["id_tarea"]
     try:
-        # Actualizar estado
-        tareas[id_tarea]["estado"] = EstadoOptimizacion.EJECUTANDO
-        tareas[id_tarea]["mensaje"] = "Iniciando optimización..."
-        
-        # Construir comando
-        cmd = ["python", "main_integrated.py"]
-        cmd.extend(["--anio", str(solicitud.anio)])
-        cmd.extend(["--participacion", str(solicitud.participacion)])
-        cmd.extend(["--criterio", solicitud.criterio])
-        
-        if solicitud.usar_db:
-            cmd.append("--usar-db")
-        
-        if solicitud.semanas:
-            cmd.extend(["--semanas"] + solicitud.semanas)
-        
-        # Ejecutar proceso
-        proceso = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd="/app"
-        )
-        
-        # Capturar salida
-        stdout, stderr = proceso.communicate()
-        
-        if proceso.returncode == 0:
-            # Éxito
-            tareas[id_tarea]["estado"] = EstadoOptimizacion.COMPLETADO
-            tareas[id_tarea]["mensaje"] = "Optimización completada exitosamente"
-            tareas[id_tarea]["resultado"] = {
-                "salida": stdout,
-                "codigo_retorno": proceso.returncode
-            }
-            
-            # Intentar parsear resultados específicos
-            try:
-                # Buscar líneas con información relevante
-                lines = stdout.split('\n')
-                for line in lines:
-                    if "Procesamiento OK" in line:
-                        tareas[id_tarea]["resultado"]["semanas_ok"] = int(line.split("=")[1].strip())
-                    elif "Semanas infactibles" in line:
-                        tareas[id_tarea]["resultado"]["semanas_infactibles"] = int(line.split("=")[1].strip())
-            except:
-                pass
-                
-        else:
-            # Error
-            tareas[id_tarea]["estado"] = EstadoOptimizacion.ERROR
-            tareas[id_tarea]["mensaje"] = "Error durante la optimización"
-            tareas[id_tarea]["error"] = stderr
-            
-        tareas[id_tarea]["fecha_fin"] = datetime.now()
-        
+        resumen = futuro.result()
     except Exception as e:
-        tareas[id_tarea]["estado"] = EstadoOptimizacion.ERROR
-        tareas[id_tarea]["mensaje"] = "Error inesperado"
-        tareas[id_tarea]["error"] = str(e)
-        tareas[id_tarea]["fecha_fin"] = datetime.now()
+        _medir_trabajo(trabajo, EstadoOptimizacion.ERROR.value)
+        cola.actualizar(
+            id_tarea,
+            estado=EstadoOptimizacion.ERROR.value,
+            mensaje="Error durante la optimización",
+            error="".join(traceback.format_exception(e)),
+            fecha_fin=datetime.now()
+        )
+        return
+
+    resultado = {
+        "semanas_ok": resumen["semanas_ok"],
+        "semanas_infactibles": resumen["semanas_infactibles"],
+        "turnos_resueltos": resumen["turnos_resueltos"],
+        "semanas": resumen["semanas_filtradas"],
+        "lista_infactibles": resumen["lista_infactibles"],
+        "tiempo_coloracion": resumen["tiempo_coloracion"],
+        "tiempo_gruas": resumen["tiempo_gruas"]
+    }
+    if "combinaciones" in resumen:
+        resultado["combinaciones"] = resumen["combinaciones"]
+    if resumen.get("cancelado"):
+        _medir_trabajo(trabajo, EstadoOptimizacion.CANCELADO.value)
+        cola.actualizar(
+            id_tarea,
+            estado=EstadoOptimizacion.CANCELADO.value,
+            mensaje="Optimización cancelada; resultados parciales guardados",
+            resultado=resultado,
+            artefactos=resumen.get("artefactos"),
+            fecha_fin=datetime.now()
+        )
+        return
+
+    _medir_trabajo(trabajo, EstadoOptimizacion.COMPLETADO.value)
+    cola.actualizar(
+        id_tarea,
+        estado=EstadoOptimizacion.COMPLETADO.value,
+        progreso=100,
+        mensaje="Optimización completada exitosamente",
+        resultado=resultado,
+        artefactos=resumen.get("artefactos"),
+        fecha_fin=datetime.now()
+    )
+
+despachador = Despachador(cola, _lanzar_trabajo, _completar_trabajo)
+
+def _describir_evento(evento: dict) -> str:
+    partes = [evento["tipo"].replace("_", " ")]
+    if evento.get("semana"):
+        partes.append(f"semana {evento['semana']}")
+    if evento.get("turno") is not None:
+        partes.append(f"turno {evento['turno']}")
+    if evento.get("gap") is not None:
+        partes.append(f"gap {evento['gap']:.2%}")
+    if evento.get("combinaciones"):
+        partes.append(f"combinación {evento.get('combinacion', 0) + 1}/{evento['combinaciones']} "
+                      f"({evento.get('criterio')}, participación {evento.get('participacion')})")
+    return ", ".join(partes)
+
+def _registrar_evento(evento: dict):
+    """Refleja en la cola el progreso y el último evento recibido de un trabajo"""
+    if evento["tipo"] in progreso.EVENTOS_FINALES:
+        # El estado final lo registra _completar_trabajo con el resultado del Future
+        return
+    campos = {"mensaje": _describir_evento(evento)}
+    porcentaje = progreso.porcentaje(evento)
+    if porcentaje is not None:
+        campos["progreso"] = porcentaje
+    cola.actualizar(evento["id_tarea"], **campos)
+
+def _leer_fragmento_log(id_tarea: str, desde: int, limite: int):
+    """Lee hasta `limite` bytes del log desde el offset `desde` sin cortar caracteres UTF-8"""
+    try:
+        with open(ruta_log(id_tarea), "rb") as f:
+            tamano = os.fstat(f.fileno()).st_size
+            f.seek(desde)
+            crudo = f.read(limite)
+    except FileNotFoundError:
+        return None
+    decodificador = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    contenido = decodificador.decode(crudo, final=len(crudo) < limite)
+    # Los bytes de un carácter incompleto al final quedan para el siguiente fragmento
+    hasta = desde + len(crudo) - len(decodificador.getstate()[0])
+    return {"desde": desde, "hasta": hasta, "tamano": tamano, "contenido": contenido,
+            "completo": hasta >= tamano}
+
+# Cada cuánto se purgan de la cola los trabajos terminados vencidos (s)
+INTERVALO_PURGA = 3600
+
+def _purgar_trabajos():
+    purgadas = cola.purgar()
+    for id_tarea in purgadas:
+        eliminar_log(id_tarea)
+        eliminar_artefactos(id_tarea)
+        buffer_eventos.eliminar(id_tarea)
+    return purgadas
+
+async def _purgar_periodicamente():
+    while True:
+        try:
+            await run_in_threadpool(_purgar_trabajos)
+        except Exception as e:
+            logger.error(f"Error purgando trabajos terminados: {e}")
+        await asyncio.sleep(INTERVALO_PURGA)
 
 @app.get("/")
 async def root():
     return {"mensaje": "API de Optimización Terminal - Activa"}
 
-@app.post("/optimizar", response_model=RespuestaOptimizacion)
-async def iniciar_optimizacion(
-    solicitud: SolicitudOptimizacion,
-    background_tasks: BackgroundTasks
-):
-    """Inicia una nueva tarea de optimización"""
-    # Generar ID único
-    id_tarea = str(uuid.uuid4())
-    
-    # Crear registro de tarea
-    tareas[id_tarea] = {
-        "id_tarea": id_tarea,
-        "estado": EstadoOptimizacion.PENDIENTE,
-        "progreso": 0,
-        "mensaje": "Tarea en cola",
-        "resultado": None,
-        "error": None,
-        "fecha_inicio": datetime.now(),
-        "fecha_fin": None,
-        "parametros": solicitud.dict()
-    }
+async def _encolar(tipo: str, solicitud: BaseModel):
+    parametros = solicitud.dict()
+    prioridad = parametros.pop("prioridad")
+    id_tarea, nueva = await run_in_threadpool(
+        cola.encolar, str(uuid.uuid4()), tipo, parametros, prioridad
+    )
     
-    # Ejecutar en segundo plano
-    background_tasks.add_task(ejecutar_optimizacion_async, id_tarea, solicitud)
+    if not nueva:
+        trabajo = await run_in_threadpool(cola.obtener, id_tarea)
+        return RespuestaOptimizacion(
+            id_tarea=id_tarea,
+            estado=trabajo["estado"],
+            mensaje="Ya existe una tarea idéntica en curso; se devuelve la existente"
+        )
     
+    despachador.notificar()
     return RespuestaOptimizacion(
         id_tarea=id_tarea,
         estado=EstadoOptimizacion.PENDIENTE,
-        mensaje="Tarea de optimización iniciada"
+        mensaje="Tarea de optimización encolada"
+    )
+
+@app.post("/optimizar", response_model=RespuestaOptimizacion)
+async def iniciar_optimizacion(solicitud: SolicitudOptimizacion):
+    """Encola una nueva tarea de optimización (o se asocia a una idéntica en curso)"""
+    return await _encolar("pipeline", solicitud)
+
+@app.post("/optimizar/barrido", response_model=RespuestaOptimizacion)
+async def iniciar_barrido(solicitud: SolicitudBarrido):
+    """Encola un barrido sobre participaciones × criterios. Las etapas que no dependen
+    de la participación se calculan una vez por semana; el resultado de la tarea
+    incluye la tabla comparativa en `combinaciones`."""
+    return await _encolar("barrido", solicitud)
+
+# Margen sobre el TimeLimit del solver para leer la instancia, construir el
+# modelo y escribir resultados antes de responder 504
+MARGEN_RESPUESTA = 30
+
+async def _resolver_interactivo(presupuesto: float, funcion, *args, **kwargs):
+    """Ejecuta una resolución corta en el pool interactivo y espera su resultado"""
+    futuro = pool_interactivo.enviar(funcion, *args, **kwargs)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(futuro), presupuesto + MARGEN_RESPUESTA)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="La resolución excedió el tiempo máximo")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/optimizar/turno")
+async def optimizar_turno(solicitud: SolicitudTurno):
+    """Resuelve un único turno de grúas de forma síncrona y devuelve el plan"""
+    return await _resolver_interactivo(
+        solicitud.tiempo_limite, resolver_turno_en_trabajador,
+        solicitud.semana, f"{solicitud.turno:02d}", solicitud.participacion,
+        tiempo_limite=solicitud.tiempo_limite, forzar=solicitud.forzar
+    )
+
+@app.post("/optimizar/semana")
+async def optimizar_semana(solicitud: SolicitudSemana):
+    """Resuelve la coloración de una semana de forma síncrona y devuelve el plan de patio"""
+    try:
+        datetime.strptime(solicitud.semana, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="semana debe tener formato YYYY-MM-DD")
+    return await _resolver_interactivo(
+        solicitud.tiempo_limite, resolver_semana_en_trabajador,
+        solicitud.semana, solicitud.participacion, solicitud.criterio,
+        anio=solicitud.anio, tiempo_limite=solicitud.tiempo_limite, forzar=solicitud.forzar
     )
 
 @app.get("/tarea/{id_tarea}", response_model=EstadoTarea)
 async def obtener_estado_tarea(id_tarea: str):
     """Obtiene el estado de una tarea de optimización"""
-    if id_tarea not in tareas:
+    trabajo = await run_in_threadpool(cola.obtener, id_tarea)
+    if trabajo is None:
         raise HTTPException(status_code=404, detail="Tarea no encontrada")
     
-    return EstadoTarea(**tareas[id_tarea])
+    return EstadoTarea(**trabajo)
+
+@app.get("/tarea/{id_tarea}/eventos")
+async def eventos_tarea(id_tarea: str, request: Request, desde: int = 0):
+    """Stream Server-Sent Events con el progreso de la tarea (reanudable con Last-Event-ID)"""
+    if await run_in_threadpool(cola.obtener, id_tarea) is None:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    try:
+        ultimo_id = int(request.headers.get("last-event-id", desde))
+    except ValueError:
+        # Cabecera malformada (p.ej. de un proxy): se reanuda desde `desde`
+        ultimo_id = desde
+
+    async def generar():
+        nonlocal ultimo_id
+        vacios_tras_fin = 0
+        ultimo_envio = asyncio.get_running_loop().time()
+        while not await request.is_disconnected():
+            nuevos = buffer_eventos.desde(id_tarea, ultimo_id)
+            for evento in nuevos:
+                ultimo_id = evento["id"]
+                yield f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {json.dumps(evento, default=str)}\n\n"
+            if any(e["tipo"] in progreso.EVENTOS_FINALES for e in nuevos):
+                return
+            ahora = asyncio.get_running_loop().time()
+            if nuevos:
+                ultimo_envio = ahora
+                vacios_tras_fin = 0
+            else:
+                # Sin eventos nuevos: cerrar si la tarea ya terminó (se deja una
+                # vuelta de margen para los eventos que aún estén en tránsito)
+                trabajo = await run_in_threadpool(cola.obtener, id_tarea)
+                if trabajo is None or trabajo["estado"] not in (
+                    EstadoOptimizacion.PENDIENTE, EstadoOptimizacion.EJECUTANDO
+                ):
+                    vacios_tras_fin += 1
+                    if vacios_tras_fin > 1:
+                        return
+                elif ahora - ultimo_envio > INTERVALO_KEEPALIVE:
+                    ultimo_envio = ahora
+                    yield ": keep-alive\n\n"
+            await asyncio.sleep(INTERVALO_EVENTOS)
+
+    return StreamingResponse(
+        generar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/tarea/{id_tarea}/logs")
+async def logs_tarea(
+    id_tarea: str,
+    desde: int = Query(0, ge=0),
+    limite: int = Query(64 * 1024, ge=1, le=1024 * 1024)
+):
+    """Fragmento del log de la tarea (offsets en bytes; pedir de nuevo desde `hasta`)"""
+    if await run_in_threadpool(cola.obtener, id_tarea) is None:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    fragmento = await run_in_threadpool(_leer_fragmento_log, id_tarea, desde, limite)
+    if fragmento is None:
+        return {"desde": desde, "hasta": desde, "tamano": 0, "contenido": "", "completo": True}
+    return fragmento
 
 @app.get("/tareas")
-async def listar_tareas():
-    """Lista todas las tareas de optimización"""
+async def listar_tareas(
+    estado: Optional[EstadoOptimizacion] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(50, ge=1, le=500)
+):
+    """Lista paginada de tareas (resúmenes sin logs ni resultados), las más recientes primero"""
+    try:
+        return await run_in_threadpool(
+            cola.listar, estado.value if estado else None, cursor, limite
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/cola")
+async def estado_cola():
+    """Resumen de la cola: pendientes, en ejecución y concurrencia máxima"""
+    pendientes = await run_in_threadpool(cola.contar, EstadoOptimizacion.PENDIENTE.value)
+    ejecutando = await run_in_threadpool(cola.contar, EstadoOptimizacion.EJECUTANDO.value)
     return {
-        "tareas": list(tareas.values()),
-        "total": len(tareas)
+        "pendientes": pendientes,
+        "ejecutando": ejecutando,
+        "max_concurrencia": cola.max_concurrencia
     }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metricas_prometheus():
+    """Métricas en formato de exposición de Prometheus (cola, duración por etapa,
+    estados del solver y throughput de semanas/turnos)"""
+    pendientes = await run_in_threadpool(cola.contar, EstadoOptimizacion.PENDIENTE.value)
+    ejecutando = await run_in_threadpool(cola.contar, EstadoOptimizacion.EJECUTANDO.value)
+    metricas.registro.fijar("optimizacion_cola_pendientes", pendientes)
+    metricas.registro.fijar("optimizacion_cola_ejecutando", ejecutando)
+    metricas.registro.fijar("optimizacion_cola_max_concurrencia", cola.max_concurrencia)
+    return PlainTextResponse(metricas.registro.exponer(),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ---------------------------------------------------------------------------
+# Acceso a base de datos
+# ---------------------------------------------------------------------------
+# SQLAlchemy es síncrono: todas las consultas se ejecutan en el threadpool
+# (run_in_threadpool) para no bloquear el event loop, y se comparte un único
+# engine (con su pool de conexiones) entre requests. SQLAlchemy y
+# db_integration se importan en el primer uso y no al arrancar la API
+# (ver benchmarks/bench_arranque.py).
+
+@lru_cache(maxsize=1)
+def obtener_db():
+    """Instancia compartida de DatabaseIntegration (se crea en el primer uso)"""
+    from db_integration import DatabaseIntegration
+    return DatabaseIntegration()
+
+def _consultar_version_db():
+    from sqlalchemy import text
+    with obtener_db().engine.connect() as conn:
+        return conn.execute(text("SELECT version()")).scalar()
+
+def _listar_tablas_db(patron: str = "%"):
+    from sqlalchemy import text
+    with obtener_db().engine.connect() as conn:
+        result = conn.execute(text("""
+            SELECT table_name 
+            FROM information_schema.tables 
+            WHERE table_schema = 'public'
+            AND table_name LIKE :patron
+            ORDER BY table_name
+        """), {"patron": patron})
+        return [row[0] for row in result]
+
+def _listar_historial_db(recurso: str, **filtros):
+    return obtener_db().listar_historial(recurso, **filtros)
+
 @app.get("/db/status")
 async def verificar_conexion_db():
     """Verifica el estado de la conexión a PostgreSQL"""
     try:
-        from db_integration import DatabaseIntegration
-        db = DatabaseIntegration()
-        
-        # Intentar una consulta simple
-        with db.engine.connect() as conn:
-            result = conn.execute(text("SELECT version()"))
-            version = result.scalar()
+        version = await run_in_threadpool(_consultar_version_db)
             
         return {
             "estado": "conectado",
@@ -203,18 +523,7 @@ async def verificar_conexion_db():
 async def verificar_tablas():
     """Lista TODAS las tablas en la base de datos"""
     try:
-        from db_integration import DatabaseIntegration
-        db = DatabaseIntegration()
-        
-        with db.engine.connect() as conn:
-            # Mostrar TODAS las tablas públicas
-            result = conn.execute(text("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public'
-                ORDER BY table_name
-            """))
-            tables = [row[0] for row in result]
+        tables = await run_in_threadpool(_listar_tablas_db)
             
         return {
             "estado": "ok",
@@ -232,18 +541,7 @@ async def verificar_tablas():
 async def verificar_tablas_optimization():
     """Lista solo las tablas de optimización"""
     try:
-        from db_integration import DatabaseIntegration
-        db = DatabaseIntegration()
-        
-        with db.engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name LIKE 'optimization_%'
-                ORDER BY table_name
-            """))
-            tables = [row[0] for row in result]
+        tables = await run_in_threadpool(_listar_tablas_db, "optimization_%")
             
         return {
             "estado": "ok",
@@ -258,34 +556,130 @@ async def verificar_tablas_optimization():
         }
         
         
+@app.post("/tarea/{id_tarea}/cancelar", response_model=RespuestaOptimizacion)
+async def cancelar_tarea(id_tarea: str):
+    """Cancela una tarea: si está en cola no se ejecuta; si está ejecutando se interrumpe el solver"""
+    estado = await run_in_threadpool(cola.cancelar, id_tarea)
+    if estado is None:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+
+    if estado == EstadoOptimizacion.EJECUTANDO:
+        mensaje = "Cancelación solicitada; la tarea se detendrá y guardará sus resultados parciales"
+    elif estado == EstadoOptimizacion.CANCELADO:
+        mensaje = "Tarea cancelada"
+    else:
+        mensaje = "La tarea ya había terminado"
+    return RespuestaOptimizacion(id_tarea=id_tarea, estado=estado, mensaje=mensaje)
+
 @app.delete("/tarea/{id_tarea}")
 async def eliminar_tarea(id_tarea: str):
-    """Elimina una tarea del registro"""
-    if id_tarea not in tareas:
+    """Elimina una tarea del registro (cancelándola antes si sigue activa).
+
+    Una tarea en ejecución no se elimina hasta que su proceso se detenga: se
+    pide la cancelación y se responde 409.
+    """
+    estado = await run_in_threadpool(cola.cancelar, id_tarea)
+    if estado == EstadoOptimizacion.EJECUTANDO:
+        raise HTTPException(status_code=409, detail="La tarea se está ejecutando; se solicitó su cancelación. "
+                                                    "Elimínela cuando termine")
+    if estado is None or not await run_in_threadpool(cola.eliminar, id_tarea):
         raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    buffer_eventos.eliminar(id_tarea)
+    await run_in_threadpool(eliminar_log, id_tarea)
+    await run_in_threadpool(eliminar_artefactos, id_tarea)
     
-    del tareas[id_tarea]
     return {"mensaje": "Tarea eliminada"}
 
-@app.get("/resultados/{id_tarea}/excel")
-async def descargar_resultados_excel(id_tarea: str):
-    """Descarga los resultados en formato Excel"""
-    if id_tarea not in tareas:
+async def _artefactos_tarea(id_tarea: str):
+    """Archivos de resultados de una tarea terminada (completada o cancelada con parciales)"""
+    tarea = await run_in_threadpool(cola.obtener, id_tarea)
+    if tarea is None:
         raise HTTPException(status_code=404, detail="Tarea no encontrada")
     
-    tarea = tareas[id_tarea]
-    if tarea["estado"] != EstadoOptimizacion.COMPLETADO:
+    if tarea["estado"] not in (EstadoOptimizacion.COMPLETADO, EstadoOptimizacion.CANCELADO):
         raise HTTPException(status_code=400, detail="La tarea no ha completado")
     
-    # Aquí podrías generar y devolver el archivo Excel
-    # Por ahora, devolvemos la ruta donde se guardaron los resultados
-    return {
-        "mensaje": "Resultados disponibles",
-        "rutas": {
-            "semanas_filtradas": "/app/resultados_generados/semanas_filtradas.csv",
-            "semanas_infactibles": "/app/resultados_generados/semanas_infactibles.csv"
-        }
+    # Los archivos que registró el trabajador al terminar (no se deducen de los
+    # parámetros: otro trabajo pudo dejar archivos con los mismos nombres)
+    return await run_in_threadpool(_artefactos_existentes, tarea["artefactos"])
+
+def _artefactos_existentes(artefactos):
+    return [(nombre, ruta) for nombre, ruta in artefactos if os.path.isfile(ruta)]
+
+def _describir_archivos(artefactos):
+    return [{"nombre": nombre, "tamano": os.path.getsize(ruta)} for nombre, ruta in artefactos]
+
+@app.get("/resultados/{id_tarea}/archivos")
+async def listar_resultados(id_tarea: str):
+    """Lista los archivos de resultados de la tarea"""
+    artefactos = await _artefactos_tarea(id_tarea)
+    archivos = await run_in_threadpool(_describir_archivos, artefactos)
+    return {"archivos": archivos, "total": len(artefactos)}
+
+@app.get("/resultados/{id_tarea}/excel")
+async def descargar_resultados_excel(id_tarea: str):
+    """Descarga todos los Excel de resultados de la tarea como un zip generado al vuelo"""
+    artefactos = await _artefactos_tarea(id_tarea)
+    if not artefactos:
+        raise HTTPException(status_code=404, detail="La tarea no tiene archivos de resultados")
+    
+    return StreamingResponse(
+        stream_zip(artefactos),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="resultados_{id_tarea}.zip"'}
+    )
+
+@app.get("/resultados/{id_tarea}/archivos/{nombre:path}")
+async def descargar_resultado(id_tarea: str, nombre: str, request: Request):
+    """Descarga un archivo de resultados (admite Range de un tramo para reanudar descargas)"""
+    rutas = dict(await _artefactos_tarea(id_tarea))
+    if nombre not in rutas:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    ruta = rutas[nombre]
+    tamano = await run_in_threadpool(os.path.getsize, ruta)
+    cabeceras = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{os.path.basename(nombre)}"'
     }
+    try:
+        rango = interpretar_rango(request.headers.get("range"), tamano)
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Rango no satisfacible",
+                            headers={"Content-Range": f"bytes */{tamano}"})
+
+    inicio, fin = rango if rango else (0, tamano - 1)
+    cabeceras["Content-Length"] = str(fin - inicio + 1)
+    if rango:
+        cabeceras["Content-Range"] = f"bytes {inicio}-{fin}/{tamano}"
+    return StreamingResponse(
+        leer_rango(ruta, inicio, fin),
+        status_code=206 if rango else 200,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers=cabeceras
+    )
+
+@app.get("/historial/{recurso}")
+async def obtener_historial(
+    recurso: str,
+    anio: Optional[int] = None,
+    semana_desde: Optional[str] = None,
+    semana_hasta: Optional[str] = None,
+    participacion: Optional[int] = None,
+    turno: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(100, ge=1, le=1000)
+):
+    """Historial paginado (keyset) de corridas y resultados con filtros en servidor"""
+    if recurso not in HISTORIAL:
+        raise HTTPException(status_code=404, detail=f"Recurso no encontrado. Disponibles: {list(HISTORIAL)}")
+
+    try:
+        return await run_in_threadpool(
+            _listar_historial_db, recurso, anio=anio, semana_desde=semana_desde, semana_hasta=semana_hasta,
+            participacion=participacion, turno=turno, cursor=cursor, limite=limite
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/parametros/disponibles")
 async def obtener_parametros_disponibles():
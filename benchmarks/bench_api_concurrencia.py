@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Prueba de carga: latencia de los endpoints de estado mientras corren consultas
+pesadas a la base de datos.
+
+Lanza en paralelo consultas a /historial/gruas (con una latencia artificial por
+consulta inyectada en el engine) mientras se sondea /tarea/{id} y /. Con las
+consultas en el threadpool la latencia de estado se mantiene en milisegundos;
+con --sin-offload se reproduce el comportamiento anterior (consultas en el
+event loop) para comparar.
+
+Uso:
+    python benchmarks/bench_api_concurrencia.py --consultas 20 --latencia-db 0.5
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+from sqlalchemy import event
+
+import api_optimization
+from db_integration import DatabaseIntegration
+from cola_trabajos import ColaTrabajos
+from bench_exportacion import generar_dataset
+
+
+async def sondear(cliente, rutas, detener, latencias, intervalo=0.02):
+    """Sondea cada `intervalo` s; la latencia se mide desde el instante programado"""
+    programado = time.perf_counter()
+    while True:
+        for ruta in rutas:
+            respuesta = await cliente.get(ruta)
+            respuesta.raise_for_status()
+            latencias.append(time.perf_counter() - programado)
+        if detener.is_set():
+            break
+        programado += intervalo
+        await asyncio.sleep(max(0.0, programado - time.perf_counter()))
+
+
+async def consulta_pesada(cliente, duraciones):
+    inicio = time.perf_counter()
+    respuesta = await cliente.get("/historial/gruas", params={"limite": 500})
+    respuesta.raise_for_status()
+    duraciones.append(time.perf_counter() - inicio)
+
+
+async def ejecutar(args):
+    id_tarea, _ = api_optimization.cola.encolar("bench", "pipeline", {"bench": True})
+
+    transporte = httpx.ASGITransport(app=api_optimization.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        detener = asyncio.Event()
+        latencias, duraciones = [], []
+        sondeo = asyncio.create_task(
+            sondear(cliente, [f"/tarea/{id_tarea}", "/"], detener, latencias)
+        )
+        await asyncio.sleep(0.2)
+        inicio = time.perf_counter()
+        await asyncio.gather(*[consulta_pesada(cliente, duraciones) for _ in range(args.consultas)])
+        total = time.perf_counter() - inicio
+        detener.set()
+        await sondeo
+
+    latencias.sort()
+    p95 = latencias[int(len(latencias) * 0.95) - 1]
+    print(f"Consultas pesadas: {args.consultas} en {total:.2f}s "
+          f"(media {statistics.mean(duraciones):.2f}s por consulta)")
+    print(f"Endpoints de estado: {len(latencias)} requests  "
+          f"p50={statistics.median(latencias) * 1000:.1f}ms  p95={p95 * 1000:.1f}ms  "
+          f"max={latencias[-1] * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API con consultas lentas")
+    parser.add_argument("--consultas", type=int, default=20, help="Consultas pesadas concurrentes")
+    parser.add_argument("--latencia-db", type=float, default=0.5, help="Segundos añadidos a cada consulta")
+    parser.add_argument("--sin-offload", action="store_true",
+                        help="Ejecutar las consultas en el event loop (comportamiento anterior)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db = DatabaseIntegration(db_url=url)
+        generar_dataset(db.engine, 1, 10)
+
+        @event.listens_for(db.engine, "before_cursor_execute")
+        def _consulta_lenta(*_):
+            time.sleep(args.latencia_db)
+
+        api_optimization.obtener_db = lambda: db
+        api_optimization.cola = ColaTrabajos(ruta=os.path.join(tmp, "cola.sqlite3"))
+        if args.sin_offload:
+            async def en_el_loop(funcion, *a, **k):
+                return funcion(*a, **k)
+            api_optimization.run_in_threadpool = en_el_loop
+
+        asyncio.run(ejecutar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Tiempo de arranque de la API medido con `python -X importtime`.
+
+Importa api_optimization en un intérprete limpio, suma el tiempo acumulado de
+sus imports y verifica que ningún módulo pesado del solver (pandas, pyomo,
+gurobipy, ...) ni SQLAlchemy se cargue en el proceso de la API: esos se
+importan en los trabajadores del pool o en el primer acceso a la base de datos.
+También mide el costo de import que paga el primer request a un endpoint de DB.
+
+Sale con código 1 si se excede el presupuesto o se importa un módulo prohibido,
+de modo que puede usarse como chequeo (`make test-arranque`).
+
+Uso:
+    python benchmarks/bench_arranque.py --repeticiones 5 --presupuesto-ms 1500
+"""
+
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# No deben importarse al arrancar la API
+MODULOS_PROHIBIDOS = ["pandas", "numpy", "pyomo", "gurobipy", "openpyxl", "sqlalchemy", "db_integration"]
+
+LINEA_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def medir_imports(codigo):
+    """{modulo: (propio_us, acumulado_us)} de todos los imports que hace `codigo` en un intérprete limpio"""
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True
+    )
+    modulos = {}
+    for linea in proceso.stderr.splitlines():
+        coincidencia = LINEA_IMPORTTIME.match(linea)
+        if coincidencia:
+            propio, acumulado, _, modulo = coincidencia.groups()
+            modulos[modulo] = (int(propio), int(acumulado))
+    return modulos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque de la API (importtime)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--presupuesto-ms", type=float,
+                        default=float(os.getenv("PRESUPUESTO_ARRANQUE_MS", "1500")),
+                        help="Mediana máxima aceptada para importar api_optimization")
+    parser.add_argument("--top", type=int, default=10, help="Módulos más costosos a mostrar")
+    args = parser.parse_args()
+
+    totales, ultimo = [], {}
+    for _ in range(args.repeticiones):
+        ultimo = medir_imports("import api_optimization")
+        totales.append(ultimo["api_optimization"][1] / 1000)
+    mediana = statistics.median(totales)
+
+    print(f"Arranque (import api_optimization), {args.repeticiones} repeticiones:")
+    print(f"  mediana {mediana:.0f} ms   min {min(totales):.0f} ms   max {max(totales):.0f} ms"
+          f"   presupuesto {args.presupuesto_ms:.0f} ms")
+
+    print("\nMódulos con mayor tiempo propio (última repetición):")
+    for modulo, (propio, acumulado) in sorted(ultimo.items(), key=lambda m: -m[1][0])[:args.top]:
+        print(f"  {modulo:<45} propio {propio / 1000:7.1f} ms   acumulado {acumulado / 1000:7.1f} ms")
+
+    # Costo de import que paga el primer request a un endpoint de base de datos
+    con_db = medir_imports("import api_optimization; import db_integration")
+    if "db_integration" in con_db:
+        print(f"\nPrimer request a /db/* o /historial: +{con_db['db_integration'][1] / 1000:.0f} ms de imports "
+              "(una sola vez por proceso)")
+
+    prohibidos = [m for m in MODULOS_PROHIBIDOS if m in ultimo]
+    fallas = []
+    if prohibidos:
+        fallas.append(f"la API importa al arrancar: {', '.join(prohibidos)}")
+    if mediana > args.presupuesto_ms:
+        fallas.append(f"arranque {mediana:.0f} ms > presupuesto {args.presupuesto_ms:.0f} ms")
+
+    if fallas:
+        print("\nFALLA: " + "; ".join(fallas))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
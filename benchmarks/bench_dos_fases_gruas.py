@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Modelo de grúas completo vs resolución en dos fases (MODO_GRUAS=dos_fases).
+
+Para cada turno de la semana incluida en el repositorio resuelve el modelo
+completo (grúas individuales) y el esquema en dos fases (modelo agregado por
+bloque + asignación de tramos a grúas), con el mismo límite de tiempo, y
+reporta el tiempo total (construcción + resolución), el estado, min_diff_val y
+si el esquema en dos fases tuvo que recurrir al modelo completo.
+
+Uso:
+    python benchmarks/bench_dos_fases_gruas.py --backend highs --tiempo-limite 15
+    python benchmarks/bench_dos_fases_gruas.py --turnos 1 2 3 --csv dos_fases.csv
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+
+import solvers
+from bench_solvers import instancias_gruas, SEMANA
+from modelo_gruas_maxmin import construir_modelo_gruas, OPCIONES_SOLVER, ESTADOS_TERMINACION
+from modelo_gruas_agregado import resolver_dos_fases
+
+TURNOS_SEMANA = list(range(1, 22))
+
+
+def completo(datos, opciones):
+    inicio = time.perf_counter()
+    m = construir_modelo_gruas(datos)
+    resolutor = solvers.Resolutor(m, opciones)
+    res = resolutor.resolver()
+    min_diff = None
+    if resolutor.hay_solucion(res):
+        resolutor.cargar_solucion(res)
+        min_diff = m.min_diff_val.value
+    terminacion = res.solver.termination_condition
+    return {
+        "modo": "completo",
+        "total_s": round(time.perf_counter() - inicio, 3),
+        "estado": ESTADOS_TERMINACION.get(terminacion, str(terminacion)),
+        "min_diff_val": min_diff,
+        "respaldo": False,
+    }
+
+
+def dos_fases(datos, opciones):
+    inicio = time.perf_counter()
+    solucion = resolver_dos_fases(datos, opciones)
+    if solucion is None:
+        fila = completo(datos, opciones)
+        fila.update(modo="dos_fases", total_s=round(time.perf_counter() - inicio, 3), respaldo=True)
+        return fila
+    m, estado, _, _ = solucion
+    return {
+        "modo": "dos_fases",
+        "total_s": round(time.perf_counter() - inicio, 3),
+        "estado": estado,
+        "min_diff_val": m.min_diff_val.value,
+        "respaldo": False,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Modelo de grúas completo vs dos fases")
+    parser.add_argument("--backend", choices=list(solvers.BACKENDS), default=solvers.BACKEND)
+    parser.add_argument("--turnos", type=int, nargs="+", default=TURNOS_SEMANA)
+    parser.add_argument("--tiempo-limite", type=float, default=OPCIONES_SOLVER["TimeLimit"])
+    parser.add_argument("--csv", help="Guardar la tabla por turno en este archivo")
+    args = parser.parse_args()
+    logging.getLogger("pyomo.contrib.appsi").setLevel(logging.WARNING)
+
+    if args.backend not in solvers.backends_disponibles():
+        sys.exit(f"El backend {args.backend} no está disponible en esta máquina")
+    # Resolutor toma el backend del módulo
+    solvers.BACKEND = args.backend
+    opciones = {k: v for k, v in OPCIONES_SOLVER.items() if k != "LogToConsole"}
+    opciones["TimeLimit"] = args.tiempo_limite
+
+    with tempfile.TemporaryDirectory() as directorio:
+        instancias = instancias_gruas(directorio, args.turnos)
+
+    filas = []
+    for turno, datos in instancias.items():
+        for modo in (completo, dos_fases):
+            filas.append({"turno": turno, **modo(datos, opciones)})
+            print(filas[-1])
+
+    tabla = pd.DataFrame(filas)
+    print(f"\nSemana {SEMANA}, backend {args.backend}, límite {args.tiempo_limite:g}s")
+    print(tabla.to_string(index=False))
+
+    resumen = tabla.groupby("modo", sort=False).agg(
+        total_medio_s=("total_s", "mean"),
+        total_s=("total_s", "sum"),
+        optimos=("estado", lambda e: int((e == "optimo").sum())),
+        min_diff_total=("min_diff_val", "sum"),
+        respaldos=("respaldo", "sum"),
+    )
+    print("\nResumen por modo:")
+    print(resumen.round(3).to_string())
+    if args.csv:
+        tabla.to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Sobrecosto por resolución de Gurobi según cómo se manejan entorno y solver.
+
+Resuelve N veces un modelo pequeño (mochila con --variables binarias), de modo
+que el tiempo medido sea casi todo sobrecosto y no búsqueda, con tres esquemas:
+
+  env_por_resolucion     un gurobipy.Env nuevo (arranque + licencia) y un solver
+                         persistente nuevo en cada resolución
+  solver_por_resolucion  un solver persistente nuevo por resolución sobre el
+                         entorno por defecto (esquema anterior de solvers.Resolutor)
+  compartido             solvers.Resolutor: un Env y un solver persistente por
+                         proceso, reutilizados por todas las resoluciones
+
+Reporta la mediana y el p95 por resolución, incluyendo la creación del solver,
+la carga del modelo y la resolución. Requiere gurobipy con licencia.
+
+Uso:
+    python benchmarks/bench_entorno_gurobi.py --resoluciones 50 --variables 30
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import numpy as np
+from pyomo.environ import (ConcreteModel, Var, Objective, Constraint, Binary, RangeSet,
+                           SolverFactory, maximize)
+
+import solvers
+import entorno_gurobi
+
+OPCIONES = {"OutputFlag": 0, "Threads": 1}
+
+
+def modelo_mochila(n, semilla):
+    rng = np.random.default_rng(semilla)
+    valor = rng.integers(1, 100, n)
+    peso = rng.integers(1, 50, n)
+    m = ConcreteModel()
+    m.I = RangeSet(0, n - 1)
+    m.x = Var(m.I, domain=Binary)
+    m.obj = Objective(expr=sum(int(valor[i]) * m.x[i] for i in m.I), sense=maximize)
+    m.capacidad = Constraint(expr=sum(int(peso[i]) * m.x[i] for i in m.I) <= int(peso.sum()) // 2)
+    return m
+
+
+def env_por_resolucion(modelo):
+    solver = SolverFactory("gurobi_persistent", manage_env=True)
+    try:
+        solver.set_instance(modelo)
+        solver.options.update(OPCIONES)
+        solver.solve(load_solutions=False, save_results=False)
+    finally:
+        solver.close()
+
+
+def solver_por_resolucion(modelo):
+    solver = SolverFactory("gurobi_persistent")
+    solver.set_instance(modelo)
+    solver.options.update(OPCIONES)
+    solver.solve(load_solutions=False, save_results=False)
+
+
+def compartido(modelo):
+    solvers.Resolutor(modelo, OPCIONES, backend="gurobi").resolver()
+
+
+ESQUEMAS = {
+    "env_por_resolucion": env_por_resolucion,
+    "solver_por_resolucion": solver_por_resolucion,
+    "compartido": compartido,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sobrecosto por resolución de Gurobi")
+    parser.add_argument("--resoluciones", type=int, default=50)
+    parser.add_argument("--variables", type=int, default=30)
+    parser.add_argument("--esquemas", nargs="+", choices=list(ESQUEMAS), default=list(ESQUEMAS))
+    args = parser.parse_args()
+
+    if "gurobi" not in solvers.backends_disponibles():
+        sys.exit("gurobipy no está disponible (o no hay licencia): no se puede medir")
+
+    modelos = [modelo_mochila(args.variables, semilla) for semilla in range(args.resoluciones)]
+    # Primera resolución fuera de la medición (imports, entorno por defecto)
+    entorno_gurobi.calentar()
+    compartido(modelos[0])
+
+    print(f"{args.resoluciones} resoluciones, mochila de {args.variables} variables")
+    base = None
+    for nombre in args.esquemas:
+        tiempos = []
+        for modelo in modelos:
+            inicio = time.perf_counter()
+            ESQUEMAS[nombre](modelo)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        mediana = statistics.median(tiempos)
+        p95 = statistics.quantiles(tiempos, n=20)[-1] if len(tiempos) > 1 else tiempos[0]
+        base = base or mediana
+        print(f"  {nombre:<22} mediana {mediana:8.2f} ms   p95 {p95:8.2f} ms   "
+              f"({mediana / base:.2f}x respecto de {args.esquemas[0]})")
+
+    entorno_gurobi.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Filas de exclusividad del modelo de grúas (EXCLUSIVIDAD_GRUAS): completa vs
+cliques vs perezosa.
+
+Para cada turno de la semana incluida en el repositorio construye y resuelve el
+modelo completo con cada modo y el mismo límite de tiempo, y reporta las filas
+entregadas al solver (total y de excl + alpha_nosolapa), las filas perezosas
+agregadas por el callback, el tiempo de resolución, el estado y min_diff_val.
+
+El modo perezosa separa las filas en un callback de Gurobi, así que solo se
+mide con --backend gurobi; con otro backend se omite.
+
+Uso:
+    python benchmarks/bench_exclusividad_gruas.py --backend gurobi --tiempo-limite 15
+    python benchmarks/bench_exclusividad_gruas.py --backend highs --modos completa cliques --turnos 1 2 3
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+from pyomo.environ import Constraint
+
+import solvers
+from bench_solvers import instancias_gruas, SEMANA
+from modelo_gruas_maxmin import (
+    construir_modelo_gruas, callback_exclusividad, MODOS_EXCLUSIVIDAD, OPCIONES_SOLVER, ESTADOS_TERMINACION
+)
+
+TURNOS_SEMANA = list(range(1, 22))
+
+
+def filas(m):
+    return sum(1 for _ in m.component_data_objects(Constraint, active=True))
+
+
+def resolver(datos, modo, opciones):
+    inicio = time.perf_counter()
+    m = construir_modelo_gruas(datos, exclusividad=modo)
+    construccion = time.perf_counter() - inicio
+    filas_iniciales = filas(m)
+    filas_exclusividad = len(m.excl) + len(m.alpha_nosolapa)
+
+    callback = None
+    if modo == "perezosa":
+        opciones = {**opciones, "LazyConstraints": 1}
+        callback = callback_exclusividad(m)
+    resolutor = solvers.Resolutor(m, opciones, callback=callback)
+    inicio = time.perf_counter()
+    res = resolutor.resolver()
+    resolucion = time.perf_counter() - inicio
+    min_diff = None
+    if resolutor.hay_solucion(res):
+        resolutor.cargar_solucion(res)
+        min_diff = m.min_diff_val.value
+    terminacion = res.solver.termination_condition
+    return {
+        "modo": modo,
+        "construccion_s": round(construccion, 3),
+        "filas": filas_iniciales,
+        "filas_exclusividad": filas_exclusividad,
+        "perezosas": len(m.excl) + len(m.alpha_nosolapa) - filas_exclusividad,
+        "resolucion_s": round(resolucion, 3),
+        "estado": ESTADOS_TERMINACION.get(terminacion, str(terminacion)),
+        "min_diff_val": min_diff,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exclusividad del modelo de grúas: completa, cliques, perezosa")
+    parser.add_argument("--backend", choices=list(solvers.BACKENDS), default=solvers.BACKEND)
+    parser.add_argument("--modos", nargs="+", choices=MODOS_EXCLUSIVIDAD, default=list(MODOS_EXCLUSIVIDAD))
+    parser.add_argument("--turnos", type=int, nargs="+", default=TURNOS_SEMANA)
+    parser.add_argument("--tiempo-limite", type=float, default=OPCIONES_SOLVER["TimeLimit"])
+    parser.add_argument("--csv", help="Guardar la tabla por turno en este archivo")
+    args = parser.parse_args()
+    logging.getLogger("pyomo.contrib.appsi").setLevel(logging.WARNING)
+
+    if args.backend not in solvers.backends_disponibles():
+        sys.exit(f"El backend {args.backend} no está disponible en esta máquina")
+    solvers.BACKEND = args.backend
+    modos = args.modos
+    if args.backend != "gurobi" and "perezosa" in modos:
+        print("El modo perezosa necesita callbacks de Gurobi; se omite")
+        modos = [modo for modo in modos if modo != "perezosa"]
+    opciones = {k: v for k, v in OPCIONES_SOLVER.items() if k != "LogToConsole"}
+    opciones["TimeLimit"] = args.tiempo_limite
+
+    with tempfile.TemporaryDirectory() as directorio:
+        instancias = instancias_gruas(directorio, args.turnos)
+
+    filas_tabla = []
+    for turno, datos in instancias.items():
+        for modo in modos:
+            filas_tabla.append({"turno": turno, **resolver(datos, modo, opciones)})
+            print(filas_tabla[-1])
+
+    tabla = pd.DataFrame(filas_tabla)
+    print(f"\nSemana {SEMANA}, backend {args.backend}, límite {args.tiempo_limite:g}s")
+    print(tabla.to_string(index=False))
+
+    # Los turnos que no llegan al óptimo cuentan con el tiempo de resolución (censurado)
+    resumen = tabla.groupby("modo", sort=False).agg(
+        filas=("filas", "mean"),
+        filas_exclusividad=("filas_exclusividad", "mean"),
+        perezosas=("perezosas", "mean"),
+        resolucion_media_s=("resolucion_s", "mean"),
+        optimos=("estado", lambda e: int((e == "optimo").sum())),
+        min_diff_total=("min_diff_val", "sum"),
+    )
+    print("\nResumen por modo:")
+    print(resumen.round(3).to_string())
+    if args.csv:
+        tabla.to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
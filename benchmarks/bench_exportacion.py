@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Benchmark de la exportación a Excel sobre un dataset sintético multi-año.
+
+Compara la exportación original (pd.read_sql + ExcelWriter openpyxl) con la
+exportación en streaming de DatabaseIntegration.exportar_resultados_a_excel,
+midiendo tiempo y pico de memoria (tracemalloc).
+
+Uso:
+    python benchmarks/bench_exportacion.py --anios 3
+    python benchmarks/bench_exportacion.py --url postgresql://... --sin-generar
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from db_integration import DatabaseIntegration, HOJAS_EXPORTACION
+
+PARTICIPACIONES = [50, 60, 68, 70, 80, 90, 100]
+CRITERIOS = ["criterioI", "criterioII", "criterioIII"]
+
+DDL_SQLITE = [
+    """CREATE TABLE optimization_coloracion_results (
+        id INTEGER PRIMARY KEY, semana DATE, participacion INTEGER, criterio VARCHAR(50),
+        distancia_total FLOAT, distancia_load FLOAT, distancia_dlvr FLOAT,
+        movimientos_dlvr INTEGER, movimientos_load INTEGER, estado VARCHAR(20),
+        created_at TIMESTAMP)""",
+    """CREATE TABLE optimization_gruas_results (
+        id INTEGER PRIMARY KEY, semana DATE, turno INTEGER, participacion INTEGER,
+        min_diff_val FLOAT, gruas_utilizadas INTEGER, bloques_activos INTEGER,
+        tiempo_resolucion FLOAT, estado VARCHAR(20), detalles TEXT, created_at TIMESTAMP)""",
+    """CREATE TABLE optimization_semanas_procesadas (
+        id INTEGER PRIMARY KEY, semana DATE, participacion INTEGER,
+        coloracion_factible BOOLEAN, gruas_procesado BOOLEAN, fecha_procesamiento TIMESTAMP)""",
+    """CREATE TABLE optimization_segregaciones (
+        id INTEGER PRIMARY KEY, semana DATE, participacion INTEGER, criterio VARCHAR(50), segregacion VARCHAR(100),
+        distancia_total FLOAT, distancia_dlvr FLOAT, distancia_load FLOAT,
+        movimientos_dlvr INTEGER, movimientos_load INTEGER, created_at TIMESTAMP)""",
+]
+
+
+def generar_dataset(engine, anios, segregaciones):
+    """Puebla las tablas de optimización con resultados sintéticos por semana y turno"""
+    rnd = random.Random(42)
+    ahora = "2024-01-01 00:00:00"
+    with engine.begin() as conn:
+        for ddl in DDL_SQLITE:
+            conn.execute(text(ddl))
+        inicio = date(2020, 1, 6)
+        for n in range(anios * 52):
+            semana = (inicio + timedelta(weeks=n)).isoformat()
+            coloracion, gruas, semanas, segs = [], [], [], []
+            for p in PARTICIPACIONES:
+                semanas.append({'semana': semana, 'participacion': p, 'ok': True, 'f': ahora})
+                for c in CRITERIOS:
+                    coloracion.append({
+                        'semana': semana, 'participacion': p, 'criterio': c,
+                        'dt': rnd.uniform(1e5, 1e6), 'dl': rnd.uniform(1e5, 5e5),
+                        'dd': rnd.uniform(1e5, 5e5), 'md': rnd.randint(100, 2000),
+                        'ml': rnd.randint(100, 2000), 'f': ahora
+                    })
+                for turno in range(1, 22):
+                    gruas.append({
+                        'semana': semana, 'turno': turno, 'participacion': p,
+                        'mdv': rnd.uniform(0, 100), 'gu': rnd.randint(1, 12),
+                        'ba': rnd.randint(1, 9), 'tr': rnd.uniform(0, 15),
+                        'det': '{"gap": 0.0}', 'f': ahora
+                    })
+            for s in range(segregaciones):
+                segs.append({
+                    'semana': semana, 'p': PARTICIPACIONES[0], 'c': CRITERIOS[0],
+                    'seg': f"S{s}-expo-20", 'dt': rnd.uniform(0, 1e4),
+                    'dd': rnd.uniform(0, 1e4), 'dl': rnd.uniform(0, 1e4),
+                    'md': rnd.randint(0, 200), 'ml': rnd.randint(0, 200), 'f': ahora
+                })
+            conn.execute(text("""
+                INSERT INTO optimization_coloracion_results
+                (semana, participacion, criterio, distancia_total, distancia_load, distancia_dlvr,
+                 movimientos_dlvr, movimientos_load, estado, created_at)
+                VALUES (:semana, :participacion, :criterio, :dt, :dl, :dd, :md, :ml, 'factible', :f)
+            """), coloracion)
+            conn.execute(text("""
+                INSERT INTO optimization_gruas_results
+                (semana, turno, participacion, min_diff_val, gruas_utilizadas, bloques_activos,
+                 tiempo_resolucion, estado, detalles, created_at)
+                VALUES (:semana, :turno, :participacion, :mdv, :gu, :ba, :tr, 'optimo', :det, :f)
+            """), gruas)
+            conn.execute(text("""
+                INSERT INTO optimization_semanas_procesadas
+                (semana, participacion, coloracion_factible, gruas_procesado, fecha_procesamiento)
+                VALUES (:semana, :participacion, :ok, :ok, :f)
+            """), semanas)
+            conn.execute(text("""
+                INSERT INTO optimization_segregaciones
+                (semana, participacion, criterio, segregacion, distancia_total, distancia_dlvr, distancia_load,
+                 movimientos_dlvr, movimientos_load, created_at)
+                VALUES (:semana, :p, :c, :seg, :dt, :dd, :dl, :md, :ml, :f)
+            """), segs)
+
+
+def exportar_original(engine, archivo_salida):
+    """Exportación previa: cada tabla completa en memoria con pandas"""
+    import pandas as pd
+    with pd.ExcelWriter(archivo_salida, engine='openpyxl') as writer:
+        for hoja, consulta in HOJAS_EXPORTACION:
+            pd.read_sql(text(consulta), engine).to_excel(writer, sheet_name=hoja, index=False)
+
+
+def medir(nombre, funcion):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    funcion()
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{nombre:<12} tiempo={duracion:8.2f}s  pico_memoria={pico / 2**20:8.1f} MiB")
+    return duracion, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de exportación a Excel")
+    parser.add_argument("--anios", type=int, default=3, help="Años sintéticos a generar")
+    parser.add_argument("--segregaciones", type=int, default=60, help="Segregaciones por semana")
+    parser.add_argument("--url", type=str, help="URL de base de datos existente (por defecto SQLite temporal)")
+    parser.add_argument("--sin-generar", action="store_true", help="No generar datos (usar los de --url)")
+    parser.add_argument("--sin-original", action="store_true", help="Omitir la exportación original")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url)
+        if not args.sin_generar:
+            print(f"Generando {args.anios} años sintéticos...")
+            generar_dataset(engine, args.anios, args.segregaciones)
+
+        with engine.connect() as conn:
+            for hoja, consulta in HOJAS_EXPORTACION:
+                tabla = consulta.split("FROM")[1].split()[0]
+                total = conn.execute(text(f"SELECT COUNT(*) FROM {tabla}")).scalar()
+                print(f"  {hoja:<14} {total:>9} filas")
+
+        db = DatabaseIntegration(db_url=url)
+        if not args.sin_original:
+            medir("original", lambda: exportar_original(engine, os.path.join(tmp, "original.xlsx")))
+        medir("streaming", lambda: db.exportar_resultados_a_excel(os.path.join(tmp, "streaming.xlsx")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Heurística de grúas (HEURISTICA_GRUAS) sola, como respaldo y como solución inicial.
+
+Para cada turno de la semana incluida en el repositorio:
+  - construye el plan de la heurística (dotación golosa + búsqueda en
+    vecindarios durante --segundos) y reporta su min_diff_val y tiempo;
+  - resuelve el modelo completo sin heurística y con el plan como solución
+    inicial (arranque), con el mismo límite de tiempo.
+
+La columna respaldo es el min_diff_val que se entrega sin arranque cuando la
+heurística actúa solo como respaldo: el mejor entre el solver y el plan.
+
+Uso:
+    python benchmarks/bench_heuristica_gruas.py --backend highs --tiempo-limite 15
+    python benchmarks/bench_heuristica_gruas.py --turnos 6 7 13 --tiempo-limite 5 --segundos 0.5
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+
+import solvers
+from bench_solvers import instancias_gruas, SEMANA
+from modelo_gruas_maxmin import construir_modelo_gruas, OPCIONES_SOLVER, ESTADOS_TERMINACION
+from modelo_gruas_agregado import primera_violacion
+from heuristica_gruas import construir_plan, cargar_plan
+
+TURNOS_SEMANA = list(range(1, 22))
+
+
+def resolver(datos, opciones, plan=None):
+    m = construir_modelo_gruas(datos)
+    if plan is not None:
+        cargar_plan(m, plan)
+    resolutor = solvers.Resolutor(m, opciones)
+    inicio = time.perf_counter()
+    res = resolutor.resolver(arranque=plan is not None)
+    resolucion = time.perf_counter() - inicio
+    min_diff = None
+    if resolutor.hay_solucion(res):
+        resolutor.cargar_solucion(res)
+        min_diff = m.min_diff_val.value
+    terminacion = res.solver.termination_condition
+    return ESTADOS_TERMINACION.get(terminacion, str(terminacion)), min_diff, round(resolucion, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Heurística de grúas: sola, respaldo y solución inicial")
+    parser.add_argument("--backend", choices=list(solvers.BACKENDS), default=solvers.BACKEND)
+    parser.add_argument("--turnos", type=int, nargs="+", default=TURNOS_SEMANA)
+    parser.add_argument("--tiempo-limite", type=float, default=OPCIONES_SOLVER["TimeLimit"])
+    parser.add_argument("--segundos", type=float, default=1.0, help="Tiempo de la búsqueda en vecindarios")
+    parser.add_argument("--csv", help="Guardar la tabla por turno en este archivo")
+    args = parser.parse_args()
+    logging.getLogger("pyomo.contrib.appsi").setLevel(logging.WARNING)
+
+    if args.backend not in solvers.backends_disponibles():
+        sys.exit(f"El backend {args.backend} no está disponible en esta máquina")
+    solvers.BACKEND = args.backend
+    opciones = {k: v for k, v in OPCIONES_SOLVER.items() if k != "LogToConsole"}
+    opciones["TimeLimit"] = args.tiempo_limite
+
+    with tempfile.TemporaryDirectory() as directorio:
+        instancias = instancias_gruas(directorio, args.turnos)
+
+    filas = []
+    for turno, datos in instancias.items():
+        inicio = time.perf_counter()
+        inicial = construir_plan(datos, segundos=0)
+        inicial_s = time.perf_counter() - inicio
+        plan = construir_plan(datos, segundos=args.segundos)
+        if plan is not None:
+            m = construir_modelo_gruas(datos)
+            cargar_plan(m, plan)
+            violada = primera_violacion(m)
+            if violada is not None:
+                sys.exit(f"Turno {turno}: el plan de la heurística no cumple {violada}")
+
+        estado, min_diff, resolucion = resolver(datos, opciones)
+        estado_arr, min_diff_arr, resolucion_arr = resolver(datos, opciones, plan) if plan else (None, None, None)
+        candidatos = [v for v in (min_diff, plan.min_diff_val if plan else None) if v is not None]
+        filas.append({
+            "turno": turno,
+            "inicial_ms": round(inicial_s * 1000, 1),
+            "inicial": inicial.min_diff_val if inicial else None,
+            "heuristica": plan.min_diff_val if plan else None,
+            "estado": estado,
+            "solver": min_diff,
+            "resolucion_s": resolucion,
+            "respaldo": max(candidatos) if candidatos else None,
+            "estado_arranque": estado_arr,
+            "arranque": min_diff_arr,
+            "resolucion_arranque_s": resolucion_arr,
+        })
+        print(filas[-1])
+
+    tabla = pd.DataFrame(filas)
+    print(f"\nSemana {SEMANA}, backend {args.backend}, límite {args.tiempo_limite:g}s, "
+          f"búsqueda {args.segundos:g}s")
+    print(tabla.to_string(index=False))
+
+    print("\nTotales de min_diff_val (sin solución cuenta 0):")
+    for columna in ("inicial", "heuristica", "solver", "respaldo", "arranque"):
+        print(f"  {columna:<11} {tabla[columna].fillna(0).sum():8.1f}")
+    print(f"Turnos sin solución del solver: {int(tabla['solver'].isna().sum())}, "
+          f"con arranque: {int(tabla['arranque'].isna().sum())}")
+    if args.csv:
+        tabla.to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Inventario por sumas acumuladas vs variables de estado (INVENTARIO_GRUAS) en el
+modelo de grúas.
+
+Para cada turno y horizonte construye y resuelve el modelo completo con ambas
+formulaciones y reporta el tiempo de construcción, el tamaño de la matriz
+(filas y no ceros), el tiempo de resolución, el estado y min_diff_val.
+
+Equivalencia: la solución de cada formulación se carga en la otra (en la de
+estado, el inventario se calcula con el balance) y se verifica que cumpla todas
+sus restricciones y cotas. Si ambas llegan al óptimo, el objetivo debe coincidir.
+
+Los horizontes más largos que 8 períodos son sintéticos: cada período del turno
+se divide en --factores subperíodos, repartiendo la demanda (el total no
+cambia), multiplicando K y dividiendo mu por el factor.
+
+Uso:
+    python benchmarks/bench_inventario_gruas.py --backend highs --turnos 1 2 3 --factores 1 2 3
+"""
+
+import os
+import sys
+import math
+import time
+import logging
+import argparse
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+from pyomo.environ import Var, Constraint, value
+from pyomo.core.expr.visitor import identify_variables
+
+import solvers
+from bench_solvers import instancias_gruas, SEMANA
+from modelo_gruas_maxmin import construir_modelo_gruas, MODOS_INVENTARIO, OPCIONES_SOLVER, ESTADOS_TERMINACION
+from modelo_gruas_agregado import primera_violacion
+
+
+def alargar(datos, factor):
+    """Instancia con cada período dividido en `factor` subperíodos y la misma demanda total"""
+    if factor == 1:
+        return datos
+    datos = {hoja: df.copy() for hoja, df in datos.items()}
+    periodos = len(datos["T"])
+    datos["T"] = pd.DataFrame({"T": range(1, periodos * factor + 1)})
+    for hoja in ("DMEst", "DMIst"):
+        filas = []
+        for r in datos[hoja].to_dict("records"):
+            base, resto = divmod(int(r[hoja]), factor)
+            for j in range(factor):
+                filas.append({**r, "T": (r["T"] - 1) * factor + j + 1, hoja: base + (1 if j < resto else 0)})
+        datos[hoja] = pd.DataFrame(filas, columns=datos[hoja].columns)
+    datos["K"] = pd.DataFrame({"K": [int(datos["K"].iloc[0, 0]) * factor]})
+    datos["mu"] = pd.DataFrame({"mu": [math.ceil(datos["mu"].iloc[0, 0] / factor)]})
+    return datos
+
+
+def tamano(m):
+    filas = nnz = 0
+    for c in m.component_data_objects(Constraint, active=True):
+        filas += 1
+        nnz += sum(1 for _ in identify_variables(c.body, include_fixed=False))
+    return filas, nnz
+
+
+def cargar_en(origen, destino):
+    """Copia la solución de `origen` en `destino` (misma instancia, otra formulación de inventario)"""
+    for v in destino.component_objects(Var):
+        if hasattr(origen, v.name):
+            fuente = getattr(origen, v.name)
+            for idx in v:
+                v[idx].set_value(fuente[idx].value, skip_validation=True)
+    if hasattr(destino, "inv_bst"):
+        m = destino
+        for b in m.B:
+            for s in m.S:
+                inv = value(m.AEbs[b,s] + m.AIbs[b,s])
+                for t in sorted(m.T):
+                    if s in m.S_I:
+                        inv += m.fd_sbt[s,b,t].value - m.fe_sbt[s,b,t].value
+                    if s in m.S_E:
+                        inv += m.fr_sbt[s,b,t].value - m.fc_sbt[s,b,t].value
+                    m.inv_bst[b,s,t].set_value(inv, skip_validation=True)
+
+
+def cumple(m, tolerancia=1e-5):
+    if primera_violacion(m, tolerancia) is not None:
+        return False
+    for v in m.component_data_objects(Var):
+        if v.value is None:
+            return False
+        if (v.lb is not None and v.value < v.lb - tolerancia) or (v.ub is not None and v.value > v.ub + tolerancia):
+            return False
+    return True
+
+
+def medir(datos, inventario, opciones):
+    inicio = time.perf_counter()
+    m = construir_modelo_gruas(datos, inventario=inventario)
+    construccion = time.perf_counter() - inicio
+    filas, nnz = tamano(m)
+
+    resolutor = solvers.Resolutor(m, opciones)
+    inicio = time.perf_counter()
+    res = resolutor.resolver()
+    resolucion = time.perf_counter() - inicio
+    hay_solucion = resolutor.hay_solucion(res)
+    if hay_solucion:
+        resolutor.cargar_solucion(res)
+    terminacion = res.solver.termination_condition
+    return m, hay_solucion, {
+        "inventario": inventario,
+        "construccion_s": round(construccion, 3),
+        "filas": filas,
+        "nnz": nnz,
+        "resolucion_s": round(resolucion, 3),
+        "estado": ESTADOS_TERMINACION.get(terminacion, str(terminacion)),
+        "min_diff_val": m.min_diff_val.value if hay_solucion else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inventario acumulado vs variables de estado (modelo de grúas)")
+    parser.add_argument("--backend", choices=list(solvers.BACKENDS), default=solvers.BACKEND)
+    parser.add_argument("--turnos", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--factores", type=int, nargs="+", default=[1, 2, 3],
+                        help="Subperíodos por período (1 = turno original de 8 períodos)")
+    parser.add_argument("--tiempo-limite", type=float, default=OPCIONES_SOLVER["TimeLimit"])
+    parser.add_argument("--csv", help="Guardar la tabla en este archivo")
+    args = parser.parse_args()
+    logging.getLogger("pyomo.contrib.appsi").setLevel(logging.WARNING)
+
+    if args.backend not in solvers.backends_disponibles():
+        sys.exit(f"El backend {args.backend} no está disponible en esta máquina")
+    solvers.BACKEND = args.backend
+    opciones = {k: v for k, v in OPCIONES_SOLVER.items() if k != "LogToConsole"}
+    opciones["TimeLimit"] = args.tiempo_limite
+
+    with tempfile.TemporaryDirectory() as directorio:
+        instancias = instancias_gruas(directorio, args.turnos)
+
+    filas = []
+    for turno, datos_turno in instancias.items():
+        for factor in args.factores:
+            datos = alargar(datos_turno, factor)
+            modelos = {}
+            for inventario in MODOS_INVENTARIO:
+                m, hay_solucion, fila = medir(datos, inventario, opciones)
+                modelos[inventario] = m if hay_solucion else None
+                filas.append({"turno": turno, "periodos": len(datos["T"]), **fila})
+            # Equivalencia: cada solución cumple la otra formulación
+            for origen, destino in zip(MODOS_INVENTARIO, reversed(MODOS_INVENTARIO)):
+                fila = next(f for f in filas[-2:] if f["inventario"] == origen)
+                if modelos[origen] is None:
+                    fila["cumple_otra"] = None
+                    continue
+                otro = construir_modelo_gruas(datos, inventario=destino)
+                cargar_en(modelos[origen], otro)
+                fila["cumple_otra"] = cumple(otro)
+            for fila in filas[-2:]:
+                print(fila)
+
+    tabla = pd.DataFrame(filas)
+    print(f"\nSemana {SEMANA}, backend {args.backend}, límite {args.tiempo_limite:g}s")
+    print(tabla.to_string(index=False))
+
+    resumen = tabla.groupby(["periodos", "inventario"]).agg(
+        construccion_s=("construccion_s", "mean"),
+        nnz=("nnz", "mean"),
+        resolucion_s=("resolucion_s", "mean"),
+        optimos=("estado", lambda e: int((e == "optimo").sum())),
+        min_diff_total=("min_diff_val", "sum"),
+    )
+    print("\nResumen por horizonte y formulación (medias por turno):")
+    print(resumen.round(3).to_string())
+
+    ambos = tabla[tabla["estado"] == "optimo"].groupby(["turno", "periodos"])["min_diff_val"].agg(["count", "nunique"])
+    distintos = ambos[(ambos["count"] == 2) & (ambos["nunique"] > 1)]
+    print(f"\nÓptimos con distinto objetivo entre formulaciones: {len(distintos)}")
+    print(f"Soluciones que no cumplen la otra formulación: {int((tabla['cumple_otra'] == False).sum())}")
+    if args.csv:
+        tabla.to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
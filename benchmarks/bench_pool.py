@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Overhead de arranque por trabajo: subprocess `python main_integrated.py` frente a
+una llamada estructurada al pool de trabajadores ya calientes.
+
+Mide solo la parte fija (intérprete + imports + entorno de Gurobi), que es lo que
+cada trabajo pagaba antes de llegar a la primera resolución.
+
+Uso:
+    python benchmarks/bench_pool.py --repeticiones 5
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pool_trabajadores
+from pool_trabajadores import PoolTrabajadores
+
+ARRANQUE_EN_FRIO = (
+    "import pool_trabajadores as p; p._inicializar_trabajador()"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overhead de arranque por trabajo")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    frio = []
+    for _ in range(args.repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, "-c", ARRANQUE_EN_FRIO], cwd=BASE_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        frio.append(time.perf_counter() - inicio)
+
+    pool = PoolTrabajadores(max_trabajadores=1)
+    inicio = time.perf_counter()
+    pool.iniciar()
+    arranque_pool = time.perf_counter() - inicio
+
+    caliente = []
+    for _ in range(args.repeticiones):
+        inicio = time.perf_counter()
+        pool.enviar(pool_trabajadores._calentar).result()
+        caliente.append(time.perf_counter() - inicio)
+    pool.cerrar()
+
+    print(f"subprocess por trabajo : media {statistics.mean(frio) * 1000:8.1f} ms")
+    print(f"pool (arranque único)  : {arranque_pool * 1000:8.1f} ms")
+    print(f"pool por trabajo       : media {statistics.mean(caliente) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
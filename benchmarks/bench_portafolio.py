@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Carrera de configuraciones del solver (PORTAFOLIO_SOLVER) vs cada configuración sola.
+
+Para cada instancia (coloración de la semana incluida y/o turnos de grúas)
+resuelve cada perfil por separado con todos los núcleos y luego la carrera con
+los núcleos repartidos, y reporta tiempo de pared, estado, objetivo y, en la
+carrera, la configuración ganadora. Ambas pasan por portafolio.Resolutor, así
+que el costo de reconstruir el modelo es el mismo; los procesos de la carrera
+se lanzan antes de medir, como en un trabajador ya iniciado.
+
+Los perfiles que en el backend quedan iguales a otro (p.ej. cota y base en
+HiGHS, que no traduce MIPFocus ni Cuts) se omiten, y la carrera usa a lo más
+--nucleos perfiles (por defecto, los núcleos de la máquina).
+
+Uso:
+    python benchmarks/bench_portafolio.py --backend gurobi --modelo ambos --tiempo-limite 60
+    python benchmarks/bench_portafolio.py --backend highs --turnos 1 6 7 --perfiles base factibilidad semilla
+    python benchmarks/bench_portafolio.py --backend highs --turnos 1 --nucleos 4
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from functools import partial
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+from pyomo.environ import Objective, value
+
+import solvers
+import portafolio
+from bench_solvers import instancias_gruas, SEMANA, INSTANCIA_COLORACION
+from modelo_coloracion import construir_modelo_coloracion, OPCIONES_SOLVER as OPCIONES_COLORACION
+from modelo_gruas_maxmin import construir_modelo_gruas, OPCIONES_SOLVER as OPCIONES_GRUAS
+
+
+def correr(construir, opciones, perfiles, backend, nucleos):
+    modelo = construir()
+    resolutor = portafolio.Resolutor(modelo, construir, opciones, perfiles=perfiles, backend=backend,
+                                     nucleos=nucleos)
+    inicio = time.perf_counter()
+    res = resolutor.resolver()
+    segundos = time.perf_counter() - inicio
+    objetivo = None
+    if resolutor.hay_solucion(res):
+        resolutor.cargar_solucion(res)
+        objetivo = value(next(modelo.component_data_objects(Objective, active=True)))
+    return {
+        "segundos": round(segundos, 3),
+        "estado": str(res.solver.termination_condition),
+        "objetivo": objetivo,
+        "ganador": resolutor.ganador,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carrera de configuraciones del solver vs cada una sola")
+    parser.add_argument("--backend", choices=list(solvers.BACKENDS), default=solvers.BACKEND)
+    parser.add_argument("--modelo", choices=["coloracion", "gruas", "ambos"], default="gruas")
+    parser.add_argument("--turnos", type=int, nargs="+", default=[1, 6, 7])
+    parser.add_argument("--perfiles", nargs="+", choices=list(portafolio.PERFILES), default=list(portafolio.PERFILES))
+    parser.add_argument("--tiempo-limite", type=float, help="TimeLimit (s) para todas las resoluciones")
+    parser.add_argument("--nucleos", type=int, default=portafolio.nucleos_disponibles(),
+                        help="Núcleos a repartir (más que los de la máquina sobresuscribe la CPU)")
+    parser.add_argument("--csv", help="Guardar la tabla en este archivo")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("pyomo.contrib.appsi").setLevel(logging.WARNING)
+
+    if args.backend not in solvers.backends_disponibles():
+        sys.exit(f"El backend {args.backend} no está disponible en esta máquina")
+
+    def opciones(base):
+        opciones = dict(base)
+        if args.tiempo_limite is not None:
+            opciones["TimeLimit"] = args.tiempo_limite
+        return opciones
+
+    instancias = []
+    if args.modelo in ("coloracion", "ambos"):
+        hojas = pd.read_excel(INSTANCIA_COLORACION, sheet_name=None)
+        instancias.append((f"coloracion {SEMANA}", partial(construir_modelo_coloracion, hojas),
+                           opciones(OPCIONES_COLORACION)))
+    if args.modelo in ("gruas", "ambos"):
+        with tempfile.TemporaryDirectory() as directorio:
+            for turno, datos in instancias_gruas(directorio, args.turnos).items():
+                instancias.append((f"gruas {SEMANA} T{turno:02d}", partial(construir_modelo_gruas, datos),
+                                   opciones(OPCIONES_GRUAS)))
+
+    # Perfiles distintos en este backend (sin contar los núcleos, que cambian entre sola y carrera)
+    perfiles = list(portafolio.configuraciones({}, args.perfiles, args.backend, nucleos=args.nucleos))
+    print(f"Perfiles en {args.backend}: {', '.join(perfiles)}; núcleos: {args.nucleos} "
+          f"(máquina: {portafolio.nucleos_disponibles()})")
+
+    portafolio.calentar(len(perfiles))
+    filas = []
+    for nombre, construir, opciones_instancia in instancias:
+        for perfil in perfiles:
+            filas.append({"instancia": nombre, "corrida": perfil,
+                          **correr(construir, opciones_instancia, [perfil], args.backend, args.nucleos)})
+            print(filas[-1])
+        filas.append({"instancia": nombre, "corrida": "carrera",
+                      **correr(construir, opciones_instancia, perfiles, args.backend, args.nucleos)})
+        print(filas[-1])
+
+    tabla = pd.DataFrame(filas)
+    print(f"\nBackend {args.backend}, límite {args.tiempo_limite or 'por modelo'}")
+    print(tabla.drop(columns="ganador").to_string(index=False))
+
+    solas = tabla[tabla["corrida"] != "carrera"]
+    carrera = tabla[tabla["corrida"] == "carrera"].set_index("instancia")
+    resumen = pd.DataFrame({
+        "mejor_sola_s": solas.groupby("instancia")["segundos"].min(),
+        "peor_sola_s": solas.groupby("instancia")["segundos"].max(),
+        "base_s": solas[solas["corrida"] == perfiles[0]].set_index("instancia")["segundos"],
+        "carrera_s": carrera["segundos"],
+        "ganador": carrera["ganador"],
+    })
+    print("\nPor instancia:")
+    print(resumen.to_string())
+    print("\nVictorias por perfil:")
+    print(carrera["ganador"].value_counts(dropna=False).to_string())
+    if args.csv:
+        tabla.to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
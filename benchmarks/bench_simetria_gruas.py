@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Efecto de la ruptura de simetría entre grúas (SIMETRIA_GRUAS) en el modelo max-min.
+
+Resuelve los 21 turnos de la semana incluida en el repositorio con cada modo
+(ninguna / uso / lex) y el mismo límite de tiempo, registrando cada incumbente
+mejorada con el callback del solver (Gurobi o HiGHS). Por turno y modo reporta
+el min_diff_val final, el estado y el tiempo hasta alcanzar el objetivo: el
+mejor min_diff_val final obtenido por cualquiera de los modos en ese turno.
+
+El resumen por modo cuenta los turnos que alcanzaron el objetivo y da la media
+del tiempo al objetivo (los que no lo alcanzan cuentan con el límite de tiempo).
+
+Uso:
+    python benchmarks/bench_simetria_gruas.py --backend highs --tiempo-limite 15
+    python benchmarks/bench_simetria_gruas.py --modos ninguna lex --turnos 1 2 3 --csv simetria.csv
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+
+import solvers
+from bench_solvers import instancias_gruas, SEMANA
+from modelo_gruas_maxmin import construir_modelo_gruas, MODOS_SIMETRIA, OPCIONES_SOLVER
+
+TURNOS_SEMANA = list(range(1, 22))
+
+
+def registrar_incumbentes(resolutor, modelo):
+    """Lista que se llena con (segundos, objetivo) de cada incumbente mejorada; None si el backend no lo permite"""
+    trayectoria = []
+    if resolutor.backend == "gurobi":
+        from gurobipy import GRB
+
+        def callback(cb_m, cb_opt, where):
+            if where == GRB.Callback.MIPSOL:
+                trayectoria.append((cb_opt.cbGet(GRB.Callback.RUNTIME), cb_opt.cbGet(GRB.Callback.MIPSOL_OBJ)))
+        resolutor.solver.set_callback(callback)
+    elif resolutor.backend == "highs":
+        # appsi crea el modelo de highspy en set_instance y solve() lo reutiliza
+        # si recibe el mismo modelo de Pyomo
+        resolutor.solver.set_instance(modelo)
+        resolutor.solver._solver_model.cbMipImprovingSolution.subscribe(
+            lambda e: trayectoria.append((e.data_out.running_time, e.data_out.objective_function_value))
+        )
+    else:
+        return None
+    return trayectoria
+
+
+def resolver(datos, modo, backend, opciones):
+    inicio = time.perf_counter()
+    modelo = construir_modelo_gruas(datos, modo)
+    resolutor = solvers.Resolutor(modelo, opciones, backend=backend)
+    construccion = time.perf_counter() - inicio
+    trayectoria = registrar_incumbentes(resolutor, modelo)
+
+    inicio = time.perf_counter()
+    res = resolutor.resolver()
+    resolucion = time.perf_counter() - inicio
+    min_diff = None
+    if resolutor.hay_solucion(res):
+        resolutor.cargar_solucion(res)
+        min_diff = modelo.min_diff_val.value
+    return {
+        "modo": modo,
+        "construccion_s": round(construccion, 3),
+        "resolucion_s": round(resolucion, 3),
+        "estado": str(res.solver.termination_condition),
+        "min_diff_val": min_diff,
+        "trayectoria": trayectoria,
+    }
+
+
+def tiempo_al_objetivo(trayectoria, objetivo):
+    if trayectoria is None or objetivo is None:
+        return None
+    for segundos, valor in trayectoria:
+        if valor >= objetivo - 1e-6:
+            return segundos
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ruptura de simetría entre grúas: tiempo al objetivo y min_diff_val")
+    parser.add_argument("--backend", choices=list(solvers.BACKENDS), default=solvers.BACKEND)
+    parser.add_argument("--modos", nargs="+", choices=MODOS_SIMETRIA, default=list(MODOS_SIMETRIA))
+    parser.add_argument("--turnos", type=int, nargs="+", default=TURNOS_SEMANA)
+    parser.add_argument("--tiempo-limite", type=float, default=OPCIONES_SOLVER["TimeLimit"])
+    parser.add_argument("--csv", help="Guardar la tabla por turno en este archivo")
+    args = parser.parse_args()
+    logging.getLogger("pyomo.contrib.appsi").setLevel(logging.WARNING)
+
+    if args.backend not in solvers.backends_disponibles():
+        sys.exit(f"El backend {args.backend} no está disponible en esta máquina")
+    opciones = {k: v for k, v in OPCIONES_SOLVER.items() if k != "LogToConsole"}
+    opciones["TimeLimit"] = args.tiempo_limite
+
+    with tempfile.TemporaryDirectory() as directorio:
+        instancias = instancias_gruas(directorio, args.turnos)
+
+    filas = []
+    for turno, datos in instancias.items():
+        corridas = [resolver(datos, modo, args.backend, opciones) for modo in args.modos]
+        finales = [c["min_diff_val"] for c in corridas if c["min_diff_val"] is not None]
+        objetivo = max(finales) if finales else None
+        for corrida in corridas:
+            trayectoria = corrida.pop("trayectoria")
+            filas.append({
+                "turno": turno,
+                **corrida,
+                "objetivo": objetivo,
+                "tiempo_objetivo_s": tiempo_al_objetivo(trayectoria, objetivo),
+            })
+            print(filas[-1])
+
+    tabla = pd.DataFrame(filas)
+    print(f"\nSemana {SEMANA}, backend {args.backend}, límite {args.tiempo_limite:g}s")
+    print(tabla.to_string(index=False))
+
+    resumen = tabla.assign(
+        alcanzado=tabla["tiempo_objetivo_s"].notna(),
+        tiempo_censurado=tabla["tiempo_objetivo_s"].fillna(args.tiempo_limite),
+    ).groupby("modo", sort=False).agg(
+        turnos_objetivo=("alcanzado", "sum"),
+        tiempo_objetivo_medio_s=("tiempo_censurado", "mean"),
+        resolucion_media_s=("resolucion_s", "mean"),
+        min_diff_total=("min_diff_val", "sum"),
+    )
+    print("\nResumen por modo:")
+    print(resumen.round(3).to_string())
+    if args.csv:
+        tabla.to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Comparación de backends de solver (Gurobi / HiGHS / CBC) sobre las instancias
+incluidas en el repositorio.
+
+Para cada backend disponible reporta, por instancia: tiempo de construcción del
+modelo (Pyomo + carga en el solver), tiempo de resolución, estado, objetivo y gap.
+La instancia de coloración es Instancia_2022-01-03_68_K.xlsx; las de grúas se
+generan a partir de ella y de resultado_2022-01-03_68_K.xlsx en un directorio
+temporal.
+
+Uso:
+    python benchmarks/bench_solvers.py --modelo ambos --tiempo-limite 60
+    python benchmarks/bench_solvers.py --backends highs --modelo gruas --turnos 1 2 3
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import contextlib
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+from pyomo.environ import Objective, value
+
+import solvers
+import progreso
+from modelo_coloracion import construir_modelo_coloracion, OPCIONES_SOLVER as OPCIONES_COLORACION
+from modelo_gruas_maxmin import construir_modelo_gruas, OPCIONES_SOLVER as OPCIONES_GRUAS
+
+SEMANA = "2022-01-03"
+PARTICIPACION = 68
+INSTANCIA_COLORACION = os.path.join(BASE_DIR, f"Instancia_{SEMANA}_{PARTICIPACION}_K.xlsx")
+RESULTADO_COLORACION = os.path.join(BASE_DIR, f"resultado_{SEMANA}_{PARTICIPACION}_K.xlsx")
+
+
+def medir(backend, construir, datos, opciones, maximizar):
+    """Construye y resuelve una instancia; retorna la fila de resultados"""
+    inicio = time.perf_counter()
+    modelo = construir(datos)
+    resolutor = solvers.Resolutor(modelo, opciones, backend=backend)
+    construccion = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    res = resolutor.resolver()
+    resolucion = time.perf_counter() - inicio
+
+    objetivo = None
+    if resolutor.hay_solucion(res):
+        resolutor.cargar_solucion(res)
+        objetivo = _objetivo(modelo)
+    return {
+        "backend": backend,
+        "construccion_s": round(construccion, 3),
+        "resolucion_s": round(resolucion, 3),
+        "estado": str(res.solver.termination_condition),
+        "objetivo": objetivo,
+        "gap": progreso.gap_mip(res, maximizar=maximizar),
+    }
+
+
+def _objetivo(modelo):
+    return value(next(modelo.component_data_objects(Objective, active=True)))
+
+
+def instancias_gruas(directorio, turnos):
+    """Genera las instancias de grúas de la semana incluida y las retorna como {turno: hojas}"""
+    from instancias_gruas import generar_instancias_gruas
+
+    carpeta_inst = os.path.join(directorio, "instancias_magdalena", SEMANA)
+    carpeta_res = os.path.join(directorio, "resultados_magdalena", SEMANA)
+    os.makedirs(carpeta_inst)
+    os.makedirs(carpeta_res)
+    shutil.copy(INSTANCIA_COLORACION, carpeta_inst)
+    shutil.copy(RESULTADO_COLORACION, carpeta_res)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        generar_instancias_gruas([SEMANA], PARTICIPACION, directorio)
+    salida = os.path.join(directorio, "instancias_camila", f"instancias_turno_{SEMANA}")
+    return {
+        turno: pd.read_excel(os.path.join(salida, f"Instancia_{SEMANA}_{PARTICIPACION}_T{turno:02d}.xlsx"),
+                             sheet_name=None)
+        for turno in turnos
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparación de backends de solver")
+    parser.add_argument("--backends", nargs="+", choices=list(solvers.BACKENDS),
+                        help="Por defecto, todos los disponibles en esta máquina")
+    parser.add_argument("--modelo", choices=["coloracion", "gruas", "ambos"], default="ambos")
+    parser.add_argument("--turnos", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--tiempo-limite", type=float, help="TimeLimit (s) para todas las resoluciones")
+    parser.add_argument("--csv", help="Guardar la tabla de resultados en este archivo")
+    args = parser.parse_args()
+    # appsi_highs reenvía el log del solver al logging de Pyomo
+    logging.getLogger("pyomo.contrib.appsi").setLevel(logging.WARNING)
+
+    disponibles = solvers.backends_disponibles()
+    backends = [b for b in (args.backends or disponibles) if b in disponibles]
+    omitidos = sorted(set(args.backends or solvers.BACKENDS) - set(backends))
+    if omitidos:
+        print(f"Backends no disponibles (se omiten): {', '.join(omitidos)}")
+    if not backends:
+        sys.exit("No hay ningún backend de solver disponible")
+
+    def perfil(opciones):
+        opciones = {k: v for k, v in opciones.items() if k != "LogToConsole"}
+        if args.tiempo_limite is not None:
+            opciones["TimeLimit"] = args.tiempo_limite
+        return opciones
+
+    filas = []
+    if args.modelo in ("coloracion", "ambos"):
+        datos = pd.read_excel(INSTANCIA_COLORACION, sheet_name=None)
+        for backend in backends:
+            fila = medir(backend, construir_modelo_coloracion, datos, perfil(OPCIONES_COLORACION), False)
+            filas.append({"instancia": f"coloracion {SEMANA}", **fila})
+            print(filas[-1])
+
+    if args.modelo in ("gruas", "ambos"):
+        with tempfile.TemporaryDirectory() as directorio:
+            instancias = instancias_gruas(directorio, args.turnos)
+        for turno, datos in instancias.items():
+            for backend in backends:
+                fila = medir(backend, construir_modelo_gruas, datos, perfil(OPCIONES_GRUAS), True)
+                filas.append({"instancia": f"gruas {SEMANA} T{turno:02d}", **fila})
+                print(filas[-1])
+
+    tabla = pd.DataFrame(filas)
+    print("\n" + tabla.to_string(index=False))
+    if args.csv:
+        tabla.to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
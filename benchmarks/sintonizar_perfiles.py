@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Sintonización offline de los perfiles del solver por familia de modelo
+(coloración y grúas) y verificación de regresiones.
+
+Sintonizar: evalúa el perfil por defecto (sin opciones extra) y candidatos del
+espacio de parámetros del backend (toda la grilla si cabe en --candidatos, si no
+una muestra aleatoria con --semilla) sobre un conjunto de instancias:
+  - coloración: la semana incluida en el repositorio y --sinteticas copias con
+    los costos de distancia (LC, LE) perturbados ±20%, que no cambian la
+    región factible;
+  - grúas: los --turnos de esa semana y los --alargados con cada período
+    dividido en dos (como en bench_inventario_gruas.py).
+Cada candidato se mide por instancias resueltas (óptimo o infactibilidad
+probada), objetivo total y media geométrica desplazada (1 s) de la mediana de
+--repeticiones tiempos, en ese orden. Un candidato que solo gana en tiempo
+reemplaza al perfil por defecto si lo mejora en más de --mejora-minima. Con
+--guardar, el elegido queda en perfiles_solver.json (versión + 1) junto con sus
+métricas de referencia, que modelo_coloracion.py y modelo_gruas_maxmin.py
+cargan al resolver (PERFIL_SOLVER=sintonizado).
+
+Verificar (--verificar): vuelve a medir el perfil guardado sobre las mismas
+instancias y lo compara con su referencia. Es regresión resolver menos
+instancias, un objetivo peor o un tiempo mayor que la referencia por más de
+--tolerancia. Con --guardar se agrega la medición al historial del perfil. Sale
+con código 1 si hay regresión o si la familia no tiene perfil para el backend
+(`make verificar-perfiles`).
+
+La herramienta de sintonización de Gurobi trabaja sobre un modelo a la vez
+desde gurobipy; esta búsqueda usa la capa común de solvers.py y sirve para
+cualquier backend (en HiGHS el espacio es lo que solvers.py traduce).
+
+Uso:
+    python benchmarks/sintonizar_perfiles.py --backend gurobi --familia ambas --candidatos 20 --guardar
+    python benchmarks/sintonizar_perfiles.py --backend highs --familia gruas --turnos 1 6 10 --tiempo-limite 15
+    python benchmarks/sintonizar_perfiles.py --backend highs --verificar
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import logging
+import statistics
+import argparse
+import itertools
+import tempfile
+from datetime import date
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+from pyomo.environ import Objective, value
+from pyomo.opt import TerminationCondition
+
+import solvers
+import perfiles_solver
+from bench_solvers import instancias_gruas, SEMANA, INSTANCIA_COLORACION
+from bench_inventario_gruas import alargar
+from modelo_coloracion import construir_modelo_coloracion, OPCIONES_SOLVER as OPCIONES_COLORACION
+from modelo_gruas_maxmin import construir_modelo_gruas, OPCIONES_SOLVER as OPCIONES_GRUAS
+
+# Valores a probar por parámetro (nombres de Gurobi); omitir un parámetro es dejar su valor por defecto
+ESPACIOS = {
+    "gurobi": {
+        "MIPFocus": [1, 2, 3],
+        "Heuristics": [0.01, 0.2, 0.5],
+        "Cuts": [0, 1, 2, 3],
+        "Presolve": [0, 1, 2],
+        "Symmetry": [0, 2],
+    },
+    # HiGHS solo traduce Heuristics (mip_heuristic_effort, 0.05 por defecto)
+    "highs": {
+        "Heuristics": [0.01, 0.1, 0.2, 0.3, 0.5, 0.8],
+    },
+    "cbc": {},
+}
+
+# sentido: 1 si se maximiza el objetivo, -1 si se minimiza
+FAMILIAS = {
+    "coloracion": {"construir": construir_modelo_coloracion, "opciones": OPCIONES_COLORACION, "sentido": -1},
+    "gruas": {"construir": construir_modelo_gruas, "opciones": OPCIONES_GRUAS, "sentido": 1},
+}
+
+# Mediciones que se guardan en el historial de cada perfil
+MAX_HISTORIAL = 20
+
+RESUELTAS = {TerminationCondition.optimal, TerminationCondition.infeasible}
+
+
+def perturbar_costos(hojas, rng, amplitud=0.2):
+    """Copia de la instancia de coloración con LC y LE multiplicados por un factor en [1 - amplitud, 1 + amplitud]"""
+    hojas = dict(hojas)
+    for hoja, columna in (("LC_sb", "LC"), ("LE_b", "LE")):
+        df = hojas[hoja].copy()
+        df[columna] = [max(0, round(v * rng.uniform(1 - amplitud, 1 + amplitud))) for v in df[columna]]
+        hojas[hoja] = df
+    return hojas
+
+
+def instancias_familia(familia, conjunto):
+    """[(nombre, hojas)] del conjunto de instancias de la familia"""
+    if familia == "coloracion":
+        hojas = pd.read_excel(INSTANCIA_COLORACION, sheet_name=None)
+        rng = random.Random(conjunto["semilla"])
+        return [(f"coloracion {SEMANA}", hojas)] + [
+            (f"coloracion {SEMANA} costos#{i}", perturbar_costos(hojas, rng))
+            for i in range(1, conjunto["sinteticas"] + 1)
+        ]
+    turnos = sorted(set(conjunto["turnos"]) | set(conjunto["alargados"]))
+    with tempfile.TemporaryDirectory() as directorio:
+        datos = instancias_gruas(directorio, turnos)
+    return [(f"gruas {SEMANA} T{t:02d}", datos[t]) for t in conjunto["turnos"]] + [
+        (f"gruas {SEMANA} T{t:02d} x2", alargar(datos[t], 2)) for t in conjunto["alargados"]
+    ]
+
+
+def candidatos(espacio, maximo, rng):
+    """Perfiles a evaluar: el por defecto ({}) y la grilla completa o una muestra de ella"""
+    nombres = list(espacio)
+    grilla = [
+        {n: v for n, v in zip(nombres, valores) if v is not None}
+        for valores in itertools.product(*[[None, *espacio[n]] for n in nombres])
+    ]
+    grilla = [c for c in grilla if c]
+    if len(grilla) > maximo:
+        grilla = rng.sample(grilla, maximo)
+    return [{}] + grilla
+
+
+def medir(familia, instancias, opciones, backend, repeticiones=1):
+    """Resuelve cada instancia con las opciones dadas; retorna las filas por instancia (mediana del tiempo)"""
+    construir = FAMILIAS[familia]["construir"]
+    filas = []
+    for nombre, hojas in instancias:
+        tiempos = []
+        for _ in range(repeticiones):
+            modelo = construir(hojas)
+            resolutor = solvers.Resolutor(modelo, opciones, backend=backend)
+            inicio = time.perf_counter()
+            res = resolutor.resolver()
+            tiempos.append(time.perf_counter() - inicio)
+        objetivo = None
+        if resolutor.hay_solucion(res):
+            resolutor.cargar_solucion(res)
+            objetivo = value(next(modelo.component_data_objects(Objective, active=True)))
+        terminacion = res.solver.termination_condition
+        filas.append({"instancia": nombre, "segundos": round(statistics.median(tiempos), 3),
+                      "estado": str(terminacion), "resuelta": terminacion in RESUELTAS, "objetivo": objetivo})
+    return filas
+
+
+def resumir(filas, tiempo_limite):
+    """Métricas de un perfil: resueltas, media geométrica desplazada del tiempo y objetivo total"""
+    tiempos = [min(f["segundos"], tiempo_limite) for f in filas]
+    sgm = math.exp(sum(math.log(t + 1) for t in tiempos) / len(tiempos)) - 1
+    return {
+        "resueltas": sum(f["resuelta"] for f in filas),
+        "tiempo_sgm": round(sgm, 3),
+        "objetivo_total": sum(f["objetivo"] or 0 for f in filas),
+    }
+
+
+def clave(metricas, sentido):
+    # El objetivo se compara con 4 cifras significativas: diferencias dentro del MIPGap no cuentan
+    return metricas["resueltas"], float(f"{sentido * metricas['objetivo_total']:.4g}"), -metricas["tiempo_sgm"]
+
+
+def regresiones(actual, referencia, sentido, tolerancia):
+    """Motivos por los que la medición actual es peor que la referencia del perfil"""
+    motivos = []
+    if actual["resueltas"] < referencia["resueltas"]:
+        motivos.append(f"resueltas {actual['resueltas']} < {referencia['resueltas']}")
+    if sentido * (actual["objetivo_total"] - referencia["objetivo_total"]) < -1e-4 * max(
+            1.0, abs(referencia["objetivo_total"])):
+        motivos.append(f"objetivo total {actual['objetivo_total']:g} peor que {referencia['objetivo_total']:g}")
+    if actual["tiempo_sgm"] > referencia["tiempo_sgm"] * (1 + tolerancia):
+        motivos.append(f"tiempo {actual['tiempo_sgm']:.2f}s > {referencia['tiempo_sgm']:.2f}s "
+                       f"(+{tolerancia:.0%})")
+    return motivos
+
+
+def opciones_base(familia, tiempo_limite):
+    opciones = {k: v for k, v in FAMILIAS[familia]["opciones"].items() if k != "LogToConsole"}
+    opciones["TimeLimit"] = tiempo_limite
+    return opciones
+
+
+def supera(metricas, defecto, sentido, mejora_minima):
+    """True si el candidato mejora al perfil por defecto más allá del ruido de medición"""
+    if clave(metricas, sentido)[:2] != clave(defecto, sentido)[:2]:
+        return clave(metricas, sentido) > clave(defecto, sentido)
+    return metricas["tiempo_sgm"] < defecto["tiempo_sgm"] * (1 - mejora_minima)
+
+
+def sintonizar(familia, args, contenido):
+    if familia == "coloracion":
+        conjunto = {"sinteticas": args.sinteticas, "semilla": args.semilla}
+    else:
+        conjunto = {"turnos": args.turnos, "alargados": args.alargados}
+    tiempo_limite = args.tiempo_limite or FAMILIAS[familia]["opciones"]["TimeLimit"]
+    sentido = FAMILIAS[familia]["sentido"]
+    instancias = instancias_familia(familia, conjunto)
+    lista = candidatos(ESPACIOS[args.backend], args.candidatos, random.Random(args.semilla))
+    print(f"\n{familia}: {len(lista)} candidatos x {len(instancias)} instancias, límite {tiempo_limite:g}s")
+
+    evaluados = []
+    for candidato in lista:
+        filas = medir(familia, instancias, {**opciones_base(familia, tiempo_limite), **candidato}, args.backend,
+                      args.repeticiones)
+        evaluados.append((candidato, resumir(filas, tiempo_limite)))
+        print(f"  {candidato or 'por defecto'}: {evaluados[-1][1]}")
+
+    tabla = pd.DataFrame([{"perfil": str(c or "por defecto"), **m} for c, m in evaluados])
+    print(tabla.to_string(index=False))
+    mejor, metricas = max(evaluados, key=lambda e: clave(e[1], sentido))
+    defecto = evaluados[0][1]
+    if mejor and not supera(metricas, defecto, sentido, args.mejora_minima):
+        print(f"{mejor} no mejora al por defecto en más de {args.mejora_minima:.0%}; se mantiene el por defecto")
+        mejor, metricas = evaluados[0]
+    print(f"Mejor perfil de {familia} con {args.backend}: {mejor or 'por defecto'} {metricas} "
+          f"(por defecto: {defecto})")
+    if args.guardar:
+        anterior = contenido["familias"].get(familia, {}).get(args.backend)
+        contenido["familias"].setdefault(familia, {})[args.backend] = {
+            "version": (anterior["version"] + 1) if anterior else 1,
+            "opciones": mejor,
+            "fecha": date.today().isoformat(),
+            "tiempo_limite": tiempo_limite,
+            "repeticiones": args.repeticiones,
+            "instancias": conjunto,
+            "candidatos": len(lista),
+            "referencia": metricas,
+            "por_defecto": defecto,
+            "historial": [],
+        }
+    return True
+
+
+def verificar(familia, args, contenido):
+    entrada = contenido["familias"].get(familia, {}).get(args.backend)
+    if entrada is None:
+        print(f"\nERROR: {familia} no tiene perfil guardado para {args.backend} en {args.archivo}; "
+              f"sintonice primero (sin --verificar) con --guardar")
+        return False
+    instancias = instancias_familia(familia, entrada["instancias"])
+    opciones = {**opciones_base(familia, entrada["tiempo_limite"]), **entrada["opciones"]}
+    filas = medir(familia, instancias, opciones, args.backend, entrada["repeticiones"])
+    print(f"\n{familia} v{entrada['version']} {entrada['opciones'] or 'por defecto'}:")
+    print(pd.DataFrame(filas).to_string(index=False))
+    actual = resumir(filas, entrada["tiempo_limite"])
+    motivos = regresiones(actual, entrada["referencia"], FAMILIAS[familia]["sentido"], args.tolerancia)
+    print(f"Referencia {entrada['referencia']} ({entrada['fecha']}); actual {actual}")
+    print("REGRESIÓN: " + "; ".join(motivos) if motivos else "Sin regresión")
+    if args.guardar:
+        entrada["historial"] = (entrada.get("historial", []) + [
+            {"fecha": date.today().isoformat(), **actual, "regresion": bool(motivos)}
+        ])[-MAX_HISTORIAL:]
+    return not motivos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sintonización y verificación de perfiles del solver por familia")
+    parser.add_argument("--backend", choices=list(solvers.BACKENDS), default=solvers.BACKEND)
+    parser.add_argument("--familia", choices=[*FAMILIAS, "ambas"], default="ambas")
+    parser.add_argument("--verificar", action="store_true", help="Medir el perfil guardado contra su referencia")
+    parser.add_argument("--guardar", action="store_true", help="Escribir el resultado en el archivo de perfiles")
+    parser.add_argument("--archivo", default=perfiles_solver.ARCHIVO)
+    parser.add_argument("--turnos", type=int, nargs="+", default=[1, 6, 10, 19])
+    parser.add_argument("--alargados", type=int, nargs="*", default=[3],
+                        help="Turnos de grúas que se agregan con los períodos divididos en dos")
+    parser.add_argument("--sinteticas", type=int, default=1, help="Instancias de coloración con costos perturbados")
+    parser.add_argument("--candidatos", type=int, default=20, help="Máximo de candidatos además del por defecto")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--tiempo-limite", type=float, help="TimeLimit (s); por defecto, el de cada modelo")
+    parser.add_argument("--repeticiones", type=int, default=2, help="Resoluciones por instancia (mediana)")
+    parser.add_argument("--mejora-minima", type=float, default=0.1,
+                        help="Mejora de tiempo necesaria para reemplazar al perfil por defecto")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Aumento de tiempo tolerado al verificar")
+    args = parser.parse_args()
+    logging.getLogger("pyomo.contrib.appsi").setLevel(logging.WARNING)
+
+    if args.backend not in solvers.backends_disponibles():
+        sys.exit(f"El backend {args.backend} no está disponible en esta máquina")
+    contenido = perfiles_solver.cargar(args.archivo)
+    familias = list(FAMILIAS) if args.familia == "ambas" else [args.familia]
+    accion = verificar if args.verificar else sintonizar
+    correctos = [accion(familia, args, contenido) for familia in familias]
+    if args.guardar:
+        perfiles_solver.guardar(contenido, args.archivo)
+        print(f"\nPerfiles guardados en {args.archivo}")
+    if not all(correctos):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import os
+import json
+import hashlib
+import shutil
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_CACHE = os.getenv("CACHE_RESULTADOS_DIR", os.path.join(BASE_DIR, "resultados_generados", "cache"))
+
+
+def huella_instancia(hojas, version_modelo, opciones_solver, **extra):
+    """Huella del contenido de una instancia (hojas ya leídas) + versión del modelo y opciones del solver.
+
+    Se calcula sobre los datos y no sobre los bytes del .xlsx, que cambian en
+    cada regeneración aunque el contenido sea el mismo.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(
+        {"version_modelo": version_modelo, "opciones_solver": opciones_solver, **extra},
+        sort_keys=True, default=str
+    ).encode())
+    for nombre in sorted(hojas):
+        df = hojas[nombre]
+        h.update(nombre.encode())
+        h.update(json.dumps([str(c) for c in df.columns]).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+class CacheResultados:
+    """Resultados ya resueltos indexados por huella (un JSON por entrada y etapa).
+
+    Los archivos de salida se copian junto a la entrada y se restauran en cada
+    acierto: sus nombres no incluyen todas las claves de la huella (p. ej. el
+    criterio), así que lo que haya en disco puede ser de otra corrida.
+    """
+
+    def __init__(self, etapa, directorio=None):
+        self.directorio = os.path.join(directorio or DIR_CACHE, etapa)
+
+    def _ruta(self, huella):
+        return os.path.join(self.directorio, huella[:2], f"{huella}.json")
+
+    def _dir_copias(self, huella):
+        return os.path.join(self.directorio, huella[:2], huella)
+
+    def obtener(self, huella):
+        """Entrada guardada para la huella (con sus archivos restaurados), o None"""
+        try:
+            with open(self._ruta(huella), encoding="utf-8") as f:
+                entrada = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada de cache ilegible {huella}: {e}")
+            return None
+        archivos = entrada.get("archivos", [])
+        copias = entrada.get("copias", [])
+        if len(copias) != len(archivos):
+            return None  # entrada sin copias de sus salidas: se vuelve a resolver
+        copias = [os.path.join(self._dir_copias(huella), c) for c in copias]
+        if not all(os.path.exists(c) for c in copias):
+            return None
+        try:
+            for copia, destino in zip(copias, archivos):
+                os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+                shutil.copy2(copia, destino)
+        except OSError as e:
+            logger.warning(f"No se pudieron restaurar los archivos de {huella}: {e}")
+            return None
+        return entrada
+
+    def guardar(self, huella, entrada):
+        ruta = self._ruta(huella)
+        directorio = self._dir_copias(huella)
+        os.makedirs(directorio, exist_ok=True)
+        copias = []
+        for i, archivo in enumerate(entrada.get("archivos", [])):
+            nombre = f"{i}_{os.path.basename(archivo)}"
+            shutil.copy2(archivo, os.path.join(directorio, nombre))
+            copias.append(nombre)
+        entrada = {**entrada, "copias": copias}
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(entrada, f, default=str)
+        os.replace(temporal, ruta)
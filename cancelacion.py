@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import time
+import logging
+import contextlib
+
+import progreso
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto (s) se consulta realmente si se pidió cancelar el trabajo
+INTERVALO_VERIFICACION = 0.25
+# Cada cuánto (s) como máximo se emite el gap de la resolución en curso (evento gap_mip)
+INTERVALO_GAP = 2.0
+
+_verificador = None
+_ultima_verificacion = 0.0
+_solicitada = False
+_ultimo_gap = (0.0, None)
+
+
+@contextlib.contextmanager
+def contexto(verificador):
+    """Activa `verificador()` (True si hay que cancelar) para el trabajo en curso"""
+    global _verificador, _ultima_verificacion, _solicitada, _ultimo_gap
+    _verificador, _ultima_verificacion, _solicitada, _ultimo_gap = verificador, 0.0, False, (0.0, None)
+    try:
+        yield
+    finally:
+        _verificador, _ultima_verificacion, _solicitada = None, 0.0, False
+
+
+def solicitada():
+    """True si se pidió cancelar el trabajo en curso (consulta acotada a INTERVALO_VERIFICACION)"""
+    global _ultima_verificacion, _solicitada
+    if _solicitada or _verificador is None:
+        return _solicitada
+    ahora = time.monotonic()
+    if ahora - _ultima_verificacion >= INTERVALO_VERIFICACION:
+        _ultima_verificacion = ahora
+        try:
+            _solicitada = bool(_verificador())
+        except Exception as e:
+            logger.warning(f"No se pudo verificar la cancelación: {e}")
+        if _solicitada:
+            logger.warning("Cancelación solicitada; deteniendo el trabajo")
+    return _solicitada
+
+
+def callback_gurobi(cb_m, cb_opt, cb_where):
+    """Callback para gurobi_persistent: interrumpe la optimización si se canceló el trabajo
+    y, mientras tanto, emite el gap MIP (incumbente y cota) de la resolución en curso"""
+    if solicitada():
+        cb_opt._solver_model.terminate()
+        return
+    _emitir_gap(cb_opt, cb_where)
+
+
+def _emitir_gap(cb_opt, cb_where):
+    global _ultimo_gap
+    from gurobipy import GRB
+
+    if cb_where == GRB.Callback.MIP:
+        consultas = (GRB.Callback.MIP_OBJBST, GRB.Callback.MIP_OBJBND)
+    elif cb_where == GRB.Callback.MIPNODE:
+        consultas = (GRB.Callback.MIPNODE_OBJBST, GRB.Callback.MIPNODE_OBJBND)
+    else:
+        return
+    ahora = time.monotonic()
+    if ahora - _ultimo_gap[0] < INTERVALO_GAP:
+        return
+    incumbente, cota = (cb_opt.cbGet(consulta) for consulta in consultas)
+    gap = progreso.gap_relativo(incumbente, cota)
+    if gap is None or gap == _ultimo_gap[1]:
+        return
+    _ultimo_gap = (ahora, gap)
+    progreso.emitir("gap_mip", gap=gap, incumbente=incumbente, cota=cota)
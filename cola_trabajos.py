@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+import contextlib
+from datetime import datetime, timedelta
+from paginacion import codificar_cursor, decodificar_cursor
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RUTA_COLA = os.getenv(
+    "COLA_TRABAJOS_DB", os.path.join(BASE_DIR, "resultados_generados", "cola_trabajos.sqlite3")
+)
+
+PENDIENTE = "pendiente"
+EJECUTANDO = "ejecutando"
+COMPLETADO = "completado"
+ERROR = "error"
+CANCELADO = "cancelado"
+ACTIVOS = (PENDIENTE, EJECUTANDO)
+TERMINADOS = (COMPLETADO, ERROR, CANCELADO)
+
+# Retención de trabajos terminados: antigüedad máxima y cantidad máxima
+TTL_TRABAJOS = int(os.getenv("TTL_TRABAJOS_HORAS", str(7 * 24)))
+MAX_TRABAJOS_TERMINADOS = int(os.getenv("MAX_TRABAJOS_TERMINADOS", "1000"))
+
+# Columnas del listado resumido (sin parámetros, resultado ni traza de error)
+COLUMNAS_RESUMEN = ("id_tarea", "tipo", "estado", "progreso", "mensaje", "prioridad",
+                    "fecha_inicio", "fecha_ejecucion", "fecha_fin")
+
+# Parámetros que no cambian el resultado y por tanto no entran en la huella
+CAMPOS_SIN_HUELLA = {"prioridad"}
+
+
+def calcular_huella(tipo, parametros):
+    """Huella estable de una solicitud para deduplicar trabajos idénticos"""
+    relevantes = {k: v for k, v in parametros.items() if k not in CAMPOS_SIN_HUELLA}
+    crudo = json.dumps({"tipo": tipo, "parametros": relevantes}, sort_keys=True, default=str)
+    return hashlib.sha256(crudo.encode()).hexdigest()
+
+
+class ColaTrabajos:
+    """Cola de trabajos durable en SQLite con prioridades, concurrencia máxima y deduplicación"""
+
+    def __init__(self, ruta=None, max_concurrencia=None):
+        self.ruta = ruta or RUTA_COLA
+        self.max_concurrencia = max_concurrencia or int(os.getenv("MAX_CONCURRENCIA", "2"))
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS trabajos (
+                    id_tarea TEXT PRIMARY KEY,
+                    tipo TEXT NOT NULL,
+                    huella TEXT NOT NULL,
+                    parametros TEXT NOT NULL,
+                    prioridad INTEGER NOT NULL DEFAULT 0,
+                    estado TEXT NOT NULL,
+                    progreso INTEGER NOT NULL DEFAULT 0,
+                    mensaje TEXT,
+                    resultado TEXT,
+                    error TEXT,
+                    fecha_inicio TEXT NOT NULL,
+                    fecha_ejecucion TEXT,
+                    fecha_fin TEXT,
+                    cancelacion_solicitada INTEGER NOT NULL DEFAULT 0,
+                    artefactos TEXT
+                )
+            """)
+            columnas = {c["name"] for c in conn.execute("PRAGMA table_info(trabajos)")}
+            if "cancelacion_solicitada" not in columnas:
+                conn.execute(
+                    "ALTER TABLE trabajos ADD COLUMN cancelacion_solicitada INTEGER NOT NULL DEFAULT 0"
+                )
+            if "artefactos" not in columnas:
+                conn.execute("ALTER TABLE trabajos ADD COLUMN artefactos TEXT")
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_trabajos_pendientes
+                ON trabajos (estado, prioridad DESC, fecha_inicio)
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_huella ON trabajos (huella, estado)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_listado ON trabajos (fecha_inicio, id_tarea)")
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextlib.contextmanager
+    def _transaccion(self):
+        """Transacción con bloqueo de escritura (serializa encolar/tomar entre procesos)"""
+        with self._conectar() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _a_dict(fila):
+        if fila is None:
+            return None
+        trabajo = dict(fila)
+        trabajo["parametros"] = json.loads(trabajo["parametros"])
+        trabajo["resultado"] = json.loads(trabajo["resultado"]) if trabajo["resultado"] else None
+        # [(nombre relativo, ruta absoluta)] de los archivos que produjo el trabajo
+        trabajo["artefactos"] = [tuple(a) for a in json.loads(trabajo["artefactos"])] if trabajo["artefactos"] else []
+        return trabajo
+
+    def encolar(self, id_tarea, tipo, parametros, prioridad=0):
+        """Encola un trabajo; si hay uno idéntico pendiente o ejecutando devuelve ese.
+
+        Retorna (id_tarea, nuevo).
+        """
+        huella = calcular_huella(tipo, parametros)
+        with self._transaccion() as conn:
+            existente = conn.execute(
+                """SELECT id_tarea FROM trabajos
+                   WHERE huella = ? AND estado IN (?, ?) AND cancelacion_solicitada = 0""",
+                (huella, *ACTIVOS)
+            ).fetchone()
+            if existente:
+                return existente["id_tarea"], False
+            conn.execute("""
+                INSERT INTO trabajos
+                (id_tarea, tipo, huella, parametros, prioridad, estado, mensaje, fecha_inicio)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (id_tarea, tipo, huella, json.dumps(parametros, default=str), prioridad,
+                  PENDIENTE, "Tarea en cola", datetime.now().isoformat()))
+        return id_tarea, True
+
+    def tomar_siguiente(self):
+        """Marca como ejecutando el pendiente de mayor prioridad si hay capacidad libre"""
+        with self._transaccion() as conn:
+            ejecutando = conn.execute(
+                "SELECT COUNT(*) FROM trabajos WHERE estado = ?", (EJECUTANDO,)
+            ).fetchone()[0]
+            if ejecutando >= self.max_concurrencia:
+                return None
+            fila = conn.execute("""
+                SELECT * FROM trabajos WHERE estado = ?
+                ORDER BY prioridad DESC, fecha_inicio
+                LIMIT 1
+            """, (PENDIENTE,)).fetchone()
+            if fila is None:
+                return None
+            conn.execute("""
+                UPDATE trabajos SET estado = ?, mensaje = ?, fecha_ejecucion = ?
+                WHERE id_tarea = ?
+            """, (EJECUTANDO, "Iniciando optimización...", datetime.now().isoformat(), fila["id_tarea"]))
+        trabajo = self._a_dict(fila)
+        trabajo["estado"] = EJECUTANDO
+        return trabajo
+
+    def actualizar(self, id_tarea, **campos):
+        """Actualiza campos de un trabajo (resultado y artefactos se serializan a JSON)"""
+        for campo in ("resultado", "artefactos"):
+            if campos.get(campo) is not None:
+                campos[campo] = json.dumps(campos[campo], default=str)
+        for campo in ("fecha_fin",):
+            if isinstance(campos.get(campo), datetime):
+                campos[campo] = campos[campo].isoformat()
+        asignaciones = ", ".join(f"{campo} = ?" for campo in campos)
+        with self._conectar() as conn:
+            conn.execute(
+                f"UPDATE trabajos SET {asignaciones} WHERE id_tarea = ?",
+                (*campos.values(), id_tarea)
+            )
+
+    def obtener(self, id_tarea):
+        with self._conectar() as conn:
+            return self._a_dict(conn.execute(
+                "SELECT * FROM trabajos WHERE id_tarea = ?", (id_tarea,)
+            ).fetchone())
+
+    def listar(self, estado=None, cursor=None, limite=50):
+        """Página de resúmenes, del más reciente al más antiguo (paginación por keyset)"""
+        condiciones, valores = [], []
+        if estado is not None:
+            condiciones.append("estado = ?")
+            valores.append(estado)
+        if cursor is not None:
+            fecha, id_tarea = decodificar_cursor(cursor)
+            condiciones.append("(fecha_inicio, id_tarea) < (?, ?)")
+            valores.extend([fecha, id_tarea])
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        with self._conectar() as conn:
+            filas = [dict(f) for f in conn.execute(f"""
+                SELECT {', '.join(COLUMNAS_RESUMEN)} FROM trabajos {where}
+                ORDER BY fecha_inicio DESC, id_tarea DESC
+                LIMIT ?
+            """, (*valores, limite + 1))]
+        siguiente = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = codificar_cursor([filas[-1]["fecha_inicio"], filas[-1]["id_tarea"]])
+        return {"items": filas, "siguiente_cursor": siguiente, "limite": limite}
+
+    def contar(self, estado):
+        with self._conectar() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM trabajos WHERE estado = ?", (estado,)
+            ).fetchone()[0]
+
+    def eliminar(self, id_tarea):
+        """Elimina un trabajo que no está ejecutando.
+
+        Uno en ejecución se conserva: su fila cuenta para la concurrencia hasta
+        que el proceso termina y registra el resultado.
+        """
+        with self._conectar() as conn:
+            return conn.execute(
+                "DELETE FROM trabajos WHERE id_tarea = ? AND estado != ?", (id_tarea, EJECUTANDO)
+            ).rowcount > 0
+
+    def purgar(self, ttl_horas=None, max_terminados=None):
+        """Elimina los trabajos terminados más antiguos que el TTL o que excedan el máximo.
+
+        Retorna los id_tarea eliminados (para limpiar sus logs y eventos).
+        """
+        ttl_horas = TTL_TRABAJOS if ttl_horas is None else ttl_horas
+        max_terminados = MAX_TRABAJOS_TERMINADOS if max_terminados is None else max_terminados
+        limite_fecha = (datetime.now() - timedelta(hours=ttl_horas)).isoformat()
+        marcadores = ", ".join("?" for _ in TERMINADOS)
+        with self._transaccion() as conn:
+            ids = [f["id_tarea"] for f in conn.execute(f"""
+                SELECT id_tarea FROM trabajos
+                WHERE estado IN ({marcadores}) AND fecha_fin < ?
+                UNION
+                SELECT id_tarea FROM (
+                    SELECT id_tarea FROM trabajos WHERE estado IN ({marcadores})
+                    ORDER BY fecha_fin DESC LIMIT -1 OFFSET ?
+                )
+            """, (*TERMINADOS, limite_fecha, *TERMINADOS, max_terminados))]
+            conn.executemany("DELETE FROM trabajos WHERE id_tarea = ?", [(i,) for i in ids])
+        if ids:
+            logger.info(f"{len(ids)} trabajos terminados purgados de la cola")
+        return ids
+
+    def cancelar(self, id_tarea):
+        """Cancela un trabajo pendiente o pide la cancelación de uno en ejecución.
+
+        Un trabajo en ejecución sigue contando para la concurrencia hasta que
+        su proceso se detiene y registra el resultado parcial. Retorna el estado
+        resultante (None si no existe).
+        """
+        with self._transaccion() as conn:
+            fila = conn.execute(
+                "SELECT estado FROM trabajos WHERE id_tarea = ?", (id_tarea,)
+            ).fetchone()
+            if fila is None:
+                return None
+            if fila["estado"] == PENDIENTE:
+                conn.execute("""
+                    UPDATE trabajos SET estado = ?, mensaje = ?, fecha_fin = ?, cancelacion_solicitada = 1
+                    WHERE id_tarea = ?
+                """, (CANCELADO, "Cancelada antes de iniciar", datetime.now().isoformat(), id_tarea))
+                return CANCELADO
+            if fila["estado"] == EJECUTANDO:
+                conn.execute("""
+                    UPDATE trabajos SET cancelacion_solicitada = 1, mensaje = ?
+                    WHERE id_tarea = ?
+                """, ("Cancelación solicitada", id_tarea))
+            return fila["estado"]
+
+    def cancelacion_solicitada(self, id_tarea):
+        """True si se pidió cancelar el trabajo (o si ya no existe en la cola)"""
+        with self._conectar() as conn:
+            fila = conn.execute(
+                "SELECT cancelacion_solicitada FROM trabajos WHERE id_tarea = ?", (id_tarea,)
+            ).fetchone()
+        return fila is None or bool(fila["cancelacion_solicitada"])
+
+    def recuperar_interrumpidos(self):
+        """Devuelve a la cola los trabajos que quedaron ejecutando tras un reinicio"""
+        with self._conectar() as conn:
+            conn.execute("""
+                UPDATE trabajos SET estado = ?, mensaje = ?, fecha_fin = ?
+                WHERE estado = ? AND cancelacion_solicitada = 1
+            """, (CANCELADO, "Cancelada (interrumpida por reinicio)", datetime.now().isoformat(), EJECUTANDO))
+            n = conn.execute("""
+                UPDATE trabajos SET estado = ?, mensaje = ?
+                WHERE estado = ?
+            """, (PENDIENTE, "Reencolada tras reinicio", EJECUTANDO)).rowcount
+        if n:
+            logger.warning(f"{n} trabajos interrumpidos devueltos a la cola")
+        return n
+
+
+class Despachador:
+    """Hilo que toma trabajos de la cola respetando la concurrencia y los lanza.
+
+    `lanzar(trabajo)` debe devolver un Future; `completar(trabajo, futuro)` se
+    llama cuando termina y es responsable de registrar el resultado en la cola.
+    """
+
+    def __init__(self, cola, lanzar, completar, intervalo=1.0):
+        self.cola = cola
+        self.lanzar = lanzar
+        self.completar = completar
+        self.intervalo = intervalo
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self.cola.recuperar_interrumpidos()
+        self._hilo = threading.Thread(target=self._bucle, name="despachador", daemon=True)
+        self._hilo.start()
+
+    def notificar(self):
+        self._despertar.set()
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                trabajo = self.cola.tomar_siguiente()
+            except Exception as e:
+                logger.error(f"Error leyendo la cola de trabajos: {e}")
+                trabajo = None
+            if trabajo is None:
+                self._despertar.wait(self.intervalo)
+                self._despertar.clear()
+                continue
+            try:
+                futuro = self.lanzar(trabajo)
+            except Exception as e:
+                logger.error(f"No se pudo lanzar la tarea {trabajo['id_tarea']}: {e}")
+                self.cola.actualizar(trabajo["id_tarea"], estado=ERROR, error=str(e),
+                                     mensaje="Error inesperado", fecha_fin=datetime.now())
+                continue
+            futuro.add_done_callback(lambda f, t=trabajo: self._terminado(t, f))
+
+    def _terminado(self, trabajo, futuro):
+        try:
+            self.completar(trabajo, futuro)
+        except Exception as e:
+            logger.error(f"Error registrando el fin de la tarea {trabajo['id_tarea']}: {e}")
+        finally:
+            self.notificar()
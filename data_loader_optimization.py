@@ -10,9 +10,17 @@ import logging
 from pathlib import Path
 from typing import Optional, Dict, Any
 import json
+from resultado_gruas import ResultadoGruas
 
 logger = logging.getLogger(__name__)
 
+
+def _columna(df: pd.DataFrame, nombre: str, defecto) -> pd.Series:
+    """Columna del DataFrame o una serie constante si la hoja no la trae"""
+    if nombre in df.columns:
+        return df[nombre]
+    return pd.Series(defecto, index=df.index)
+
 class OptimizationDataLoader:
     def __init__(self):
         # Crear conexión a la base de datos
@@ -54,174 +62,158 @@ class OptimizationDataLoader:
             return None
     
     def cargar_resultado_coloracion(self, semana: str, participacion: int, archivo_distancias: str) -> Dict:
-        """Carga los resultados del modelo de coloración a la base de datos"""
+        """Carga los resultados del modelo de coloración a la base de datos.
+
+        La corrida, sus metadatos y sus filas hijas se registran en una sola
+        sentencia (INSERT ... ON CONFLICT DO NOTHING RETURNING con CTEs), por lo
+        que varios loaders en paralelo no duplican corridas.
+        """
         fecha_obj = datetime.strptime(semana, '%Y-%m-%d')
         num_semana = fecha_obj.isocalendar()[1]
         
         # Determinar si es con dispersión basándose en el nombre del archivo
         con_dispersion = '_K' in archivo_distancias
         
-        # Verificar si ya existe
-        run_existente = self.verificar_run_existente(semana, participacion, con_dispersion)
-        if run_existente:
-            logger.warning(f"Ya existe un run para esta configuración. ID: {run_existente['id']}")
-            return run_existente
+        # Leer archivo de resultados
+        archivo_resultado = os.path.join(
+            "resultados_generados", "resultados_magdalena", semana,
+            f"resultado_{semana}_{participacion}_{'K' if con_dispersion else 'N'}.xlsx"
+        )
+        
+        general, ocupacion, workload = [], [], []
+        total_bloques = periodos = None
+        if os.path.exists(archivo_resultado):
+            hojas = pd.read_excel(archivo_resultado, sheet_name=None)
+            
+            # Hoja General
+            if 'General' in hojas:
+                df_general = hojas['General'].dropna(subset=['Bloque'])
+                general = pd.DataFrame({
+                    'bloque': df_general['Bloque'].astype(str),
+                    'periodo': _columna(df_general, 'Periodo', 0).astype(int),
+                    'segregacion': _columna(df_general, 'Segregación', '').astype(str),
+                    'recepcion': _columna(df_general, 'Recepción', 0).astype(int),
+                    'carga': _columna(df_general, 'Carga', 0).astype(int),
+                    'descarga': _columna(df_general, 'Descarga', 0).astype(int),
+                    'entrega': _columna(df_general, 'Entrega', 0).astype(int)
+                }).to_dict('records')
+                total_bloques = len({f['bloque'] for f in general})
+                periodos = max((f['periodo'] for f in general), default=0)
+            
+            # Ocupación Bloques
+            if 'Ocupación Bloques' in hojas:
+                df_ocupacion = hojas['Ocupación Bloques'].dropna(subset=['Bloque'])
+                ocupacion = pd.DataFrame({
+                    'bloque': df_ocupacion['Bloque'].astype(str),
+                    'periodo': _columna(df_ocupacion, 'Periodo', 0).astype(int),
+                    'volumen_teus': _columna(df_ocupacion, 'Volumen bloques (TEUs)', 0).astype(float),
+                    'capacidad_bloque': _columna(df_ocupacion, 'Capacidad Bloque', 1155).astype(float)
+                }).to_dict('records')
+            
+            # Workload
+            if 'Workload bloques' in hojas:
+                df_workload = hojas['Workload bloques'].dropna(subset=['Bloque'])
+                workload = pd.DataFrame({
+                    'bloque': df_workload['Bloque'].astype(str),
+                    'periodo': _columna(df_workload, 'Periodo', 0).astype(int),
+                    'carga_trabajo': _columna(df_workload, 'Carga de trabajo', 0).astype(float)
+                }).to_dict('records')
         
         with self.Session() as session:
             try:
-                # Crear nueva corrida
                 result = session.execute(text("""
-                    INSERT INTO magdalena_runs (semana, participacion, con_dispersion)
-                    VALUES (:semana, :participacion, :con_dispersion)
-                    RETURNING id
+                    WITH run AS (
+                        INSERT INTO magdalena_runs
+                        (semana, participacion, con_dispersion, total_bloques, periodos)
+                        VALUES (:semana, :participacion, :con_dispersion, :total_bloques, :periodos)
+                        ON CONFLICT (semana, participacion, con_dispersion) DO NOTHING
+                        RETURNING id
+                    ),
+                    general AS (
+                        INSERT INTO magdalena_general 
+                        (run_id, bloque, periodo, segregacion, recepcion, carga, descarga, entrega)
+                        SELECT run.id, x.bloque, x.periodo, x.segregacion, x.recepcion,
+                               x.carga, x.descarga, x.entrega
+                        FROM run, jsonb_to_recordset(CAST(:general AS jsonb))
+                             AS x(bloque TEXT, periodo INTEGER, segregacion TEXT, recepcion INTEGER,
+                                  carga INTEGER, descarga INTEGER, entrega INTEGER)
+                    ),
+                    ocupacion AS (
+                        INSERT INTO magdalena_ocupacion
+                        (run_id, bloque, periodo, volumen_teus, capacidad_bloque)
+                        SELECT run.id, x.bloque, x.periodo, x.volumen_teus, x.capacidad_bloque
+                        FROM run, jsonb_to_recordset(CAST(:ocupacion AS jsonb))
+                             AS x(bloque TEXT, periodo INTEGER, volumen_teus FLOAT, capacidad_bloque FLOAT)
+                    ),
+                    workload AS (
+                        INSERT INTO magdalena_workload
+                        (run_id, bloque, periodo, carga_trabajo)
+                        SELECT run.id, x.bloque, x.periodo, x.carga_trabajo
+                        FROM run, jsonb_to_recordset(CAST(:workload AS jsonb))
+                             AS x(bloque TEXT, periodo INTEGER, carga_trabajo FLOAT)
+                    )
+                    SELECT id FROM run
                 """), {
                     'semana': num_semana,
                     'participacion': participacion,
-                    'con_dispersion': con_dispersion
+                    'con_dispersion': con_dispersion,
+                    'total_bloques': total_bloques,
+                    'periodos': periodos,
+                    'general': json.dumps(general),
+                    'ocupacion': json.dumps(ocupacion),
+                    'workload': json.dumps(workload)
                 })
                 run_id = result.scalar()
-                
-                # Leer archivo de resultados
-                archivo_resultado = os.path.join(
-                    "resultados_generados", "resultados_magdalena", semana,
-                    f"resultado_{semana}_{participacion}_{'K' if con_dispersion else 'N'}.xlsx"
-                )
-                
-                if os.path.exists(archivo_resultado):
-                    excel_data = pd.ExcelFile(archivo_resultado)
-                    
-                    # Cargar hoja General
-                    if 'General' in excel_data.sheet_names:
-                        df_general = pd.read_excel(archivo_resultado, sheet_name='General')
-                        bloques_set = set()
-                        periodos_set = set()
-                        
-                        for _, row in df_general.iterrows():
-                            if pd.notna(row.get('Bloque')):
-                                session.execute(text("""
-                                    INSERT INTO magdalena_general 
-                                    (run_id, bloque, periodo, segregacion, recepcion, carga, descarga, entrega)
-                                    VALUES (:run_id, :bloque, :periodo, :segregacion, :recepcion, :carga, :descarga, :entrega)
-                                """), {
-                                    'run_id': run_id,
-                                    'bloque': str(row['Bloque']),
-                                    'periodo': int(row.get('Periodo', 0)),
-                                    'segregacion': str(row.get('Segregación', '')),
-                                    'recepcion': int(row.get('Recepción', 0)),
-                                    'carga': int(row.get('Carga', 0)),
-                                    'descarga': int(row.get('Descarga', 0)),
-                                    'entrega': int(row.get('Entrega', 0))
-                                })
-                                bloques_set.add(str(row['Bloque']))
-                                periodos_set.add(int(row.get('Periodo', 0)))
-                        
-                        # Actualizar metadatos
-                        session.execute(text("""
-                            UPDATE magdalena_runs 
-                            SET total_bloques = :total_bloques, periodos = :periodos
-                            WHERE id = :run_id
-                        """), {
-                            'run_id': run_id,
-                            'total_bloques': len(bloques_set),
-                            'periodos': max(periodos_set) if periodos_set else 0
-                        })
-                    
-                    # Cargar Ocupación Bloques
-                    if 'Ocupación Bloques' in excel_data.sheet_names:
-                        df_ocupacion = pd.read_excel(archivo_resultado, sheet_name='Ocupación Bloques')
-                        for _, row in df_ocupacion.iterrows():
-                            if pd.notna(row.get('Bloque')):
-                                session.execute(text("""
-                                    INSERT INTO magdalena_ocupacion
-                                    (run_id, bloque, periodo, volumen_teus, capacidad_bloque)
-                                    VALUES (:run_id, :bloque, :periodo, :volumen_teus, :capacidad_bloque)
-                                """), {
-                                    'run_id': run_id,
-                                    'bloque': str(row['Bloque']),
-                                    'periodo': int(row.get('Periodo', 0)),
-                                    'volumen_teus': float(row.get('Volumen bloques (TEUs)', 0)),
-                                    'capacidad_bloque': float(row.get('Capacidad Bloque', 1155))
-                                })
-                    
-                    # Cargar Workload
-                    if 'Workload bloques' in excel_data.sheet_names:
-                        df_workload = pd.read_excel(archivo_resultado, sheet_name='Workload bloques')
-                        for _, row in df_workload.iterrows():
-                            if pd.notna(row.get('Bloque')):
-                                session.execute(text("""
-                                    INSERT INTO magdalena_workload
-                                    (run_id, bloque, periodo, carga_trabajo)
-                                    VALUES (:run_id, :bloque, :periodo, :carga_trabajo)
-                                """), {
-                                    'run_id': run_id,
-                                    'bloque': str(row['Bloque']),
-                                    'periodo': int(row.get('Periodo', 0)),
-                                    'carga_trabajo': float(row.get('Carga de trabajo', 0))
-                                })
-                    
                 session.commit()
-                logger.info(f"Resultados de coloración cargados. Run ID: {run_id}")
-                
-                return {
-                    'id': str(run_id),
-                    'semana': num_semana,
-                    'participacion': participacion,
-                    'con_dispersion': con_dispersion,
-                    'archivo_procesado': archivo_resultado
-                }
                 
             except Exception as e:
                 session.rollback()
                 logger.error(f"Error cargando resultados: {e}")
                 raise
+        
+        if run_id is None:
+            # Otra corrida (posiblemente concurrente) ya registró esta configuración
+            run_existente = self.verificar_run_existente(semana, participacion, con_dispersion)
+            logger.warning(f"Ya existe un run para esta configuración. ID: {run_existente['id']}")
+            return run_existente
+        
+        logger.info(f"Resultados de coloración cargados. Run ID: {run_id}")
+        return {
+            'id': str(run_id),
+            'semana': num_semana,
+            'participacion': participacion,
+            'con_dispersion': con_dispersion,
+            'archivo_procesado': archivo_resultado
+        }
     
-    def cargar_resultado_gruas(self, semana: str, turno: int, participacion: int, archivo_resultado: str):
-        """Carga los resultados del modelo de grúas"""
-        fecha_obj = datetime.strptime(semana, '%Y-%m-%d')
+    def cargar_resultado_gruas(self, resultado: ResultadoGruas):
+        """Carga el resultado estructurado del modelo de grúas (sin releer Excel)"""
+        fecha_obj = datetime.strptime(resultado.semana, '%Y-%m-%d')
         num_semana = fecha_obj.isocalendar()[1]
+        turno = resultado.turno
+        participacion = resultado.participacion
         
         with self.Session() as session:
             try:
-                # Verificar si ya existe
                 result = session.execute(text("""
-                    SELECT COUNT(*) FROM camila_runs
-                    WHERE semana = :semana AND turno = :turno AND participacion = :participacion
-                """), {
-                    'semana': num_semana,
-                    'turno': turno,
-                    'participacion': participacion
-                })
-                
-                if result.scalar() > 0:
-                    logger.warning(f"Ya existe resultado de grúas para S{num_semana}_T{turno}_P{participacion}")
-                    return
-                
-                # Leer archivo de resultados
-                df_resultado = pd.read_excel(archivo_resultado)
-                
-                # Extraer métricas clave
-                min_diff_val = None
-                gruas_utilizadas = 0
-                
-                for _, row in df_resultado.iterrows():
-                    if row['var'] == 'min_diff_val':
-                        min_diff_val = float(row['val'])
-                    elif row['var'] == 'ygbt':
-                        gruas_utilizadas += 1
-                
-                # Insertar en la base de datos
-                session.execute(text("""
                     INSERT INTO camila_runs 
                     (semana, turno, participacion, min_diff_val, gruas_utilizadas, fecha_carga)
                     VALUES (:semana, :turno, :participacion, :min_diff_val, :gruas_utilizadas, NOW())
+                    ON CONFLICT (semana, turno, participacion) DO NOTHING
+                    RETURNING semana
                 """), {
                     'semana': num_semana,
                     'turno': turno,
                     'participacion': participacion,
-                    'min_diff_val': min_diff_val,
-                    'gruas_utilizadas': gruas_utilizadas
+                    'min_diff_val': resultado.min_diff_val,
+                    'gruas_utilizadas': resultado.gruas_utilizadas
                 })
                 
+                if result.scalar() is None:
+                    session.rollback()
+                    logger.warning(f"Ya existe resultado de grúas para S{num_semana}_T{turno}_P{participacion}")
+                    return
+                
                 session.commit()
                 logger.info(f"Resultado de grúas cargado para S{num_semana}_T{turno}_P{participacion}")
                 
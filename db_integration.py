@@ -2,16 +2,142 @@
 # coding: utf-8
 
 import os
-import pandas as pd
+import json
 from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Float, DateTime, Date, JSON, text
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from datetime import datetime, date
 import logging
+from paginacion import codificar_cursor, decodificar_cursor, HISTORIAL
 
 logger = logging.getLogger(__name__)
 
+# Migraciones de esquema versionadas. Cada una se aplica una sola vez y queda
+# registrada en optimization_schema_migrations. Las que dependen de tablas
+# externas (magdalena_runs, camila_runs) se posponen hasta que esas tablas existan.
+MIGRACIONES = [
+    {
+        'version': 1,
+        'descripcion': 'Índices compuestos para historial de resultados de optimización',
+        'tablas': ['optimization_coloracion_results', 'optimization_gruas_results',
+                   'optimization_semanas_procesadas', 'optimization_segregaciones'],
+        'sql': [
+            """CREATE INDEX IF NOT EXISTS idx_coloracion_participacion_semana
+               ON optimization_coloracion_results (participacion, semana, id)""",
+            """CREATE INDEX IF NOT EXISTS idx_gruas_participacion_semana_turno
+               ON optimization_gruas_results (participacion, semana, turno, id)""",
+            """CREATE INDEX IF NOT EXISTS idx_semanas_participacion_semana
+               ON optimization_semanas_procesadas (participacion, semana, id)""",
+            """CREATE INDEX IF NOT EXISTS idx_semanas_pendientes
+               ON optimization_semanas_procesadas (participacion, semana)
+               WHERE coloracion_factible = true AND gruas_procesado = false""",
+            """CREATE INDEX IF NOT EXISTS idx_segregaciones_semana
+               ON optimization_segregaciones (semana, segregacion)""",
+            # Orden del keyset del historial, para las consultas sin participación
+            """CREATE INDEX IF NOT EXISTS idx_coloracion_semana_id
+               ON optimization_coloracion_results (semana, id)""",
+            """CREATE INDEX IF NOT EXISTS idx_gruas_semana_turno_id
+               ON optimization_gruas_results (semana, turno, id)""",
+            """CREATE INDEX IF NOT EXISTS idx_semanas_semana_id
+               ON optimization_semanas_procesadas (semana, id)""",
+        ]
+    },
+    {
+        'version': 2,
+        'descripcion': 'Índice de búsqueda de magdalena_runs por semana/participación/dispersión',
+        'tablas': ['magdalena_runs'],
+        'sql': [
+            """CREATE INDEX IF NOT EXISTS idx_magdalena_runs_busqueda
+               ON magdalena_runs (semana, participacion, con_dispersion, fecha_carga DESC)""",
+        ]
+    },
+    {
+        'version': 3,
+        'descripcion': 'Índice de búsqueda de camila_runs por semana/turno/participación',
+        'tablas': ['camila_runs'],
+        'sql': [
+            """CREATE INDEX IF NOT EXISTS idx_camila_runs_busqueda
+               ON camila_runs (semana, turno, participacion)""",
+        ]
+    },
+    {
+        'version': 4,
+        'descripcion': 'Unicidad de magdalena_runs por semana/participación/dispersión (upsert idempotente)',
+        'tablas': ['magdalena_runs', 'magdalena_general', 'magdalena_ocupacion', 'magdalena_workload'],
+        'sql': [
+            # Sin cargas concurrentes entre la limpieza y el índice
+            "LOCK TABLE magdalena_runs IN SHARE ROW EXCLUSIVE MODE",
+            # Corridas duplicadas de antes del índice: se queda la primera cargada, con sus filas
+            """WITH duplicadas AS (
+                   SELECT id FROM (
+                       SELECT id, ROW_NUMBER() OVER (
+                           PARTITION BY semana, participacion, con_dispersion ORDER BY fecha_carga, id
+                       ) AS orden
+                       FROM magdalena_runs
+                   ) r
+                   WHERE orden > 1
+               ),
+               general AS (DELETE FROM magdalena_general WHERE run_id IN (SELECT id FROM duplicadas)),
+               ocupacion AS (DELETE FROM magdalena_ocupacion WHERE run_id IN (SELECT id FROM duplicadas)),
+               workload AS (DELETE FROM magdalena_workload WHERE run_id IN (SELECT id FROM duplicadas))
+               DELETE FROM magdalena_runs WHERE id IN (SELECT id FROM duplicadas)""",
+            """CREATE UNIQUE INDEX IF NOT EXISTS uq_magdalena_runs_config
+               ON magdalena_runs (semana, participacion, con_dispersion)""",
+        ]
+    },
+    {
+        'version': 5,
+        'descripcion': 'Unicidad de camila_runs por semana/turno/participación (upsert idempotente)',
+        'tablas': ['camila_runs'],
+        'sql': [
+            "LOCK TABLE camila_runs IN SHARE ROW EXCLUSIVE MODE",
+            # camila_runs no tiene id propio: los duplicados se distinguen por ctid
+            """DELETE FROM camila_runs WHERE ctid IN (
+                   SELECT ctid FROM (
+                       SELECT ctid, ROW_NUMBER() OVER (
+                           PARTITION BY semana, turno, participacion ORDER BY fecha_carga, ctid
+                       ) AS orden
+                       FROM camila_runs
+                   ) r
+                   WHERE orden > 1
+               )""",
+            """CREATE UNIQUE INDEX IF NOT EXISTS uq_camila_runs_config
+               ON camila_runs (semana, turno, participacion)""",
+        ]
+    },
+    {
+        'version': 6,
+        'descripcion': 'Segregaciones por participación/criterio (una corrida no reemplaza a otra de la misma semana)',
+        'tablas': ['optimization_segregaciones'],
+        'sql': [
+            """ALTER TABLE optimization_segregaciones
+               ADD COLUMN IF NOT EXISTS participacion INTEGER,
+               ADD COLUMN IF NOT EXISTS criterio VARCHAR(50)""",
+            """CREATE INDEX IF NOT EXISTS idx_segregaciones_corrida
+               ON optimization_segregaciones (semana, participacion, criterio)""",
+        ]
+    },
+]
+
+# Hojas del Excel de exportación y la consulta que las alimenta
+HOJAS_EXPORTACION = [
+    ('Coloracion', "SELECT * FROM optimization_coloracion_results ORDER BY semana, participacion"),
+    ('Gruas', "SELECT * FROM optimization_gruas_results ORDER BY semana, turno, participacion"),
+    ('Semanas', "SELECT * FROM optimization_semanas_procesadas ORDER BY semana, participacion"),
+    ('Segregaciones', "SELECT * FROM optimization_segregaciones ORDER BY semana, participacion, criterio, segregacion"),
+]
+
+
+def _valor_excel(valor):
+    """Convierte valores que openpyxl no sabe escribir (JSON, fechas con zona horaria)"""
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, default=str)
+    if isinstance(valor, datetime) and valor.tzinfo is not None:
+        return valor.replace(tzinfo=None)
+    return valor
+
+
 class DatabaseIntegration:
-    def __init__(self):
+    def __init__(self, db_url=None):
         # Obtener configuración de la base de datos desde variables de entorno
         self.db_config = {
             'host': os.getenv('POSTGRES_SERVER', 'localhost'),
@@ -22,7 +148,7 @@ class DatabaseIntegration:
         }
         
         # Crear URL de conexión
-        self.db_url = f"postgresql://{self.db_config['user']}:{self.db_config['password']}@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
+        self.db_url = db_url or f"postgresql://{self.db_config['user']}:{self.db_config['password']}@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
         
         # Crear engine
         self.engine = create_engine(self.db_url)
@@ -67,6 +193,22 @@ class DatabaseIntegration:
                 )
             """))
             
+            # Plan normalizado de grúas por turno (grúa, bloque, hora)
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS optimization_gruas_plan (
+                    id SERIAL PRIMARY KEY,
+                    semana DATE NOT NULL,
+                    turno INTEGER NOT NULL,
+                    participacion INTEGER NOT NULL,
+                    grua VARCHAR(20) NOT NULL,
+                    bloque VARCHAR(20) NOT NULL,
+                    hora INTEGER NOT NULL,
+                    activa BOOLEAN NOT NULL,
+                    inicio BOOLEAN NOT NULL,
+                    UNIQUE(semana, turno, participacion, grua, bloque, hora)
+                )
+            """))
+            
             # Tabla para tracking de semanas procesadas
             conn.execute(text("""
                 CREATE TABLE IF NOT EXISTS optimization_semanas_procesadas (
@@ -85,6 +227,8 @@ class DatabaseIntegration:
                 CREATE TABLE IF NOT EXISTS optimization_segregaciones (
                     id SERIAL PRIMARY KEY,
                     semana DATE NOT NULL,
+                    participacion INTEGER,
+                    criterio VARCHAR(50),
                     segregacion VARCHAR(100) NOT NULL,
                     distancia_total FLOAT,
                     distancia_dlvr FLOAT,
@@ -97,6 +241,50 @@ class DatabaseIntegration:
             
             conn.commit()
             logger.info("Tablas creadas exitosamente")
+
+        self.aplicar_migraciones()
+
+    def aplicar_migraciones(self):
+        """Aplica las migraciones de esquema pendientes (índices, restricciones)"""
+        with self.engine.connect() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS optimization_schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    descripcion VARCHAR(200),
+                    aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            aplicadas = {row[0] for row in conn.execute(text(
+                "SELECT version FROM optimization_schema_migrations"
+            ))}
+            conn.commit()
+
+            for migracion in MIGRACIONES:
+                if migracion['version'] in aplicadas:
+                    continue
+
+                faltantes = [
+                    tabla for tabla in migracion['tablas']
+                    if conn.execute(text("SELECT to_regclass(:tabla)"), {'tabla': tabla}).scalar() is None
+                ]
+                if faltantes:
+                    logger.warning(f"Migración {migracion['version']} pospuesta, faltan tablas: {faltantes}")
+                    continue
+
+                try:
+                    for sentencia in migracion['sql']:
+                        conn.execute(text(sentencia))
+                    conn.execute(text("""
+                        INSERT INTO optimization_schema_migrations (version, descripcion)
+                        VALUES (:version, :descripcion)
+                    """), {'version': migracion['version'], 'descripcion': migracion['descripcion']})
+                    conn.commit()
+                except Exception as e:
+                    # Los cargadores con ON CONFLICT dependen de los índices únicos: sin ellos no se arranca
+                    conn.rollback()
+                    logger.error(f"Migración {migracion['version']} falló: {e}")
+                    raise
+                logger.info(f"Migración {migracion['version']} aplicada: {migracion['descripcion']}")
     
     def guardar_resultado_coloracion(self, semana, participacion, resultado):
         """Guardar resultado de coloración en la base de datos"""
@@ -152,6 +340,68 @@ class DatabaseIntegration:
                 logger.error(f"Error guardando resultado de grúas: {e}")
                 session.rollback()
     
+    def guardar_plan_gruas(self, resultado):
+        """Reemplazar el plan de grúas de un turno en una sola sentencia (ResultadoGruas)"""
+        with self.Session() as session:
+            try:
+                session.execute(text("""
+                    WITH nuevas AS (
+                        SELECT x.grua, x.bloque, x.hora, x.activa, x.inicio
+                        FROM jsonb_to_recordset(CAST(:filas AS jsonb))
+                             AS x(grua VARCHAR, bloque VARCHAR, hora INTEGER, activa BOOLEAN, inicio BOOLEAN)
+                    ),
+                    obsoletas AS (
+                        DELETE FROM optimization_gruas_plan p
+                        WHERE p.semana = :semana AND p.turno = :turno AND p.participacion = :participacion
+                        AND NOT EXISTS (
+                            SELECT 1 FROM nuevas n
+                            WHERE n.grua = p.grua AND n.bloque = p.bloque AND n.hora = p.hora
+                        )
+                    )
+                    INSERT INTO optimization_gruas_plan
+                    (semana, turno, participacion, grua, bloque, hora, activa, inicio)
+                    SELECT :semana, :turno, :participacion, grua, bloque, hora, activa, inicio
+                    FROM nuevas
+                    ON CONFLICT (semana, turno, participacion, grua, bloque, hora)
+                    DO UPDATE SET
+                        activa = EXCLUDED.activa,
+                        inicio = EXCLUDED.inicio
+                """), {
+                    'semana': resultado.semana,
+                    'turno': resultado.turno,
+                    'participacion': resultado.participacion,
+                    'filas': json.dumps(resultado.filas_plan())
+                })
+                session.commit()
+                logger.info(f"Plan de grúas guardado para semana {resultado.semana}, turno {resultado.turno}")
+            except Exception as e:
+                logger.error(f"Error guardando plan de grúas: {e}")
+                session.rollback()
+    
+    def guardar_segregaciones(self, semana, participacion, criterio, filas):
+        """Reemplazar los resultados por segregación de una corrida (semana, participación, criterio)"""
+        with self.Session() as session:
+            try:
+                session.execute(text("""
+                    WITH obsoletas AS (
+                        DELETE FROM optimization_segregaciones
+                        WHERE semana = :semana AND participacion = :participacion AND criterio = :criterio
+                    )
+                    INSERT INTO optimization_segregaciones 
+                    (semana, participacion, criterio, segregacion, distancia_total, distancia_dlvr, 
+                     distancia_load, movimientos_dlvr, movimientos_load)
+                    SELECT :semana, :participacion, :criterio, x.segregacion, x.distancia_total, x.distancia_dlvr,
+                           x.distancia_load, x.movimientos_dlvr, x.movimientos_load
+                    FROM jsonb_to_recordset(CAST(:filas AS jsonb))
+                         AS x(segregacion VARCHAR, distancia_total FLOAT, distancia_dlvr FLOAT,
+                              distancia_load FLOAT, movimientos_dlvr INTEGER, movimientos_load INTEGER)
+                """), {'semana': semana, 'participacion': participacion, 'criterio': criterio,
+                       'filas': json.dumps(filas, default=float)})
+                session.commit()
+            except Exception as e:
+                logger.error(f"Error guardando segregaciones de {semana}: {e}")
+                session.rollback()
+    
     def marcar_semana_procesada(self, semana, participacion, coloracion_factible, gruas_procesado=False):
         """Marcar una semana como procesada"""
         with self.Session() as session:
@@ -189,35 +439,103 @@ class DatabaseIntegration:
             """), {'participacion': participacion})
             return [row[0].strftime('%Y-%m-%d') for row in result]
     
-    def exportar_resultados_a_excel(self, archivo_salida):
-        """Exportar todos los resultados a un archivo Excel"""
-        with pd.ExcelWriter(archivo_salida, engine='openpyxl') as writer:
-            # Exportar resultados de coloración
-            df_coloracion = pd.read_sql("""
-                SELECT * FROM optimization_coloracion_results 
-                ORDER BY semana, participacion
-            """, self.engine)
-            df_coloracion.to_excel(writer, sheet_name='Coloracion', index=False)
-            
-            # Exportar resultados de grúas
-            df_gruas = pd.read_sql("""
-                SELECT * FROM optimization_gruas_results 
-                ORDER BY semana, turno, participacion
-            """, self.engine)
-            df_gruas.to_excel(writer, sheet_name='Gruas', index=False)
-            
-            # Exportar resumen de semanas
-            df_semanas = pd.read_sql("""
-                SELECT * FROM optimization_semanas_procesadas 
-                ORDER BY semana, participacion
-            """, self.engine)
-            df_semanas.to_excel(writer, sheet_name='Semanas', index=False)
-            
-            # Exportar segregaciones
-            df_segregaciones = pd.read_sql("""
-                SELECT * FROM optimization_segregaciones 
-                ORDER BY semana, segregacion
-            """, self.engine)
-            df_segregaciones.to_excel(writer, sheet_name='Segregaciones', index=False)
+    def exportar_resultados_a_excel(self, archivo_salida, tamano_lote=5000):
+        """Exportar todos los resultados a un archivo Excel en modo streaming.
+
+        Cada tabla se lee con un cursor de servidor en lotes de `tamano_lote`
+        filas y se escribe en un libro openpyxl write-only, por lo que la memoria
+        no depende del tamaño de las tablas.
+        """
+        from openpyxl import Workbook
+
+        libro = Workbook(write_only=True)
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(stream_results=True, yield_per=tamano_lote)
+            for hoja, consulta in HOJAS_EXPORTACION:
+                ws = libro.create_sheet(hoja)
+                result = conn.execute(text(consulta))
+                ws.append(list(result.keys()))
+                filas = 0
+                for lote in result.partitions():
+                    for fila in lote:
+                        ws.append([_valor_excel(v) for v in fila])
+                    filas += len(lote)
+                logger.info(f"Hoja {hoja}: {filas} filas exportadas")
+        libro.save(archivo_salida)
         
-        logger.info(f"Resultados exportados a {archivo_salida}")
\ No newline at end of file
+        logger.info(f"Resultados exportados a {archivo_salida}")
+    
+    def listar_historial(self, recurso, anio=None, semana_desde=None, semana_hasta=None,
+                         participacion=None, turno=None, cursor=None, limite=100):
+        """Devuelve una página del historial de un recurso usando paginación por keyset"""
+        if recurso not in HISTORIAL:
+            raise ValueError(f"Recurso desconocido: {recurso}")
+        config = HISTORIAL[recurso]
+        clave = config['clave']
+
+        condiciones = []
+        parametros = {'limite': limite + 1}
+
+        if config['semana'] == 'fecha':
+            if anio is not None:
+                condiciones.append("semana BETWEEN :anio_desde AND :anio_hasta")
+                parametros['anio_desde'] = date(anio, 1, 1)
+                parametros['anio_hasta'] = date(anio, 12, 31)
+            if semana_desde is not None:
+                condiciones.append("semana >= :semana_desde")
+                parametros['semana_desde'] = datetime.strptime(str(semana_desde), '%Y-%m-%d').date()
+            if semana_hasta is not None:
+                condiciones.append("semana <= :semana_hasta")
+                parametros['semana_hasta'] = datetime.strptime(str(semana_hasta), '%Y-%m-%d').date()
+        else:
+            if anio is not None:
+                raise ValueError(f"El filtro por año no aplica a {recurso} (semana ISO sin año)")
+            if semana_desde is not None:
+                condiciones.append("semana >= :semana_desde")
+                parametros['semana_desde'] = int(semana_desde)
+            if semana_hasta is not None:
+                condiciones.append("semana <= :semana_hasta")
+                parametros['semana_hasta'] = int(semana_hasta)
+
+        if participacion is not None:
+            condiciones.append("participacion = :participacion")
+            parametros['participacion'] = participacion
+
+        if turno is not None:
+            if not config['turno']:
+                raise ValueError(f"El filtro por turno no aplica a {recurso}")
+            condiciones.append("turno = :turno")
+            parametros['turno'] = turno
+
+        if cursor:
+            valores = decodificar_cursor(cursor)
+            if len(valores) != len(clave):
+                raise ValueError("Cursor inválido")
+            marcadores = []
+            for i, valor in enumerate(valores):
+                parametros[f'c{i}'] = valor
+                marcadores.append(f":c{i}")
+            condiciones.append(f"({', '.join(clave)}) > ({', '.join(marcadores)})")
+
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        consulta = f"""
+            SELECT {', '.join(config['columnas'])}
+            FROM {config['tabla']}
+            {where}
+            ORDER BY {', '.join(clave)}
+            LIMIT :limite
+        """
+
+        with self.engine.connect() as conn:
+            filas = [dict(row._mapping) for row in conn.execute(text(consulta), parametros)]
+
+        siguiente_cursor = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente_cursor = codificar_cursor(filas[-1][c] for c in clave)
+
+        return {
+            'items': filas,
+            'siguiente_cursor': siguiente_cursor,
+            'limite': limite
+        }
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import os
+import re
+import zipfile
+
+TAMANO_BLOQUE = 256 * 1024
+
+# Formatos que ya vienen comprimidos (un .xlsx es un zip): se guardan sin recomprimir
+EXTENSIONES_COMPRIMIDAS = (".xlsx", ".zip", ".gz")
+
+
+class _SalidaZip:
+    """Destino no posicionable para ZipFile: acumula lo escrito hasta que se consume"""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def stream_zip(artefactos, tamano_bloque=TAMANO_BLOQUE):
+    """Genera un zip al vuelo con [(nombre, ruta)] sin tener el archivo completo en memoria"""
+    salida = _SalidaZip()
+    with zipfile.ZipFile(salida, "w") as zf:
+        for nombre, ruta in artefactos:
+            info = zipfile.ZipInfo.from_file(ruta, nombre)
+            info.compress_type = (zipfile.ZIP_STORED if nombre.lower().endswith(EXTENSIONES_COMPRIMIDAS)
+                                  else zipfile.ZIP_DEFLATED)
+            with open(ruta, "rb") as origen, zf.open(info, "w", force_zip64=True) as destino:
+                while True:
+                    bloque = origen.read(tamano_bloque)
+                    if not bloque:
+                        break
+                    destino.write(bloque)
+                    datos = salida.vaciar()
+                    if datos:
+                        yield datos
+            datos = salida.vaciar()
+            if datos:
+                yield datos
+    # Directorio central
+    datos = salida.vaciar()
+    if datos:
+        yield datos
+
+
+def interpretar_rango(cabecera, tamano):
+    """(inicio, fin) inclusivos para una cabecera Range de un solo tramo.
+
+    Retorna None si no hay cabecera o tiene varios tramos (se sirve el archivo
+    completo) y lanza ValueError si el rango no es satisfacible.
+    """
+    if not cabecera:
+        return None
+    coincidencia = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", cabecera)
+    if coincidencia is None:
+        return None
+    inicio, fin = coincidencia.groups()
+    if inicio == "" and fin == "":
+        return None
+    if inicio == "":
+        # Sufijo: los últimos N bytes
+        largo = int(fin)
+        if largo == 0:
+            raise ValueError("Rango no satisfacible")
+        return max(tamano - largo, 0), tamano - 1
+    inicio = int(inicio)
+    fin = tamano - 1 if fin == "" else min(int(fin), tamano - 1)
+    if inicio >= tamano or inicio > fin:
+        raise ValueError("Rango no satisfacible")
+    return inicio, fin
+
+
+def leer_rango(ruta, inicio, fin, tamano_bloque=TAMANO_BLOQUE):
+    """Genera los bytes [inicio, fin] de un archivo por bloques"""
+    with open(ruta, "rb") as f:
+        f.seek(inicio)
+        restante = fin - inicio + 1
+        while restante > 0:
+            bloque = f.read(min(tamano_bloque, restante))
+            if not bloque:
+                break
+            restante -= len(bloque)
+            yield bloque
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import atexit
+import logging
+
+logger = logging.getLogger(__name__)
+
+_solver = None
+
+
+def solver_persistente():
+    """gurobi_persistent compartido por todas las resoluciones del proceso.
+
+    Es dueño de un gurobipy.Env propio (manage_env=True) que se inicia una sola
+    vez, con el chequeo de licencia incluido. El Env arranca sin parámetros:
+    cada resolución fija los suyos sobre su modelo, así que las opciones de una
+    resolución no se heredan en la siguiente.
+    """
+    global _solver
+    if _solver is None:
+        from pyomo.environ import SolverFactory
+        solver = SolverFactory("gurobi_persistent", manage_env=True)
+        solver.available(exception_flag=True)
+        _solver = solver
+        atexit.register(cerrar)
+        logger.info("Entorno de Gurobi iniciado")
+    return _solver
+
+
+def calentar():
+    """Inicia el entorno de Gurobi del proceso. Retorna False si no se pudo (sin gurobipy o sin licencia)"""
+    try:
+        solver_persistente()
+    except Exception as e:
+        logger.warning(f"No se pudo iniciar el entorno de Gurobi: {e}")
+        return False
+    return True
+
+
+def cerrar():
+    """Libera el modelo, el entorno y la licencia de Gurobi del proceso"""
+    global _solver
+    if _solver is None:
+        return
+    try:
+        _solver.close()
+        # El entorno por defecto lo usa, p.ej., el cálculo de IIS
+        _solver.close_global()
+    except Exception as e:
+        logger.warning(f"Error cerrando el entorno de Gurobi: {e}")
+    _solver = None
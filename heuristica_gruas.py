@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import time
+import random
+import logging
+from dataclasses import dataclass
+
+from pyomo.environ import ConcreteModel, Var, value
+
+from modelo_gruas_maxmin import cargar_datos
+from modelo_gruas_agregado import clases_compatibles, VARIABLES_FLUJO
+
+logger = logging.getLogger("camila")
+
+
+def numero(x):
+    """Valor de un parámetro como número de Python (los de pandas llegan como numpy)"""
+    v = float(value(x))
+    return int(v) if v.is_integer() else v
+
+
+class Instancia:
+    """Datos del turno en diccionarios de Python: la heurística no construye el modelo"""
+
+    def __init__(self, datos):
+        m = ConcreteModel()
+        cargar_datos(m, datos)
+        self.gruas = list(m.G)
+        self.bloques = list(m.B)
+        self.periodos = sorted(m.T)
+        self.B_E = [b for b in m.B if b in m.B_E]
+        self.B_I = [b for b in m.B if b in m.B_I]
+        self.S_E = list(m.S_E)
+        self.S_I = list(m.S_I)
+        self.inv0 = {(b, s): numero(m.AEbs[b,s] + m.AIbs[b,s]) for b in m.B for s in m.S}
+        self.Cbs = {(b, s): numero(m.Cbs[b,s]) for b in m.B for s in m.S}
+        # Solo estas pueden quedar sobre Cbs: las demás parten bajo la capacidad y
+        # descargas y recepciones no la exceden
+        self.sobre_capacidad = [clave for clave, q in self.inv0.items() if q > self.Cbs[clave]]
+        self.entregar = {(b, s): numero(m.AIbs[b,s]) for b in self.B_I for s in self.S_I if value(m.AIbs[b,s]) > 0}
+        self.recibir = {s: numero(m.Gs[s]) for s in self.S_E if value(m.Gs[s]) > 0}
+        self.carga = {(s, t): numero(m.DMEst[s,t]) for s in self.S_E for t in m.T if value(m.DMEst[s,t]) > 0}
+        self.descarga = {(s, t): numero(m.DMIst[s,t]) for s in self.S_I for t in m.T if value(m.DMIst[s,t]) > 0}
+        self.mu = numero(m.mu)
+        self.W = int(value(m.W))
+        self.K = int(value(m.K))
+        self.Rmax = int(value(m.Rmax))
+        self.clases = [set(c) for c in clases_compatibles(m)]
+
+
+@dataclass
+class PlanGruas:
+    """Solución de la heurística: bloque de cada grúa por período (None = sin bloque) y flujos"""
+    rutas: dict
+    flujos: dict
+    min_diff_val: float
+
+
+def dotacion(inst, rutas):
+    n = {(b, t): 0 for b in inst.bloques for t in inst.periodos}
+    for ruta in rutas.values():
+        for t, b in zip(inst.periodos, ruta):
+            if b is not None:
+                n[b,t] += 1
+    return n
+
+
+def ruta_valida(inst, ruta):
+    """Bloques de una misma clase y cada tramo de al menos K períodos (o hasta el final del turno)"""
+    usados = {b for b in ruta if b is not None}
+    if usados and not any(usados <= clase for clase in inst.clases):
+        return False
+    n_t = len(ruta)
+    inicio = 0
+    for i in range(1, n_t + 1):
+        if i == n_t or ruta[i] != ruta[inicio]:
+            if ruta[inicio] is not None and i - inicio < min(inst.K, n_t - inicio):
+                return False
+            inicio = i
+    return True
+
+
+def repartir_flujos(inst, n, z):
+    """Flujos golosos con carga de cada (b, t) a lo más mu * n_bt - z.
+
+    Por período: primero las entregas que ya no caben en la holgura futura del
+    bloque (son fijas al bloque), luego la demanda del período (cargas, que
+    dependen de dónde está el inventario, y descargas) y al final entregas y
+    recepciones en todo lo que quepa, ya que la holgura que no se usa en el
+    período se pierde. Los flujos que pueden ir a varios bloques prefieren los
+    de más holgura y menos entregas pendientes.
+    Retorna (flujos, faltante): las unidades que no se pudieron colocar; el
+    reparto es factible para z si faltante == 0.
+    """
+    holgura = {}
+    faltante = 0
+    for clave, dot in n.items():
+        h = inst.mu * dot - z
+        if h < 0:
+            faltante -= h
+        holgura[clave] = max(h, 0)
+    futura = {}
+    for b in inst.bloques:
+        acumulada = 0
+        for t in reversed(inst.periodos):
+            futura[b,t] = acumulada
+            acumulada += holgura[b,t]
+    inv = dict(inst.inv0)
+    por_entregar = {clave: q for clave, q in inst.entregar.items()}
+    pendiente = {b: 0 for b in inst.bloques}
+    for (b, s), q in por_entregar.items():
+        pendiente[b] += q
+    por_recibir = dict(inst.recibir)
+    flujos = {nombre: {} for nombre in VARIABLES_FLUJO}
+
+    def mover(nombre, s, b, t, q, signo):
+        flujos[nombre][s,b,t] = flujos[nombre].get((s,b,t), 0) + q
+        holgura[b,t] -= q
+        inv[b,s] += signo * q
+
+    def entregar(t, tope):
+        # Primero las segregaciones sobre su capacidad de inventario
+        for (b, s), q in sorted(por_entregar.items(), key=lambda e: inst.Cbs[e[0]] - inv[e[0]]):
+            x = min(q, holgura[b,t], tope(b))
+            if x > 0:
+                mover("fe_sbt", s, b, t, x, -1)
+                por_entregar[b,s] -= x
+                pendiente[b] -= x
+
+    def colocar(nombre, s, t, q, bloques, tope, signo, restantes):
+        orden = sorted(bloques, key=lambda b: pendiente[b] / restantes - holgura[b,t])
+        for b in orden:
+            if q <= 0:
+                break
+            x = min(q, holgura[b,t], tope(b))
+            if x > 0:
+                mover(nombre, s, b, t, x, signo)
+                q -= x
+        return q
+
+    for i, t in enumerate(inst.periodos):
+        restantes = len(inst.periodos) - i
+        entregar(t, lambda b: pendiente[b] - futura[b,t])
+        for s in inst.S_E:
+            q = inst.carga.get((s, t), 0)
+            if q <= 0:
+                continue
+            q = colocar("fc_sbt", s, t, q, inst.B_E, lambda b: inv[b,s], -1, restantes)
+            # Sin inventario suficiente: recibir y cargar en el mismo período
+            for b in inst.B_E:
+                if q <= 0 or por_recibir.get(s, 0) <= 0:
+                    break
+                x = min(q, por_recibir[s], holgura[b,t] // 2, inst.Cbs[b,s] - inv[b,s])
+                if x > 0:
+                    mover("fr_sbt", s, b, t, x, 1)
+                    mover("fc_sbt", s, b, t, x, -1)
+                    por_recibir[s] -= x
+                    q -= x
+            faltante += q
+        for s in inst.S_I:
+            q = inst.descarga.get((s, t), 0)
+            if q > 0:
+                faltante += colocar("fd_sbt", s, t, q, inst.B_I, lambda b: inst.Cbs[b,s] - inv[b,s], 1, restantes)
+        entregar(t, lambda b: pendiente[b])
+        for s, q in por_recibir.items():
+            if q > 0:
+                por_recibir[s] = colocar("fr_sbt", s, t, q, inst.B_E, lambda b: inst.Cbs[b,s] - inv[b,s], 1,
+                                         restantes)
+        faltante += sum(max(inv[clave] - inst.Cbs[clave], 0) for clave in inst.sobre_capacidad)
+    faltante += sum(por_entregar.values()) + sum(por_recibir.values())
+    return flujos, faltante
+
+
+def min_diff(inst, n, flujos):
+    carga = {clave: 0 for clave in n}
+    for valores in flujos.values():
+        for (s, b, t), q in valores.items():
+            carga[b,t] += q
+    return min(inst.mu * n[clave] - carga[clave] for clave in n)
+
+
+def mejor_z(inst, n, desde=0):
+    """Mayor z >= desde con reparto factible (None si ni `desde` lo es) y sus flujos"""
+    flujos, faltante = repartir_flujos(inst, n, desde)
+    if faltante > 0:
+        return None, None
+    z = desde
+    while True:
+        candidatos, faltante = repartir_flujos(inst, n, z + 1)
+        if faltante > 0:
+            return z, flujos
+        z, flujos = z + 1, candidatos
+
+
+def rutas_iniciales(inst):
+    """Una grúa fija por bloque y las sobrantes a los bloques con más trabajo por grúa.
+
+    El trabajo de un bloque se estima con sus entregas (fijas al bloque), la
+    parte de la demanda de carga que cubre su inventario inicial y la parte de
+    las descargas que cabe en su espacio libre.
+    """
+    trabajo = {b: 0.0 for b in inst.bloques}
+    for (b, s), q in inst.entregar.items():
+        trabajo[b] += q
+
+    def repartir(demanda, bloques, peso):
+        totales = {}
+        for (s, t), q in demanda.items():
+            totales[s] = totales.get(s, 0) + q
+        for s, q in totales.items():
+            total = sum(peso(b, s) for b in bloques)
+            for b in bloques:
+                if total > 0:
+                    trabajo[b] += q * peso(b, s) / total
+
+    repartir(inst.carga, inst.B_E, lambda b, s: inst.inv0[b,s])
+    repartir(inst.descarga, inst.B_I, lambda b, s: max(inst.Cbs[b,s] - inst.inv0[b,s], 0))
+
+    disponibles = min(len(inst.gruas), inst.Rmax)
+    asignadas = {b: 0 for b in inst.bloques}
+    for b in sorted(inst.bloques, key=lambda b: -trabajo[b])[:disponibles]:
+        asignadas[b] = 1
+    for _ in range(disponibles - sum(asignadas.values())):
+        candidatos = [b for b in inst.bloques if asignadas[b] < inst.W]
+        if not candidatos:
+            break
+        b = max(candidatos, key=lambda b: trabajo[b] / (asignadas[b] + 1))
+        asignadas[b] += 1
+
+    gruas = iter(inst.gruas)
+    rutas = {g: [None] * len(inst.periodos) for g in inst.gruas}
+    for b, cantidad in asignadas.items():
+        for _ in range(cantidad):
+            rutas[next(gruas)] = [b] * len(inst.periodos)
+    return rutas
+
+
+def vecino(inst, rutas, n, rng):
+    """Reasigna una grúa en una ventana de períodos a otro bloque compatible (o la deja libre).
+
+    Retorna las rutas nuevas o None si el movimiento no respeta tramos, W o Rmax.
+    """
+    n_t = len(inst.periodos)
+    g = rng.choice(inst.gruas)
+    largo = rng.randint(min(inst.K, n_t), n_t)
+    inicio = rng.randint(0, n_t - largo)
+    ruta = rutas[g]
+    fuera = {b for i, b in enumerate(ruta) if b is not None and not inicio <= i < inicio + largo}
+    destinos = [b for b in inst.bloques if any(fuera | {b} <= clase for clase in inst.clases)]
+    destino = rng.choice(destinos + [None])
+
+    nueva = ruta[:inicio] + [destino] * largo + ruta[inicio + largo:]
+    if nueva == ruta or not ruta_valida(inst, nueva):
+        return None
+    for i in range(inicio, inicio + largo):
+        t = inst.periodos[i]
+        if destino is not None and destino != ruta[i]:
+            if n[destino,t] + 1 > inst.W:
+                return None
+            if ruta[i] is None and sum(n[b,t] for b in inst.bloques) + 1 > inst.Rmax:
+                return None
+    return {**rutas, g: nueva}
+
+
+def construir_plan(datos, segundos=1.0, semilla=0):
+    """Plan factible de grúas y flujos en milisegundos, mejorado por búsqueda en vecindarios grandes.
+
+    Parte de una dotación fija por bloque y, durante `segundos`, reasigna grúas
+    en ventanas de períodos: acepta el vecino si permite un reparto con mayor z
+    o, con el mismo z, si deja menos unidades sin colocar al intentar z + 1.
+    Si la dotación inicial no admite ningún reparto, la misma búsqueda parte
+    de z = -1 y primero reduce lo que queda sin colocar con z = 0.
+    Retorna un PlanGruas o None si no encuentra un reparto factible.
+    """
+    inicio = time.perf_counter()
+    inst = Instancia(datos)
+    rutas = rutas_iniciales(inst)
+    n = dotacion(inst, rutas)
+    z, flujos = mejor_z(inst, n)
+    if z is None:
+        z = -1
+    _, faltante = repartir_flujos(inst, n, z + 1)
+
+    rng = random.Random(semilla)
+    iteraciones = 0
+    while time.perf_counter() - inicio < segundos:
+        iteraciones += 1
+        candidatas = vecino(inst, rutas, n, rng)
+        if candidatas is None:
+            continue
+        n_cand = dotacion(inst, candidatas)
+        _, faltante_cand = repartir_flujos(inst, n_cand, z + 1)
+        if faltante_cand == 0:
+            z, flujos = mejor_z(inst, n_cand, z + 1)
+            _, faltante = repartir_flujos(inst, n_cand, z + 1)
+        elif faltante_cand <= faltante:
+            if z >= 0:
+                flujos_z, faltante_z = repartir_flujos(inst, n_cand, z)
+                if faltante_z > 0:
+                    continue
+                flujos = flujos_z
+            faltante = faltante_cand
+        else:
+            continue
+        rutas, n = candidatas, n_cand
+
+    if z < 0:
+        logger.warning("Heurística de grúas: sin reparto factible tras %d vecinos", iteraciones)
+        return None
+    plan = PlanGruas(rutas, flujos, min_diff(inst, n, flujos))
+    logger.info("Heurística de grúas: min_diff_val %s en %.2fs (%d vecinos)",
+                plan.min_diff_val, time.perf_counter() - inicio, iteraciones)
+    return plan
+
+
+def cargar_plan(m, plan, simetria="ninguna"):
+    """Deja el plan en el modelo completo (construir_modelo_gruas): flujos, ygbt, alpha_gbt, Z_gb e inventarios.
+
+    Las rutas se reparten entre las grúas en el orden que exige la ruptura de
+    simetría del modelo (las grúas son intercambiables).
+    """
+    for v in m.component_data_objects(Var):
+        v.set_value(0)
+    for nombre, valores in plan.flujos.items():
+        variable = getattr(m, nombre)
+        for idx, q in valores.items():
+            variable[idx].set_value(q)
+
+    bloques = list(m.B)
+
+    def clave(ruta):
+        uso = sum(1 for b in ruta if b is not None)
+        if simetria == "lex":
+            return (sum(2**(len(bloques)-1-i) for i, b in enumerate(bloques) if b in ruta), uso)
+        return uso if simetria == "uso" else 0
+    rutas = sorted(plan.rutas.values(), key=clave, reverse=True)
+
+    periodos = sorted(m.T)
+    for g, ruta in zip(m.G, rutas):
+        for i, (t, b) in enumerate(zip(periodos, ruta)):
+            if b is None:
+                continue
+            m.ygbt[g,b,t].set_value(1)
+            m.Z_gb[g,b].set_value(1)
+            if i == 0 or ruta[i-1] != b:
+                m.alpha_gbt[g,b,t].set_value(1)
+    m.min_diff_val.set_value(plan.min_diff_val)
+    if hasattr(m, "inv_bst"):
+        for b in m.B:
+            for s in m.S:
+                inv = value(m.AEbs[b,s] + m.AIbs[b,s])
+                for t in periodos:
+                    inv += (m.fd_sbt[s,b,t].value + m.fr_sbt[s,b,t].value
+                            - m.fe_sbt[s,b,t].value - m.fc_sbt[s,b,t].value)
+                    m.inv_bst[b,s,t].set_value(inv)
@@ -1,16 +1,21 @@
 import os
+import time
+import metricas
+import cancelacion
 from codigos.leer_lineas import extraer_filas_por_fecha
 from codigos.analisis_flujos import run_analysis_flujos
 from codigos.evolucion_turnos import criterioII_a_evolucion
 from codigos.instancias import generar_instancias
 
-def _process_semana(semana, criterio, anio, participacion, resultados_dir, estaticos_dir, todas_semanas):
+def _preparar_semana(semana, criterio, anio, resultados_dir, estaticos_dir, todas_semanas, flujos=True):
+    """Pasos 1-3 (no dependen de la participación). Retorna False si la semana no se puede numerar"""
     print(f"\n(Generar instancia magdalena) ===== PROCESANDO SEMANA: {semana} =====")
     
-    # 1. Extraer líneas de Flujos.csv
-    extraer_filas_por_fecha(semana)
-    # 2. Análisis de flujos
-    run_analysis_flujos(semana)
+    if flujos:
+        # 1. Extraer líneas de Flujos.csv
+        extraer_filas_por_fecha(semana)
+        # 2. Análisis de flujos
+        run_analysis_flujos(semana)
 
     # 3. Evolución por turnos (CriterioII)
     try:
@@ -18,7 +23,7 @@ def _process_semana(semana, criterio, anio, participacion, resultados_dir, estat
         numero_sem = idx + 1  # base 1
     except ValueError:
         print(f"ERROR: La semana {semana} no está en la lista.")
-        return
+        return False
 
     input_crit = os.path.join(estaticos_dir, f"{anio}", f"{criterio}", f"Semana {numero_sem} - {semana}")
     output_evo = os.path.join(resultados_dir, "instancias_magdalena", semana, f"evolucion_turnos_w{semana}.xlsx")
@@ -28,15 +33,17 @@ def _process_semana(semana, criterio, anio, participacion, resultados_dir, estat
     else:
         criterioII_a_evolucion(semana, input_crit, output_evo)
         print("Evolución por turnos completada.")
+    return True
 
+
+def _generar_instancia_semana(semana, participacion):
     # 4. Generación de instancias
     print("Paso 4: Generando instancias...")
     generar_instancias(semana, participacion)
     print("Generación de instancias completada.")
 
 
-def generar_instancias_coloracion(semanas, criterio, anio, participacion, resultados_dir, estaticos_dir):
-
+def _crear_carpetas(semanas, resultados_dir):
     # 0. Prepara directorios de instancias
     inst_base = os.path.join(resultados_dir, "instancias_magdalena")
     os.makedirs(inst_base, exist_ok=True)
@@ -49,8 +56,43 @@ def generar_instancias_coloracion(semanas, criterio, anio, participacion, result
         print(f" - {path}")
     print("(Generar instancia magdalena) ===== CARPETAS SEMANALES CREADAS =====")
 
+
+def preparar_semanas(semanas, criterio, anio, resultados_dir, estaticos_dir, todas_semanas=None, flujos=True):
+    """Ejecuta una sola vez por semana los pasos comunes a todas las participaciones.
+
+    Con flujos=False se omite la extracción y el análisis de flujos (que tampoco
+    dependen del criterio) y solo se rehace la evolución por turnos.
+    Retorna las semanas preparadas.
+    """
+    todas_semanas = todas_semanas or semanas
+    _crear_carpetas(semanas, resultados_dir)
+    preparadas = []
+    for sem in semanas:
+        if cancelacion.solicitada():
+            break
+        inicio = time.perf_counter()
+        if _preparar_semana(sem, criterio, anio, resultados_dir, estaticos_dir, todas_semanas, flujos):
+            preparadas.append(sem)
+        metricas.observar_etapa("preparacion", time.perf_counter() - inicio, "coloracion")
+    return preparadas
+
+
+def generar_instancias_coloracion(semanas, criterio, anio, participacion, resultados_dir, estaticos_dir,
+                                  todas_semanas=None, preparar=True):
+    # todas_semanas: lista completa del año para numerar las semanas cuando
+    # solo se genera un subconjunto (por defecto, `semanas`)
+    # preparar=False: las semanas ya pasaron por preparar_semanas (barridos)
+    todas_semanas = todas_semanas or semanas
+    _crear_carpetas(semanas, resultados_dir)
+
     # 2. Procesa cada semana
     for sem in semanas:
-        _process_semana(sem, criterio, anio, participacion, resultados_dir, estaticos_dir, semanas)
+        if cancelacion.solicitada():
+            print("\n(Generar instancia magdalena) ===== CANCELADO =====")
+            return
+        inicio = time.perf_counter()
+        if not preparar or _preparar_semana(sem, criterio, anio, resultados_dir, estaticos_dir, todas_semanas):
+            _generar_instancia_semana(sem, participacion)
+        metricas.observar_etapa("generacion_instancia", time.perf_counter() - inicio, "coloracion")
 
     print("\n(Generar instancia magdalena) ===== PROCESO COMPLETADO PARA TODAS LAS SEMANAS =====")
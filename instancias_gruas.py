@@ -1,6 +1,9 @@
 import pandas as pd
 from pathlib import Path
 import sys
+import time
+import metricas
+import cancelacion
 
 
 def get_size_from_segregation(seg_string):
@@ -19,6 +22,9 @@ def generar_instancias_gruas(semanas, participacion, resultados_dir):
     inst_camila_root    = resultados_dir / "instancias_camila" # / "mu30k_b08"
     
     for semana in semanas:
+        if cancelacion.solicitada():
+            print("✗ Generación de instancias de grúas cancelada")
+            return
         
         carpeta_inst = inst_magdalena_root / semana
         carpeta_res  = res_magdalena_root  / semana
@@ -40,6 +46,7 @@ def generar_instancias_gruas(semanas, participacion, resultados_dir):
         print("  • Instancia:", file_instancia.name)
         print("  • Resultado:", file_resultado.name)
         print("  • Salida   :", out_dir)
+        inicio = time.perf_counter()
         
         
         # --- Datos base ---
@@ -291,4 +298,6 @@ def generar_instancias_gruas(semanas, participacion, resultados_dir):
             except Exception as e:
                 print(f"      ✗ Error al escribir turno {turno:02d}: {e}")
 
+        metricas.observar_etapa("generacion_instancia", time.perf_counter() - inicio, "gruas")
+
 
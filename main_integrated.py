@@ -3,13 +3,17 @@
 
 import os
 import argparse
+from collections import Counter
 from datetime import date
 import pandas as pd
-from instancias_coloracion import generar_instancias_coloracion
+from instancias_coloracion import generar_instancias_coloracion, preparar_semanas
 from instancias_gruas import generar_instancias_gruas
 from modelo_coloracion import ejecutar_instancias_coloracion
 from modelo_gruas_maxmin import ejecutar_instancias_camila
 from db_integration import DatabaseIntegration
+import progreso
+import cancelacion
+import metricas
 import logging
 import time
 
@@ -41,32 +45,70 @@ def main():
                         help="Valor de participación")
     parser.add_argument("--criterio", type=str, default="criterioII",
                         help="Criterio a usar en instancias de coloración")
+    parser.add_argument("--participaciones", type=int, nargs="+",
+                        help="Barrido: lista de participaciones (reemplaza --participacion)")
+    parser.add_argument("--criterios", nargs="+",
+                        help="Barrido: lista de criterios (reemplaza --criterio)")
     parser.add_argument("--usar-db", action="store_true",
                         help="Guardar resultados en la base de datos PostgreSQL")
     parser.add_argument("--exportar-excel", type=str,
                         help="Exportar resultados de la DB a un archivo Excel")
+    parser.add_argument("--forzar", action="store_true",
+                        help="Resolver de nuevo aunque haya resultados en cache para la misma instancia")
     args = parser.parse_args()
 
-    # Inicializar integración con DB si está habilitada
-    db = None
-    if args.usar_db:
-        try:
-            db = DatabaseIntegration()
-            db.create_tables()
-            logger.info("Conexión a base de datos establecida")
-        except Exception as e:
-            logger.error(f"Error conectando a la base de datos: {e}")
-            logger.warning("Continuando sin guardar en base de datos")
-            db = None
+    db = conectar_db(args.usar_db)
 
     # Si se solicita exportar, hacerlo y salir
     if args.exportar_excel and db:
         db.exportar_resultados_a_excel(args.exportar_excel)
         return
 
-    BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
-    ESTATICOS  = os.path.join(BASE_DIR, "archivos_estaticos")
-    RESULTADOS = os.path.join(BASE_DIR, "resultados_generados")
+    if args.participaciones or args.criterios:
+        ejecutar_barrido(
+            anio=args.anio,
+            participaciones=args.participaciones or [args.participacion],
+            criterios=args.criterios or [args.criterio],
+            semanas=args.semanas,
+            db=db,
+            forzar=args.forzar
+        )
+        return
+
+    ejecutar_pipeline(
+        anio=args.anio,
+        participacion=args.participacion,
+        criterio=args.criterio,
+        semanas=args.semanas,
+        db=db,
+        forzar=args.forzar
+    )
+
+def conectar_db(usar_db: bool):
+    """Inicializa la integración con DB si está habilitada (None si no se puede)"""
+    if not usar_db:
+        return None
+    try:
+        db = DatabaseIntegration()
+        db.create_tables()
+        logger.info("Conexión a base de datos establecida")
+        return db
+    except Exception as e:
+        logger.error(f"Error conectando a la base de datos: {e}")
+        logger.warning("Continuando sin guardar en base de datos")
+        return None
+
+BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
+ESTATICOS  = os.path.join(BASE_DIR, "archivos_estaticos")
+RESULTADOS = os.path.join(BASE_DIR, "resultados_generados")
+
+def ejecutar_pipeline(anio=2022, participacion=68, criterio="criterioII", semanas=None, db=None, forzar=False,
+                      preparar=True, evento_final=True):
+    """Ejecuta coloración + grúas para las semanas indicadas y devuelve un resumen estructurado.
+
+    preparar=False supone que las semanas ya pasaron por preparar_semanas (ver
+    ejecutar_barrido); evento_final=False no emite pipeline_completado/cancelado.
+    """
     os.makedirs(RESULTADOS, exist_ok=True)
 
     TURNOS     = [f"{i:02d}" for i in range(1, 22)]
@@ -74,26 +116,35 @@ def main():
     BASE_RES   = os.path.join(RESULTADOS, "resultados_camila")
 
     # 1) Decidir semanas
-    if args.semanas:
-        semanas = args.semanas
+    if semanas:
         print(f"Usando lista fija de {len(semanas)} semanas.")
     else:
-        semanas = generar_semanas_iso(args.anio)
-        print(f"Se generaron {len(semanas)} semanas ISO para el año {args.anio}.")
+        semanas = generar_semanas_iso(anio)
+        print(f"Se generaron {len(semanas)} semanas ISO para el año {anio}.")
+    progreso.emitir("pipeline_iniciado", anio=anio, participacion=participacion,
+                    criterio=criterio, semanas=len(semanas))
 
     # 2) Instancias de coloración
     generar_instancias_coloracion(
-        semanas, args.criterio, args.anio,
-        args.participacion, RESULTADOS, ESTATICOS
+        semanas, criterio, anio,
+        participacion, RESULTADOS, ESTATICOS,
+        preparar=preparar, todas_semanas=generar_semanas_iso(anio)
     )
     
     # Ejecutar coloración y guardar en DB
-    logger.info("Ejecutando modelo de coloración...")
-    inicio_coloracion = time.time()
-    semanas_filtradas, semanas_infactibles = ejecutar_instancias_coloracion(
-        semanas, args.participacion, RESULTADOS
-    )
-    tiempo_coloracion = time.time() - inicio_coloracion
+    semanas_filtradas, semanas_infactibles = [], []
+    tiempo_coloracion = 0.0
+    if cancelacion.solicitada():
+        # Instancias a medio generar: no se resuelven
+        logger.warning("Trabajo cancelado: se omite la etapa de coloración")
+    else:
+        logger.info("Ejecutando modelo de coloración...")
+        progreso.emitir("etapa_iniciada", etapa="coloracion", semanas=len(semanas))
+        inicio_coloracion = time.time()
+        semanas_filtradas, semanas_infactibles = ejecutar_instancias_coloracion(
+            semanas, participacion, RESULTADOS, forzar
+        )
+        tiempo_coloracion = time.time() - inicio_coloracion
     
     print(f"Procesamiento OK = {len(semanas_filtradas)}")
     print(f"Semanas infactibles = {len(semanas_infactibles)}")
@@ -101,58 +152,57 @@ def main():
 
     # Guardar resultados de coloración en DB
     if db:
+        inicio_db = time.perf_counter()
         # Marcar semanas factibles
         for semana in semanas_filtradas:
-            db.marcar_semana_procesada(semana, args.participacion, True, False)
+            db.marcar_semana_procesada(semana, participacion, True, False)
             
             # Leer y guardar resultados detallados si existen
             archivo_distancias = os.path.join(
                 RESULTADOS, "resultados_magdalena", semana,
-                f"Distancias_Modelo_{semana}_{args.participacion}.xlsx"
+                f"Distancias_Modelo_{semana}_{participacion}.xlsx"
             )
             if os.path.exists(archivo_distancias):
                 try:
                     df_resumen = pd.read_excel(archivo_distancias, sheet_name='Resumen Semanal')
                     if not df_resumen.empty:
-                        resultado = df_resumen.iloc[0].to_dict()
-                        resultado.update({
+                        fila = df_resumen.iloc[0]
+                        resultado = {
                             'semana': semana,
-                            'participacion': args.participacion,
-                            'criterio': args.criterio,
+                            'participacion': participacion,
+                            'criterio': criterio,
+                            'distancia_total': float(fila['Distancia Total']),
+                            'distancia_load': float(fila['Distancia LOAD']),
+                            'distancia_dlvr': float(fila['Distancia DLVR']),
+                            'movimientos_dlvr': int(round(fila['Movimientos_DLVR'])),
+                            'movimientos_load': int(round(fila['Movimientos_LOAD'])),
                             'estado': 'factible'
-                        })
-                        db.guardar_resultado_coloracion(semana, args.participacion, resultado)
+                        }
+                        db.guardar_resultado_coloracion(semana, participacion, resultado)
                         
                         # Guardar detalles de segregaciones
                         df_segregaciones = pd.read_excel(archivo_distancias, sheet_name='Resultados por Segregación')
-                        for _, row in df_segregaciones.iterrows():
-                            db.Session().execute(text("""
-                                INSERT INTO optimization_segregaciones 
-                                (semana, segregacion, distancia_total, distancia_dlvr, 
-                                 distancia_load, movimientos_dlvr, movimientos_load)
-                                VALUES (:semana, :segregacion, :distancia_total, 
-                                        :distancia_dlvr, :distancia_load, 
-                                        :movimientos_dlvr, :movimientos_load)
-                            """), {
-                                'semana': semana,
+                        db.guardar_segregaciones(semana, participacion, criterio, [
+                            {
                                 'segregacion': row['Segregacion'],
-                                'distancia_total': row['Distancia_Total'],
-                                'distancia_dlvr': row['Distancia_DLVR'],
-                                'distancia_load': row['Distancia_LOAD'],
-                                'movimientos_dlvr': row['Movimientos_DLVR'],
-                                'movimientos_load': row['Movimientos_LOAD']
-                            })
-                        db.Session().commit()
+                                'distancia_total': float(row['Distancia_Total']),
+                                'distancia_dlvr': float(row['Distancia_DLVR']),
+                                'distancia_load': float(row['Distancia_LOAD']),
+                                'movimientos_dlvr': int(round(row['Movimientos_DLVR'])),
+                                'movimientos_load': int(round(row['Movimientos_LOAD']))
+                            }
+                            for row in df_segregaciones.to_dict('records')
+                        ])
                 except Exception as e:
                     logger.error(f"Error guardando resultados de coloración para {semana}: {e}")
         
         # Marcar semanas infactibles
         for semana in semanas_infactibles:
-            db.marcar_semana_procesada(semana, args.participacion, False, False)
-            db.guardar_resultado_coloracion(semana, args.participacion, {
+            db.marcar_semana_procesada(semana, participacion, False, False)
+            db.guardar_resultado_coloracion(semana, participacion, {
                 'semana': semana,
-                'participacion': args.participacion,
-                'criterio': args.criterio,
+                'participacion': participacion,
+                'criterio': criterio,
                 'distancia_total': None,
                 'distancia_load': None,
                 'distancia_dlvr': None,
@@ -160,62 +210,66 @@ def main():
                 'movimientos_load': None,
                 'estado': 'infactible'
             })
+        metricas.observar_etapa("carga_db", time.perf_counter() - inicio_db, "coloracion")
 
-    # 3) Guardar listados a CSV
-    df_ok = pd.DataFrame({"semana": semanas_filtradas})
-    df_no = pd.DataFrame({"semana": semanas_infactibles})
-    df_ok.to_csv(os.path.join(RESULTADOS, "semanas_filtradas.csv"), index=False)
-    df_no.to_csv(os.path.join(RESULTADOS, "semanas_infactibles.csv"), index=False)
-    print(f"CSV guardados en {RESULTADOS}:" 
-          "\n - semanas_filtradas.csv" 
-          "\n - semanas_infactibles.csv")
+    # 3) Guardar listados a CSV (tras una cancelación quedarían incompletos: se conservan los anteriores)
+    if cancelacion.solicitada():
+        logger.warning("Trabajo cancelado: no se reescriben los listados CSV")
+    else:
+        df_ok = pd.DataFrame({"semana": semanas_filtradas})
+        df_no = pd.DataFrame({"semana": semanas_infactibles})
+        df_ok.to_csv(os.path.join(RESULTADOS, "semanas_filtradas.csv"), index=False)
+        df_no.to_csv(os.path.join(RESULTADOS, "semanas_infactibles.csv"), index=False)
+        print(f"CSV guardados en {RESULTADOS}:" 
+              "\n - semanas_filtradas.csv" 
+              "\n - semanas_infactibles.csv")
 
     # 4) Instancias de grúas
-    logger.info("Generando instancias de grúas...")
-    generar_instancias_gruas(semanas_filtradas, args.participacion, RESULTADOS)
-    
-    logger.info("Ejecutando modelo de grúas...")
-    inicio_gruas = time.time()
-    ejecutar_instancias_camila(
-        semanas_filtradas, TURNOS, args.participacion, BASE_INST, BASE_RES
-    )
-    tiempo_gruas = time.time() - inicio_gruas
-    print(f"Tiempo total grúas: {tiempo_gruas:.2f} segundos")
+    resultados_gruas = []
+    tiempo_gruas = 0.0
+    if cancelacion.solicitada():
+        logger.warning("Trabajo cancelado: se omite la etapa de grúas")
+    else:
+        logger.info("Generando instancias de grúas...")
+        progreso.emitir("etapa_iniciada", etapa="gruas", semanas=len(semanas_filtradas))
+        generar_instancias_gruas(semanas_filtradas, participacion, RESULTADOS)
+        
+        if cancelacion.solicitada():
+            logger.warning("Trabajo cancelado: se omite la resolución de grúas")
+        else:
+            logger.info("Ejecutando modelo de grúas...")
+            inicio_gruas = time.time()
+            resultados_gruas = ejecutar_instancias_camila(
+                semanas_filtradas, TURNOS, participacion, BASE_INST, BASE_RES, forzar
+            )
+            tiempo_gruas = time.time() - inicio_gruas
+            print(f"Tiempo total grúas: {tiempo_gruas:.2f} segundos")
     
-    # Guardar resultados de grúas en DB
+    # Guardar resultados de grúas en DB directamente desde el solver
     if db:
-        for semana in semanas_filtradas:
-            # Marcar como procesado en grúas
-            db.marcar_semana_procesada(semana, args.participacion, True, True)
-            
-            # Leer resultados de grúas para cada turno
-            for turno in TURNOS:
-                archivo_resultado = os.path.join(
-                    BASE_RES, f"resultados_turno_{semana}",
-                    f"resultados_{semana}_{args.participacion}_T{turno}.xlsx"
+        inicio_db = time.perf_counter()
+        for resultado in resultados_gruas:
+            try:
+                db.guardar_resultado_gruas(
+                    resultado.semana, resultado.turno, resultado.participacion, resultado.resumen()
                 )
-                if os.path.exists(archivo_resultado):
-                    try:
-                        df_resultado = pd.read_excel(archivo_resultado)
-                        # Extraer métricas clave
-                        min_diff_val = df_resultado[df_resultado['var'] == 'min_diff_val']['val'].iloc[0] if 'min_diff_val' in df_resultado['var'].values else None
-                        gruas_utilizadas = len(df_resultado[df_resultado['var'] == 'ygbt']['val'].unique()) if 'ygbt' in df_resultado['var'].values else 0
-                        
-                        db.guardar_resultado_gruas(semana, int(turno), args.participacion, {
-                            'semana': semana,
-                            'turno': int(turno),
-                            'participacion': args.participacion,
-                            'min_diff_val': float(min_diff_val) if min_diff_val else None,
-                            'gruas_utilizadas': gruas_utilizadas,
-                            'bloques_activos': None,  # Calcular si es necesario
-                            'tiempo_resolucion': None,  # Se puede extraer del log
-                            'estado': 'optimo',
-                            'detalles': {}  # Agregar más detalles si es necesario
-                        })
-                    except Exception as e:
-                        logger.error(f"Error guardando resultado de grúas para {semana} turno {turno}: {e}")
-
-    logger.info("Proceso completado exitosamente")
+                db.guardar_plan_gruas(resultado)
+            except Exception as e:
+                logger.error(f"Error guardando resultado de grúas para {resultado.semana} turno {resultado.turno}: {e}")
+        
+        # Marcar como procesadas en grúas solo las semanas con todos sus turnos
+        # resueltos (tras una cancelación puede haber semanas incompletas)
+        turnos_resueltos = Counter(r.semana for r in resultados_gruas if r.estado != 'cancelado')
+        for semana in semanas_filtradas:
+            if turnos_resueltos[semana] == len(TURNOS):
+                db.marcar_semana_procesada(semana, participacion, True, True)
+        metricas.observar_etapa("carga_db", time.perf_counter() - inicio_db, "gruas")
+
+    cancelado = cancelacion.solicitada()
+    if cancelado:
+        logger.warning("Proceso cancelado; se guardaron los resultados parciales")
+    else:
+        logger.info("Proceso completado exitosamente")
     
     # Resumen final
     print("\n=== RESUMEN FINAL ===")
@@ -224,6 +278,136 @@ def main():
     print(f"Tiempo total: {(tiempo_coloracion + tiempo_gruas):.2f} segundos")
     if db:
         print("Resultados guardados en base de datos PostgreSQL")
+    if evento_final:
+        tipo_fin = "pipeline_cancelado" if cancelado else "pipeline_completado"
+    else:
+        tipo_fin = "combinacion_cancelada" if cancelado else "combinacion_completada"
+    progreso.emitir(tipo_fin,
+                    semanas_ok=len(semanas_filtradas),
+                    semanas_infactibles=len(semanas_infactibles),
+                    turnos_resueltos=len(resultados_gruas))
+
+    return {
+        "semanas_ok": len(semanas_filtradas),
+        "semanas_infactibles": len(semanas_infactibles),
+        "semanas_filtradas": semanas_filtradas,
+        "lista_infactibles": semanas_infactibles,
+        "tiempo_coloracion": tiempo_coloracion,
+        "tiempo_gruas": tiempo_gruas,
+        "turnos_resueltos": len(resultados_gruas),
+        "min_diff_promedio": _promedio(r.min_diff_val for r in resultados_gruas if r.estado != 'cancelado'),
+        "cancelado": cancelado
+    }
+
+def _promedio(valores):
+    valores = [v for v in valores if v is not None]
+    return sum(valores) / len(valores) if valores else None
+
+def _distancia_total(semanas, participacion):
+    """Suma de la distancia total de coloración de las semanas (desde sus archivos de distancias)"""
+    total = None
+    for semana in semanas:
+        archivo = os.path.join(RESULTADOS, "resultados_magdalena", semana,
+                               f"Distancias_Modelo_{semana}_{participacion}.xlsx")
+        try:
+            df_resumen = pd.read_excel(archivo, sheet_name='Resumen Semanal')
+        except Exception:
+            continue
+        if not df_resumen.empty:
+            total = (total or 0.0) + float(df_resumen.iloc[0]['Distancia Total'])
+    return total
+
+def ejecutar_barrido(anio=2022, participaciones=(68,), criterios=("criterioII",), semanas=None, db=None,
+                     forzar=False, al_terminar_combinacion=None):
+    """Ejecuta el pipeline para cada combinación criterio × participación compartiendo las etapas comunes.
+
+    La extracción y el análisis de flujos se hacen una sola vez por semana, la
+    evolución por turnos una vez por criterio, y solo la generación de instancias
+    y las resoluciones se repiten por participación. Retorna la tabla comparativa
+    (una fila por combinación).
+
+    Los archivos de resultados no llevan el criterio en el nombre y la siguiente
+    combinación los reemplaza: al_terminar_combinacion(criterio, participacion,
+    resumen) permite guardarlos antes.
+    """
+    os.makedirs(RESULTADOS, exist_ok=True)
+    if semanas:
+        print(f"Usando lista fija de {len(semanas)} semanas.")
+    else:
+        semanas = generar_semanas_iso(anio)
+        print(f"Se generaron {len(semanas)} semanas ISO para el año {anio}.")
+    todas_semanas = generar_semanas_iso(anio)
+    combinaciones = [(c, p) for c in criterios for p in participaciones]
+    progreso.emitir("pipeline_iniciado", anio=anio, participaciones=list(participaciones),
+                    criterios=list(criterios), semanas=len(semanas), combinaciones=len(combinaciones))
+
+    filas = []
+    preparadas = {}
+    semanas_ok, infactibles = set(), set()
+    for indice, (criterio, participacion) in enumerate(combinaciones):
+        if cancelacion.solicitada():
+            break
+        if criterio not in preparadas:
+            # Los archivos de evolución e instancias no llevan el criterio en el
+            # nombre: cada criterio se prepara justo antes de sus participaciones
+            logger.info(f"Preparando semanas para {criterio}...")
+            progreso.emitir("etapa_iniciada", etapa="preparacion", criterio=criterio, semanas=len(semanas))
+            preparadas[criterio] = preparar_semanas(
+                semanas, criterio, anio, RESULTADOS, ESTATICOS,
+                todas_semanas=todas_semanas, flujos=not preparadas
+            )
+            if cancelacion.solicitada():
+                break
+        logger.info(f"Combinación {indice + 1}/{len(combinaciones)}: {criterio}, participación {participacion}")
+        with progreso.contexto(criterio=criterio, participacion=participacion,
+                               combinacion=indice, combinaciones=len(combinaciones)):
+            resumen = ejecutar_pipeline(
+                anio=anio, participacion=participacion, criterio=criterio,
+                semanas=preparadas[criterio], db=db, forzar=forzar,
+                preparar=False, evento_final=False
+            )
+        if al_terminar_combinacion is not None:
+            al_terminar_combinacion(criterio, participacion, resumen)
+        semanas_ok.update(resumen["semanas_filtradas"])
+        infactibles.update(resumen["lista_infactibles"])
+        filas.append({
+            "criterio": criterio,
+            "participacion": participacion,
+            "semanas_ok": resumen["semanas_ok"],
+            "semanas_infactibles": resumen["semanas_infactibles"],
+            "turnos_resueltos": resumen["turnos_resueltos"],
+            "distancia_total": _distancia_total(resumen["semanas_filtradas"], participacion),
+            "min_diff_promedio": resumen["min_diff_promedio"],
+            "tiempo_coloracion": resumen["tiempo_coloracion"],
+            "tiempo_gruas": resumen["tiempo_gruas"],
+            "cancelado": resumen["cancelado"]
+        })
+
+    cancelado = cancelacion.solicitada()
+    tabla = pd.DataFrame(filas)
+    print("\n=== COMPARACIÓN DEL BARRIDO ===")
+    print(tabla.to_string(index=False) if not tabla.empty else "(sin combinaciones ejecutadas)")
+    if cancelado:
+        # La tabla parcial va en el resultado de la tarea; no reemplaza la de un barrido completo
+        logger.warning("Barrido cancelado: no se guarda la tabla comparativa")
+    else:
+        archivo_tabla = os.path.join(RESULTADOS, f"barrido_{anio}.csv")
+        tabla.to_csv(archivo_tabla, index=False)
+        print(f"Tabla guardada en {archivo_tabla}")
+    progreso.emitir("pipeline_cancelado" if cancelado else "pipeline_completado",
+                    combinaciones=len(filas))
+
+    return {
+        "combinaciones": filas,
+        "semanas_ok": sum(f["semanas_ok"] for f in filas),
+        "semanas_infactibles": sum(f["semanas_infactibles"] for f in filas),
+        "turnos_resueltos": sum(f["turnos_resueltos"] for f in filas),
+        "semanas_filtradas": sorted(semanas_ok),
+        "lista_infactibles": sorted(infactibles),
+        "tiempo_coloracion": sum(f["tiempo_coloracion"] for f in filas),
+        "tiempo_gruas": sum(f["tiempo_gruas"] for f in filas),
+        "cancelado": cancelado
+    }
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Límites (s) de los histogramas de duración
+BUCKETS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60, 120, 300, 600)
+
+# Ventana para las tasas por minuto
+VENTANA_TASA = 60
+
+# nombre -> (tipo, ayuda)
+DEFINICIONES = {
+    "optimizacion_etapa_segundos": (
+        "histogram", "Duración de cada etapa (preparacion, generacion_instancia, heuristica, construccion, "
+                     "resolucion, extraccion, escritura_excel, carga_db) por modelo"),
+    "optimizacion_estado_solver_total": ("counter", "Resoluciones por modelo y estado de terminación"),
+    "optimizacion_cache_total": ("counter", "Consultas a la cache de resultados por modelo y resultado"),
+    "optimizacion_semanas_procesadas_total": ("counter", "Semanas de coloración procesadas"),
+    "optimizacion_turnos_procesados_total": ("counter", "Turnos de grúas procesados"),
+    "optimizacion_dos_fases_total": (
+        "counter", "Turnos de grúas resueltos en dos fases por resultado (desagregada o respaldo al modelo completo)"),
+    "optimizacion_heuristica_total": (
+        "counter", "Turnos de grúas resueltos con heurística por origen de la solución final (solver o plan)"),
+    "optimizacion_portafolio_total": (
+        "counter", "Resoluciones en portafolio por modelo, perfil usado y resultado (ganador o mejor_incumbente)"),
+    "optimizacion_semanas_por_minuto": ("gauge", "Semanas procesadas en el último minuto"),
+    "optimizacion_turnos_por_minuto": ("gauge", "Turnos procesados en el último minuto"),
+    "optimizacion_trabajos_total": ("counter", "Trabajos de la cola terminados por estado"),
+    "optimizacion_trabajo_segundos": ("histogram", "Duración de los trabajos de la cola"),
+    "optimizacion_cola_pendientes": ("gauge", "Trabajos en cola esperando ejecución"),
+    "optimizacion_cola_ejecutando": ("gauge", "Trabajos en ejecución"),
+    "optimizacion_cola_max_concurrencia": ("gauge", "Trabajos simultáneos permitidos"),
+}
+
+# Contadores cuya tasa por minuto se expone como gauge
+TASAS = {
+    "optimizacion_semanas_procesadas_total": "optimizacion_semanas_por_minuto",
+    "optimizacion_turnos_procesados_total": "optimizacion_turnos_por_minuto",
+}
+
+
+def _clave(etiquetas):
+    return tuple(sorted(etiquetas.items()))
+
+
+def _formato_etiquetas(clave, extra=()):
+    pares = [*clave, *extra]
+    if not pares:
+        return ""
+    texto = ",".join(
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), " ")}"'
+        for k, v in pares
+    )
+    return "{" + texto + "}"
+
+
+def _formato_valor(valor):
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+class Registro:
+    """Contadores, gauges e histogramas con etiquetas, exportables en formato Prometheus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._gauges = {}
+        self._histogramas = {}
+        self._eventos_tasa = {nombre: deque(maxlen=100000) for nombre in TASAS}
+
+    def contar(self, nombre, incremento=1, **etiquetas):
+        with self._lock:
+            serie = self._contadores.setdefault(nombre, {})
+            clave = _clave(etiquetas)
+            serie[clave] = serie.get(clave, 0) + incremento
+            if nombre in self._eventos_tasa:
+                self._eventos_tasa[nombre].append((time.time(), incremento))
+
+    def fijar(self, nombre, valor, **etiquetas):
+        with self._lock:
+            self._gauges.setdefault(nombre, {})[_clave(etiquetas)] = valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        with self._lock:
+            serie = self._histogramas.setdefault(nombre, {})
+            clave = _clave(etiquetas)
+            if clave not in serie:
+                serie[clave] = {"buckets": [0] * len(BUCKETS_SEGUNDOS), "suma": 0.0, "cuenta": 0}
+            h = serie[clave]
+            indice = bisect.bisect_left(BUCKETS_SEGUNDOS, valor)
+            if indice < len(BUCKETS_SEGUNDOS):
+                h["buckets"][indice] += 1
+            h["suma"] += valor
+            h["cuenta"] += 1
+
+    def aplicar(self, medicion):
+        """Aplica una medición serializada (ver `_medicion`) recibida de otro proceso"""
+        getattr(self, medicion["operacion"])(medicion["nombre"], medicion["valor"], **medicion["etiquetas"])
+
+    def _tasas(self):
+        limite = time.time() - VENTANA_TASA
+        for contador, gauge in TASAS.items():
+            eventos = self._eventos_tasa[contador]
+            while eventos and eventos[0][0] < limite:
+                eventos.popleft()
+            self._gauges.setdefault(gauge, {})[()] = sum(n for _, n in eventos)
+
+    def exponer(self):
+        """Texto en formato de exposición de Prometheus (text/plain; version=0.0.4)"""
+        lineas = []
+        with self._lock:
+            self._tasas()
+            familias = {**{n: ("counter", s) for n, s in self._contadores.items()},
+                        **{n: ("gauge", s) for n, s in self._gauges.items()},
+                        **{n: ("histogram", s) for n, s in self._histogramas.items()}}
+            for nombre in sorted(familias):
+                tipo, series = familias[nombre]
+                ayuda = DEFINICIONES.get(nombre, (tipo, nombre))[1]
+                lineas.append(f"# HELP {nombre} {ayuda}")
+                lineas.append(f"# TYPE {nombre} {tipo}")
+                for clave in sorted(series, key=str):
+                    if tipo != "histogram":
+                        lineas.append(f"{nombre}{_formato_etiquetas(clave)} {_formato_valor(series[clave])}")
+                        continue
+                    h = series[clave]
+                    acumulado = 0
+                    for limite, n in zip(BUCKETS_SEGUNDOS, h["buckets"]):
+                        acumulado += n
+                        lineas.append(f"{nombre}_bucket{_formato_etiquetas(clave, [('le', limite)])} {acumulado}")
+                    lineas.append(f"{nombre}_bucket{_formato_etiquetas(clave, [('le', '+Inf')])} {h['cuenta']}")
+                    lineas.append(f"{nombre}_sum{_formato_etiquetas(clave)} {_formato_valor(h['suma'])}")
+                    lineas.append(f"{nombre}_count{_formato_etiquetas(clave)} {h['cuenta']}")
+        return "\n".join(lineas) + "\n"
+
+
+# Registro del proceso. En los trabajadores del pool las mediciones se envían
+# al proceso de la API (ver `configurar`) en lugar de acumularse aquí.
+registro = Registro()
+_destino = None
+
+
+def configurar(destino):
+    """Envía las mediciones a `destino(medicion)` en vez de al registro local (None para revertir)"""
+    global _destino
+    _destino = destino
+
+
+def _medicion(operacion, nombre, valor, etiquetas):
+    if _destino is None:
+        getattr(registro, operacion)(nombre, valor, **etiquetas)
+        return
+    try:
+        _destino({"tipo": "_metrica", "operacion": operacion, "nombre": nombre,
+                  "valor": valor, "etiquetas": etiquetas})
+    except Exception as e:
+        logger.debug(f"No se pudo enviar la métrica {nombre}: {e}")
+
+
+def contar(nombre, incremento=1, **etiquetas):
+    _medicion("contar", nombre, incremento, etiquetas)
+
+
+def observar(nombre, valor, **etiquetas):
+    _medicion("observar", nombre, valor, etiquetas)
+
+
+def observar_etapa(etapa, segundos, modelo):
+    observar("optimizacion_etapa_segundos", segundos, etapa=etapa, modelo=modelo)
+
+
+class Cronometro:
+    """Mide etapas consecutivas: cada `marcar(etapa)` registra el tiempo desde la marca anterior"""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self._ultimo = time.perf_counter()
+
+    def marcar(self, etapa):
+        ahora = time.perf_counter()
+        duracion = ahora - self._ultimo
+        self._ultimo = ahora
+        observar_etapa(etapa, duracion, self.modelo)
+        return duracion
+
+    def reiniciar(self):
+        self._ultimo = time.perf_counter()
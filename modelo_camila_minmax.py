@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import os
 import logging
 import sys
 import pandas as pd
@@ -21,6 +22,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Inventario por sumas acumuladas (PDF) o con variables de estado (INVENTARIO_GRUAS=acumulado|estado)
+INVENTARIO = os.getenv("INVENTARIO_GRUAS", "acumulado")
+
 # -------------------------
 # Leer datos de Excel
 # -------------------------
@@ -220,27 +224,43 @@ m.capacidad = Constraint(m.B, m.T, rule=cap_bloque)
 # ---------------------------------
 # 9) Inventario dinámico (min/max)
 # ---------------------------------
-# PDF: (10)
-def inv_min(m, b, s, t):
-    inv = m.AEbs[b,s] + m.AIbs[b,s]
-    for i in range(1, t+1):
-        if s in m.S_I:
-            inv += m.fd_sbt[s,b,i] - m.fe_sbt[s,b,i]
-        if s in m.S_E:
-            inv += m.fr_sbt[s,b,i] - m.fc_sbt[s,b,i]
-    return inv >= 0
-m.inv_min = Constraint(m.B, m.S, m.T, rule=inv_min)
-
-# PDF: (9)
-def inv_max(m, b, s, t):
-    inv = m.AEbs[b,s] + m.AIbs[b,s]
-    for i in range(1, t+1):
+if INVENTARIO == "estado":
+    # PDF: (9), (10) con el inventario como variable de estado: un balance por
+    # período y los límites como cotas, en vez de la suma acumulada por (b, s, t)
+    def cotas_inv(m, b, s, t):
+        return (0, m.Cbs[b,s])
+    m.inv_bst = Var(m.B, m.S, m.T, bounds=cotas_inv)
+
+    def balance_inv(m, b, s, t):
+        inv = m.inv_bst[b,s,t-1] if t > min(m.T) else m.AEbs[b,s] + m.AIbs[b,s]
         if s in m.S_I:
-            inv += m.fd_sbt[s,b,i] - m.fe_sbt[s,b,i]
+            inv += m.fd_sbt[s,b,t] - m.fe_sbt[s,b,t]
         if s in m.S_E:
-            inv += m.fr_sbt[s,b,i] - m.fc_sbt[s,b,i]
-    return inv <= m.Cbs[b,s]
-m.inv_max = Constraint(m.B, m.S, m.T, rule=inv_max)
+            inv += m.fr_sbt[s,b,t] - m.fc_sbt[s,b,t]
+        return m.inv_bst[b,s,t] == inv
+    m.balance_inv = Constraint(m.B, m.S, m.T, rule=balance_inv)
+else:
+    # PDF: (10)
+    def inv_min(m, b, s, t):
+        inv = m.AEbs[b,s] + m.AIbs[b,s]
+        for i in range(1, t+1):
+            if s in m.S_I:
+                inv += m.fd_sbt[s,b,i] - m.fe_sbt[s,b,i]
+            if s in m.S_E:
+                inv += m.fr_sbt[s,b,i] - m.fc_sbt[s,b,i]
+        return inv >= 0
+    m.inv_min = Constraint(m.B, m.S, m.T, rule=inv_min)
+
+    # PDF: (9)
+    def inv_max(m, b, s, t):
+        inv = m.AEbs[b,s] + m.AIbs[b,s]
+        for i in range(1, t+1):
+            if s in m.S_I:
+                inv += m.fd_sbt[s,b,i] - m.fe_sbt[s,b,i]
+            if s in m.S_E:
+                inv += m.fr_sbt[s,b,i] - m.fc_sbt[s,b,i]
+        return inv <= m.Cbs[b,s]
+    m.inv_max = Constraint(m.B, m.S, m.T, rule=inv_max)
 
 # -------------------------
 # 10) Exclusividad de grúas
@@ -1,4 +1,5 @@
 import math
+import json
 from pyomo.environ import *
 import logging, sys
 from pyomo.opt import TerminationCondition
@@ -8,18 +9,341 @@ import os
 from pyomo.environ import (
     ConcreteModel, Set, Param, Var, Constraint, ConstraintList,
     Objective, NonNegativeIntegers, Binary, NonNegativeReals, minimize,
-    SolverFactory, TerminationCondition, value
+    TerminationCondition, value
 )
 
-from pyomo.contrib.iis import write_iis
 import logging, sys, os
+import progreso
+import cancelacion
+import metricas
+import solvers
+import portafolio
+import perfiles_solver
+from functools import partial
+from cache_resultados import CacheResultados, huella_instancia
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("magdalena")
 
+# Subir al cambiar la formulación: invalida los resultados cacheados
+VERSION_MODELO = 1
 
-def ejecutar_instancias_coloracion(semanas, participacion, resultados_dir):
+OPCIONES_SOLVER = {
+    'LogToConsole': 1,
+    'MIPGap': 1e-6,
+    'FeasibilityTol': 1e-5,
+    'OptimalityTol': 1e-8,
+    'IntFeasTol': 1e-5,
+    'TimeLimit': 60,
+}
+
+ESTADOS_TERMINACION = {
+    TerminationCondition.optimal: 'optimo',
+    TerminationCondition.maxTimeLimit: 'limite_tiempo',
+    TerminationCondition.infeasible: 'infactible',
+}
+
+
+def construir_modelo_coloracion(df):
+    """Construye el modelo de coloración (asignación de segregaciones a bloques) a partir de las hojas de la instancia"""
+    model = ConcreteModel()
+
+    # Conjuntos
+    model.B = Set(initialize=df["B"].iloc[:, 0].tolist())
+    model.S = Set(initialize=df["S"].iloc[:, 0].tolist())
+    model.T = Set(initialize=df["T"].iloc[:, 0].tolist())
+
+    # Parámetros
+    model.C = Param(model.B, initialize=df['C_b'].set_index('B')['C'].to_dict())
+    model.VS = Param(model.B, initialize=df['VS_b'].set_index('B')['VS'].to_dict())
+    model.VSR = Param(model.B, initialize=df['VSR_b'].set_index('B')['VSR'].to_dict())
+    model.KS = Param(model.S, initialize=df['KS_s'].set_index('S')['KS'].to_dict())
+    model.KI = Param(model.S, initialize=df['KI_s'].set_index('S')['KI'].to_dict())
+
+    I0_dict = {(row['S'], row['B']): row['I0'] for _, row in df['I0_sb'].iterrows()}
+    model.I0 = Param(model.S, model.B, initialize=I0_dict, within=NonNegativeIntegers)
+
+    DR_dict = {(row['S'], row['T']): row['DR'] for _, row in df['D_params'].iterrows()}
+    model.DR = Param(model.S, model.T, initialize=DR_dict, within=NonNegativeIntegers)
+
+    DC_dict = {(row['S'], row['T']): row['DC'] for _, row in df['D_params'].iterrows()}
+    model.DC = Param(model.S, model.T, initialize=DC_dict, within=NonNegativeIntegers)
+
+    DD_dict = {(row['S'], row['T']): row['DD'] for _, row in df['D_params'].iterrows()}
+    model.DD = Param(model.S, model.T, initialize=DD_dict, within=NonNegativeIntegers)
+
+    DE_dict = {(row['S'], row['T']): row['DE'] for _, row in df['D_params'].iterrows()}
+    model.DE = Param(model.S, model.T, initialize=DE_dict, within=NonNegativeIntegers)
+
+    lc_dict = {(row['S'], row['B']): row['LC'] for _, row in df['LC_sb'].iterrows()}
+    model.LC = Param(model.S, model.B, initialize=lc_dict, within=NonNegativeIntegers)
+    
+    """
+    # —————— DESPUÉS de leer df['D_params'] ——————
+    #DR  “RECV” = recepción por tierra
+    #DD  “DSCH” = descarga desde buque.
+    # 1) Construir total de contenedores entrantes por segregación y por turno
+    #    TC[s,t] = DR[s,t] + DD[s,t]
+    
+    TC_dict = {
+        (row['S'], row['T']): row['DR'] + row['DD']
+        for _, row in df['D_params'].iterrows()
+    }
+    model.TC = Param(model.S, model.T,
+                     initialize=TC_dict,
+                     within=NonNegativeIntegers)
+
+    
+    # 2) Rigidez y α dinámico
+    # α[s] = β / KS[s]
+    
+    beta = 0.8   # rigidez: ajustar entre 0 < beta ≤ 1
+    alpha_dict = {
+        s: beta / df['KS_s'].set_index('S')['KS'][s]
+        for s in df['KS_s']['S']
+    }
+    model.alpha = Param(model.S,
+                        initialize=alpha_dict,
+                        within=Reals)
+    
+    
+    # 3) Parámetro de dispersión para la Cota Superior de Inventario
+    #    gamma[s] = porcentaje máximo del inventario total de 's' que puede
+    #    estar en un solo bloque.
+    #    Estrategia inicial: Consolidación Balanceada (gamma = 0.5)
+    
+    gamma_val = 0.2  # Porcentaje de dispersión: ajustar entre 0 < gamma_val <= 1
+    gamma_dict = {
+        s: gamma_val
+        for s in df['S']['S']
+    }
+    model.gamma = Param(model.S,
+                        initialize=gamma_dict,
+                        within=Reals)
+    """
+    
+    model.LE = Param(model.B, initialize=df['LE_b'].set_index('B')['LE'].to_dict())
+    model.TEU = Param(model.S, initialize=df['TEU_s'].set_index('S')['TEU'].to_dict())
+    model.OS = Param(initialize=1, mutable=True)
+    model.OI = Param(initialize=0.0204081632653061)
+    model.r = Param(initialize=348)
+    model.R = Param(model.S, initialize=df['R_s'].set_index('S')['R'].to_dict())
+
+    # Variables de decisión
+    model.fr = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
+    model.fc = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
+    model.fd = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
+    model.fe = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
+    model.y = Var(model.S, model.B, model.T, domain=Binary, initialize=0)
+    model.u = Var(model.S, model.B, domain=Binary, initialize=0)
+    model.k = Var(model.S, domain=NonNegativeIntegers, initialize=0)
+    model.i = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
+    model.v = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
+    model.w = Var(model.B, model.T, domain=NonNegativeIntegers, initialize=0)
+    model.p = Var(model.T, domain=NonNegativeIntegers, initialize=0)
+    model.q = Var(model.T, domain=NonNegativeIntegers, initialize=0)
+
+    """
+    # —————— AÑADIR ENTRE VARIABLES y RESTO DE RESTRICCIONES ——————
+    # Restricción de equidad POR TURNO:
+    #   fr + fd >= α[s] * TC[s,t] * u[s,b]
+    
+    def lower_flow_rule(m, s, b, t):
+        rhs = m.alpha[s] * m.TC[s,t]
+        if rhs < 1:
+            return Constraint.Skip
+        return m.fr[s,b,t] + m.fd[s,b,t] >= math.ceil(rhs) * m.u[s,b]
+    model.constraint_lower_flow = Constraint(model.S, model.B, model.T, rule=lower_flow_rule)
+
+    
+    #DR  “RECV” = recepción por tierra
+    #DD  “DSCH” = descarga desde buque.
+    # ———————————————————————————————————————————————
+    
+    
+    # Restricción de Cota Superior Dinámica (Dispersión de Stock)
+    # i[s,b,t] <= gamma[s] * SUM(i[s,b',t] para todo b')
+    # Limita el inventario acumulado en un bloque a un % del total de esa segregación.
+        
+    def dynamic_upper_inventory_rule(m, s, b, t):
+        # 1. Omitir la restricción para el primer periodo de tiempo.
+        if m.T.first() == t:
+            return Constraint.Skip
+    
+        # 2. Omitir la restricción si no hay flujo de entrada para esa segregación en ese turno.
+        #    La regla de dispersión solo tiene sentido cuando el modelo puede DECIDIR dónde
+        #    ubicar los nuevos contenedores. Si no llegan nuevos, no tiene flexibilidad.
+        if m.TC[s, t] == 0:
+            return Constraint.Skip
+        
+        # Suma del inventario de la segregación 's' en todos los bloques para el turno 't'
+        total_inventory_s = sum(m.i[s, b_prime, t] for b_prime in m.B)
+        
+        # El inventario en el bloque 'b' no puede superar el porcentaje gamma del total
+        return m.i[s, b, t] <= m.gamma[s] * total_inventory_s
+        
+    model.constraint_dynamic_upper_inventory = Constraint(model.S, model.B, model.T, rule=dynamic_upper_inventory_rule)
+    """
+    
+    # Restricciones (2)
+    model.constraint_2 = ConstraintList()
+    for t in model.T:
+        for b in model.B:
+            for s in model.S:
+                if t == 1:
+                    model.constraint_2.add(
+                        expr=model.i[s, b, t] == model.I0[s, b] + model.fr[s, b, t] + model.fd[s, b, t]
+                        - model.fc[s, b, t] - model.fe[s, b, t]
+                    )
+                else:
+                    model.constraint_2.add(
+                        expr=model.i[s, b, t] == model.i[s, b, t-1] + model.fr[s, b, t] + model.fd[s, b, t]
+                        - model.fc[s, b, t] - model.fe[s, b, t]
+                    )
+
+    # Restricciones (3)
+    model.constraint_3 = ConstraintList()
+    for t in model.T:
+        for b in model.B:
+            for s in model.S:
+                model.constraint_3.add(expr=model.i[s, b, t] <= model.v[s, b, t] * model.OS * model.C[b])
+
+    # Restricción (4)
+    model.constraint_4 = ConstraintList()
+    for t in model.T:
+        for b in model.B:
+            for s in model.S:
+                model.constraint_4.add(
+                    expr=(model.v[s, b, t] - 1) * model.C[b] * model.OS + model.C[b] * model.OI <= model.i[s, b, t]
+                )
+
+    # Restricciones (5)
+    model.constraint_5 = ConstraintList()
+    for t in model.T:
+        for s in model.S:
+            model.constraint_5.add(expr=sum(model.fr[s, b, t] for b in model.B) == model.DR[s, t])
+
+    # Restricciones (6)
+    model.constraint_6 = ConstraintList()
+    for t in model.T:
+        for s in model.S:
+            model.constraint_6.add(expr=sum(model.fc[s, b, t] for b in model.B) == model.DC[s, t])
+
+    # Restricciones (7)
+    model.constraint_7 = ConstraintList()
+    for t in model.T:
+        for s in model.S:
+            model.constraint_7.add(expr=sum(model.fd[s, b, t] for b in model.B) == model.DD[s, t])
+
+    # Restricciones (8)
+    model.constraint_8 = ConstraintList()
+    for t in model.T:
+        for s in model.S:
+            model.constraint_8.add(expr=sum(model.fe[s, b, t] for b in model.B) == model.DE[s, t])
+
+    # Restricciones (9)
+    model.constraint_9 = ConstraintList()
+    for t in model.T:
+        for b in model.B:
+            for s in model.S:
+                model.constraint_9.add(
+                    expr=model.fr[s, b, t] + model.fd[s, b, t] <= (model.DR[s, t] + model.DD[s, t]) * model.y[s, b, t]
+                )
+
+    # Restricciones (10)
+    model.constraint_10 = ConstraintList()
+    for t in model.T:
+        for b in model.B:
+            for s in model.S:
+                model.constraint_10.add(expr=(model.fr[s, b, t] + model.fd[s, b, t]) >= model.y[s, b, t])
+
+    # Restricciones (11)
+    model.constraint_11 = ConstraintList()
+    for b in model.B:
+        for s in model.S:
+            model.constraint_11.add(expr=model.u[s, b] <= sum(model.y[s, b, t] for t in model.T))
+
+    # Restricción (12)
+    model.constraint_12 = ConstraintList()
+    for t in model.T:
+        for b in model.B:
+            for s in model.S:
+                model.constraint_12.add(expr=model.u[s, b] >= model.y[s, b, t])
+
+    # Restricciones (13)
+    model.constraint_13 = ConstraintList()
+    for t in model.T:
+        for b in model.B:
+            model.constraint_13.add(expr=sum(model.v[s, b, t] * model.TEU[s] for s in model.S) <= model.VS[b])
+
+    # Restricciones (14)
+    model.constraint_14 = ConstraintList()
+    for s in model.S:
+        model.constraint_14.add(expr=model.k[s] == sum(model.u[s, b] for b in model.B))
+
+    # Restricciones (15)
+    model.constraint_15 = ConstraintList()
+    for s in model.S:
+        if sum(model.DR[s, t] for t in model.T) == 0 and sum(model.DD[s, t] for t in model.T) == 0:
+            model.constraint_15.add(model.k[s] == 0)
+        else:
+            model.constraint_15.add(model.k[s] <= model.KS[s])
+
+    # Restricciones (16)
+    model.constraint_16 = ConstraintList()
+    for s in model.S:
+        if sum(model.DR[s, t] for t in model.T) == 0 and sum(model.DD[s, t] for t in model.T) == 0:
+            model.constraint_16.add(model.k[s] == 0)
+        else:
+            model.constraint_16.add(model.k[s] >= model.KI[s])
+
+    # Restricciones (17), (18) y (19)
+    model.constraint_17 = ConstraintList()
+    model.constraint_18 = ConstraintList()
+    model.constraint_19 = ConstraintList()
+    for t in model.T:
+        for b in model.B:
+            model.constraint_17.add(
+                model.w[b, t] == sum(model.fr[s, b, t] + model.fc[s, b, t] + model.fd[s, b, t] + model.fe[s, b, t]
+                                    for s in model.S)
+            )
+        for b in model.B:
+            model.constraint_18.add(model.p[t] >= model.w[b, t])
+            model.constraint_19.add(model.q[t] <= model.w[b, t])
+
+    # Restricción (20)
+    model.constraint_20 = ConstraintList()
+    for t in model.T:
+        model.constraint_20.add(expr=model.p[t] - model.q[t] <= model.r)
+
+    # Restricción (21)
+    model.constraint_21 = ConstraintList()
+    for t in model.T:
+        for b in model.B:
+            model.constraint_21.add(
+                expr=sum(model.v[s, b, t] * model.TEU[s] * model.R[s] for s in model.S) <= model.VSR[b]
+            )
+
+    # Función objetivo
+    def objective_rule(model):
+        w1 = 1
+        w2 = 1
+        return (
+            w1 * sum(model.fc[s, b, t] * model.LC[s, b] for b in model.B for s in model.S for t in model.T)
+            + w2 * sum(model.fe[s, b, t] * model.LE[b] for b in model.B for s in model.S for t in model.T)
+        )
+
+    model.objective = Objective(rule=objective_rule, sense=minimize)
+
+    return model
+
+
+def ejecutar_instancias_coloracion(semanas, participacion, resultados_dir, forzar=False, tiempo_limite=None):
     
+    cache = CacheResultados("coloracion")
+    opciones = perfiles_solver.opciones_solver("coloracion", OPCIONES_SOLVER, solvers.BACKEND)
+    if tiempo_limite is not None:
+        opciones['TimeLimit'] = tiempo_limite
     semanas_a_procesar = semanas
     PARTICIPACION_C = participacion
     resultados_dir_script = resultados_dir
@@ -41,8 +365,16 @@ def ejecutar_instancias_coloracion(semanas, participacion, resultados_dir):
     print("Iniciando procesamiento de optimización para múltiples semanas...")
     
     semanas_infactibles = []
-    for semana_actual in semanas_a_procesar:
+    semanas_sin_solucion = []
+    total_semanas = len(semanas_a_procesar)
+    for indice, semana_actual in enumerate(semanas_a_procesar, start=1):
+        if cancelacion.solicitada():
+            # Las semanas no intentadas no cuentan como procesadas
+            semanas_a_procesar = semanas_a_procesar[:indice - 1]
+            break
         print(f"\n--- Procesando Semana: {semana_actual} ---")
+        progreso.emitir("semana_iniciada", etapa="coloracion", semana=semana_actual,
+                        indice=indice - 1, total=total_semanas)
     
         # Inicializar listas para almacenar resultados PARA LA SEMANA ACTUAL
         # Esto asegura que cada archivo "Distancias_Modelo..." contenga solo los datos de su semana.
@@ -63,313 +395,58 @@ def ejecutar_instancias_coloracion(semanas, participacion, resultados_dir):
             # Verificar si el archivo de instancia existe ANTES de intentar leerlo
             if not os.path.exists(archivo_instancia):
                 print(f"ADVERTENCIA: Archivo de instancia no encontrado para la semana {semana_actual}: {archivo_instancia}. Saltando esta semana.")
+                progreso.emitir("semana_omitida", etapa="coloracion", semana=semana_actual,
+                                motivo="instancia no encontrada", indice=indice, total=total_semanas)
                 continue # Pasar a la siguiente semana
     
-            model = ConcreteModel()
-    
             # Leer DataFrame
             df = pd.read_excel(archivo_instancia, sheet_name=None)
+
+            # Resultado ya calculado para esta misma instancia y configuración
+            huella = huella_instancia(df, VERSION_MODELO, opciones, backend=solvers.BACKEND,
+                                      portafolio=portafolio.PORTAFOLIO, semana=semana_actual,
+                                      participacion=PARTICIPACION_C)
+            entrada = None if forzar else cache.obtener(huella)
+            metricas.contar("optimizacion_cache_total", modelo="coloracion",
+                            resultado="fallo" if entrada is None else "acierto")
+            if entrada is not None:
+                print(f"Semana {semana_actual}: resultado en cache ({entrada['estado']}), se omite la resolución")
+                metricas.contar("optimizacion_semanas_procesadas_total")
+                if entrada["estado"] == "infactible":
+                    semanas_infactibles.append(semana_actual)
+                    progreso.emitir("semana_infactible", etapa="coloracion", semana=semana_actual,
+                                    cache=True, indice=indice, total=total_semanas)
+                else:
+                    progreso.emitir("semana_resuelta", etapa="coloracion", semana=semana_actual,
+                                    objetivo=entrada.get("objetivo"), gap=entrada.get("gap"),
+                                    cache=True, indice=indice, total=total_semanas)
+                continue
             
+            cronometro = metricas.Cronometro("coloracion")
+
             # Crear diccionario de mapeo de segregaciones
             segregacion_map = dict(zip(df['S']['S'], df['S']['Segregacion']))
     
-            # Conjuntos
-            model.B = Set(initialize=df["B"].iloc[:, 0].tolist())
-            model.S = Set(initialize=df["S"].iloc[:, 0].tolist())
-            model.T = Set(initialize=df["T"].iloc[:, 0].tolist())
-    
-            # Parámetros
-            model.C = Param(model.B, initialize=df['C_b'].set_index('B')['C'].to_dict())
-            model.VS = Param(model.B, initialize=df['VS_b'].set_index('B')['VS'].to_dict())
-            model.VSR = Param(model.B, initialize=df['VSR_b'].set_index('B')['VSR'].to_dict())
-            model.KS = Param(model.S, initialize=df['KS_s'].set_index('S')['KS'].to_dict())
-            model.KI = Param(model.S, initialize=df['KI_s'].set_index('S')['KI'].to_dict())
-    
-            I0_dict = {(row['S'], row['B']): row['I0'] for _, row in df['I0_sb'].iterrows()}
-            model.I0 = Param(model.S, model.B, initialize=I0_dict, within=NonNegativeIntegers)
-    
-            DR_dict = {(row['S'], row['T']): row['DR'] for _, row in df['D_params'].iterrows()}
-            model.DR = Param(model.S, model.T, initialize=DR_dict, within=NonNegativeIntegers)
-    
-            DC_dict = {(row['S'], row['T']): row['DC'] for _, row in df['D_params'].iterrows()}
-            model.DC = Param(model.S, model.T, initialize=DC_dict, within=NonNegativeIntegers)
-    
-            DD_dict = {(row['S'], row['T']): row['DD'] for _, row in df['D_params'].iterrows()}
-            model.DD = Param(model.S, model.T, initialize=DD_dict, within=NonNegativeIntegers)
-    
-            DE_dict = {(row['S'], row['T']): row['DE'] for _, row in df['D_params'].iterrows()}
-            model.DE = Param(model.S, model.T, initialize=DE_dict, within=NonNegativeIntegers)
-    
-            lc_dict = {(row['S'], row['B']): row['LC'] for _, row in df['LC_sb'].iterrows()}
-            model.LC = Param(model.S, model.B, initialize=lc_dict, within=NonNegativeIntegers)
-            
-            """
-            # —————— DESPUÉS de leer df['D_params'] ——————
-            #DR  “RECV” = recepción por tierra
-            #DD  “DSCH” = descarga desde buque.
-            # 1) Construir total de contenedores entrantes por segregación y por turno
-            #    TC[s,t] = DR[s,t] + DD[s,t]
+            model = construir_modelo_coloracion(df)
             
-            TC_dict = {
-                (row['S'], row['T']): row['DR'] + row['DD']
-                for _, row in df['D_params'].iterrows()
-            }
-            model.TC = Param(model.S, model.T,
-                             initialize=TC_dict,
-                             within=NonNegativeIntegers)
-        
-            
-            # 2) Rigidez y α dinámico
-            # α[s] = β / KS[s]
-            
-            beta = 0.8   # rigidez: ajustar entre 0 < beta ≤ 1
-            alpha_dict = {
-                s: beta / df['KS_s'].set_index('S')['KS'][s]
-                for s in df['KS_s']['S']
-            }
-            model.alpha = Param(model.S,
-                                initialize=alpha_dict,
-                                within=Reals)
-            
-            
-            # 3) Parámetro de dispersión para la Cota Superior de Inventario
-            #    gamma[s] = porcentaje máximo del inventario total de 's' que puede
-            #    estar en un solo bloque.
-            #    Estrategia inicial: Consolidación Balanceada (gamma = 0.5)
-            
-            gamma_val = 0.2  # Porcentaje de dispersión: ajustar entre 0 < gamma_val <= 1
-            gamma_dict = {
-                s: gamma_val
-                for s in df['S']['S']
-            }
-            model.gamma = Param(model.S,
-                                initialize=gamma_dict,
-                                within=Reals)
-            """
-            
-            model.LE = Param(model.B, initialize=df['LE_b'].set_index('B')['LE'].to_dict())
-            model.TEU = Param(model.S, initialize=df['TEU_s'].set_index('S')['TEU'].to_dict())
-            model.OS = Param(initialize=1, mutable=True)
-            model.OI = Param(initialize=0.0204081632653061)
-            model.r = Param(initialize=348)
-            model.R = Param(model.S, initialize=df['R_s'].set_index('S')['R'].to_dict())
-    
-            # Variables de decisión
-            model.fr = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
-            model.fc = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
-            model.fd = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
-            model.fe = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
-            model.y = Var(model.S, model.B, model.T, domain=Binary, initialize=0)
-            model.u = Var(model.S, model.B, domain=Binary, initialize=0)
-            model.k = Var(model.S, domain=NonNegativeIntegers, initialize=0)
-            model.i = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
-            model.v = Var(model.S, model.B, model.T, domain=NonNegativeIntegers, initialize=0)
-            model.w = Var(model.B, model.T, domain=NonNegativeIntegers, initialize=0)
-            model.p = Var(model.T, domain=NonNegativeIntegers, initialize=0)
-            model.q = Var(model.T, domain=NonNegativeIntegers, initialize=0)
-        
-            """
-            # —————— AÑADIR ENTRE VARIABLES y RESTO DE RESTRICCIONES ——————
-            # Restricción de equidad POR TURNO:
-            #   fr + fd >= α[s] * TC[s,t] * u[s,b]
-            
-            def lower_flow_rule(m, s, b, t):
-                rhs = m.alpha[s] * m.TC[s,t]
-                if rhs < 1:
-                    return Constraint.Skip
-                return m.fr[s,b,t] + m.fd[s,b,t] >= math.ceil(rhs) * m.u[s,b]
-            model.constraint_lower_flow = Constraint(model.S, model.B, model.T, rule=lower_flow_rule)
-    
-            
-            #DR  “RECV” = recepción por tierra
-            #DD  “DSCH” = descarga desde buque.
-            # ———————————————————————————————————————————————
-            
-            
-            # Restricción de Cota Superior Dinámica (Dispersión de Stock)
-            # i[s,b,t] <= gamma[s] * SUM(i[s,b',t] para todo b')
-            # Limita el inventario acumulado en un bloque a un % del total de esa segregación.
-                
-            def dynamic_upper_inventory_rule(m, s, b, t):
-                # 1. Omitir la restricción para el primer periodo de tiempo.
-                if m.T.first() == t:
-                    return Constraint.Skip
-            
-                # 2. Omitir la restricción si no hay flujo de entrada para esa segregación en ese turno.
-                #    La regla de dispersión solo tiene sentido cuando el modelo puede DECIDIR dónde
-                #    ubicar los nuevos contenedores. Si no llegan nuevos, no tiene flexibilidad.
-                if m.TC[s, t] == 0:
-                    return Constraint.Skip
-                
-                # Suma del inventario de la segregación 's' en todos los bloques para el turno 't'
-                total_inventory_s = sum(m.i[s, b_prime, t] for b_prime in m.B)
-                
-                # El inventario en el bloque 'b' no puede superar el porcentaje gamma del total
-                return m.i[s, b, t] <= m.gamma[s] * total_inventory_s
-                
-            model.constraint_dynamic_upper_inventory = Constraint(model.S, model.B, model.T, rule=dynamic_upper_inventory_rule)
-            """
-            
-            # Restricciones (2)
-            model.constraint_2 = ConstraintList()
-            for t in model.T:
-                for b in model.B:
-                    for s in model.S:
-                        if t == 1:
-                            model.constraint_2.add(
-                                expr=model.i[s, b, t] == model.I0[s, b] + model.fr[s, b, t] + model.fd[s, b, t]
-                                - model.fc[s, b, t] - model.fe[s, b, t]
-                            )
-                        else:
-                            model.constraint_2.add(
-                                expr=model.i[s, b, t] == model.i[s, b, t-1] + model.fr[s, b, t] + model.fd[s, b, t]
-                                - model.fc[s, b, t] - model.fe[s, b, t]
-                            )
-    
-            # Restricciones (3)
-            model.constraint_3 = ConstraintList()
-            for t in model.T:
-                for b in model.B:
-                    for s in model.S:
-                        model.constraint_3.add(expr=model.i[s, b, t] <= model.v[s, b, t] * model.OS * model.C[b])
-    
-            # Restricción (4)
-            model.constraint_4 = ConstraintList()
-            for t in model.T:
-                for b in model.B:
-                    for s in model.S:
-                        model.constraint_4.add(
-                            expr=(model.v[s, b, t] - 1) * model.C[b] * model.OS + model.C[b] * model.OI <= model.i[s, b, t]
-                        )
-    
-            # Restricciones (5)
-            model.constraint_5 = ConstraintList()
-            for t in model.T:
-                for s in model.S:
-                    model.constraint_5.add(expr=sum(model.fr[s, b, t] for b in model.B) == model.DR[s, t])
-    
-            # Restricciones (6)
-            model.constraint_6 = ConstraintList()
-            for t in model.T:
-                for s in model.S:
-                    model.constraint_6.add(expr=sum(model.fc[s, b, t] for b in model.B) == model.DC[s, t])
-    
-            # Restricciones (7)
-            model.constraint_7 = ConstraintList()
-            for t in model.T:
-                for s in model.S:
-                    model.constraint_7.add(expr=sum(model.fd[s, b, t] for b in model.B) == model.DD[s, t])
-    
-            # Restricciones (8)
-            model.constraint_8 = ConstraintList()
-            for t in model.T:
-                for s in model.S:
-                    model.constraint_8.add(expr=sum(model.fe[s, b, t] for b in model.B) == model.DE[s, t])
-    
-            # Restricciones (9)
-            model.constraint_9 = ConstraintList()
-            for t in model.T:
-                for b in model.B:
-                    for s in model.S:
-                        model.constraint_9.add(
-                            expr=model.fr[s, b, t] + model.fd[s, b, t] <= (model.DR[s, t] + model.DD[s, t]) * model.y[s, b, t]
-                        )
-    
-            # Restricciones (10)
-            model.constraint_10 = ConstraintList()
-            for t in model.T:
-                for b in model.B:
-                    for s in model.S:
-                        model.constraint_10.add(expr=(model.fr[s, b, t] + model.fd[s, b, t]) >= model.y[s, b, t])
-    
-            # Restricciones (11)
-            model.constraint_11 = ConstraintList()
-            for b in model.B:
-                for s in model.S:
-                    model.constraint_11.add(expr=model.u[s, b] <= sum(model.y[s, b, t] for t in model.T))
-    
-            # Restricción (12)
-            model.constraint_12 = ConstraintList()
-            for t in model.T:
-                for b in model.B:
-                    for s in model.S:
-                        model.constraint_12.add(expr=model.u[s, b] >= model.y[s, b, t])
-    
-            # Restricciones (13)
-            model.constraint_13 = ConstraintList()
-            for t in model.T:
-                for b in model.B:
-                    model.constraint_13.add(expr=sum(model.v[s, b, t] * model.TEU[s] for s in model.S) <= model.VS[b])
-    
-            # Restricciones (14)
-            model.constraint_14 = ConstraintList()
-            for s in model.S:
-                model.constraint_14.add(expr=model.k[s] == sum(model.u[s, b] for b in model.B))
-    
-            # Restricciones (15)
-            model.constraint_15 = ConstraintList()
-            for s in model.S:
-                if sum(model.DR[s, t] for t in model.T) == 0 and sum(model.DD[s, t] for t in model.T) == 0:
-                    model.constraint_15.add(model.k[s] == 0)
-                else:
-                    model.constraint_15.add(model.k[s] <= model.KS[s])
-    
-            # Restricciones (16)
-            model.constraint_16 = ConstraintList()
-            for s in model.S:
-                if sum(model.DR[s, t] for t in model.T) == 0 and sum(model.DD[s, t] for t in model.T) == 0:
-                    model.constraint_16.add(model.k[s] == 0)
-                else:
-                    model.constraint_16.add(model.k[s] >= model.KI[s])
-    
-            # Restricciones (17), (18) y (19)
-            model.constraint_17 = ConstraintList()
-            model.constraint_18 = ConstraintList()
-            model.constraint_19 = ConstraintList()
-            for t in model.T:
-                for b in model.B:
-                    model.constraint_17.add(
-                        model.w[b, t] == sum(model.fr[s, b, t] + model.fc[s, b, t] + model.fd[s, b, t] + model.fe[s, b, t]
-                                            for s in model.S)
-                    )
-                for b in model.B:
-                    model.constraint_18.add(model.p[t] >= model.w[b, t])
-                    model.constraint_19.add(model.q[t] <= model.w[b, t])
-    
-            # Restricción (20)
-            model.constraint_20 = ConstraintList()
-            for t in model.T:
-                model.constraint_20.add(expr=model.p[t] - model.q[t] <= model.r)
-    
-            # Restricción (21)
-            model.constraint_21 = ConstraintList()
-            for t in model.T:
-                for b in model.B:
-                    model.constraint_21.add(
-                        expr=sum(model.v[s, b, t] * model.TEU[s] * model.R[s] for s in model.S) <= model.VSR[b]
-                    )
-    
-            # Función objetivo
-            def objective_rule(model):
-                w1 = 1
-                w2 = 1
-                return (
-                    w1 * sum(model.fc[s, b, t] * model.LC[s, b] for b in model.B for s in model.S for t in model.T)
-                    + w2 * sum(model.fe[s, b, t] * model.LE[b] for b in model.B for s in model.S for t in model.T)
-                )
-    
-            model.objective = Objective(rule=objective_rule, sense=minimize)
-            
-            solver = SolverFactory('gurobi')
-            solver.options['LogToConsole']=1 
-            solver.options['LogFile']= os.path.join(directorio_datos_semanal, f'gurobi_log_{semana_actual}.log') # Log semanal
-            solver.options['MIPGap'] = 1e-6 
-            solver.options['FeasibilityTol'] = 1e-5 
-            solver.options['OptimalityTol'] = 1e-8 
-            solver.options['IntFeasTol'] = 1e-5 
-            solver.options['TimeLimit'] = 60 
-    
-            res = solver.solve(model, tee=False, load_solutions=False)
+            log_semana = os.path.join(directorio_datos_semanal, f'gurobi_log_{semana_actual}.log')  # Log semanal
+            if portafolio.PORTAFOLIO:
+                # Carrera de configuraciones: cada proceso reconstruye el modelo de la semana
+                resolutor = portafolio.Resolutor(model, partial(construir_modelo_coloracion, df), opciones,
+                                                 log=log_semana, familia="coloracion")
+            else:
+                resolutor = solvers.Resolutor(model, opciones, callback=cancelacion.callback_gurobi, log=log_semana)
+            cronometro.marcar("construccion")
+    
+            # Una sola resolución (o carrera): la terminación decide entre infactible y óptimo
+            with progreso.contexto(etapa="coloracion", semana=semana_actual):
+                res = resolutor.resolver(tee=True)
+            cronometro.marcar("resolucion")
+            if cancelacion.solicitada():
+                # Semana interrumpida a medio resolver: se descarta
+                metricas.contar("optimizacion_estado_solver_total", modelo="coloracion", estado="cancelado")
+                semanas_a_procesar = semanas_a_procesar[:indice - 1]
+                break
             if res.solver.termination_condition == TerminationCondition.infeasible:
                 logger.error("🚨 Infactible en %s: escribiendo IIS…", semana_actual)
             
@@ -392,14 +469,34 @@ def ejecutar_instancias_coloracion(semanas, participacion, resultados_dir):
                     results_dir_semana,
                     f"modelo_inf_{semana_actual}.iis"
                 )
-                write_iis(model, iis_path, solver="gurobi")
+                resolutor.escribir_iis(iis_path)
             
                 semanas_infactibles.append(semana_actual)
+                metricas.contar("optimizacion_estado_solver_total", modelo="coloracion", estado="infactible")
+                metricas.contar("optimizacion_semanas_procesadas_total")
+                cache.guardar(huella, {"estado": "infactible", "semana": semana_actual,
+                                       "participacion": PARTICIPACION_C, "archivos": []})
+                progreso.emitir("semana_infactible", etapa="coloracion", semana=semana_actual,
+                                indice=indice, total=total_semanas)
                 continue
     
             
-            logger.info("✅ Semana %s factible. Resolviendo óptimo…", semana_actual)
-            res = solver.solve(model, tee=True)
+            terminacion = res.solver.termination_condition
+            if not resolutor.hay_solucion(res):
+                # Límite alcanzado sin incumbente: no hay nada que escribir ni guardar en cache
+                logger.warning("Semana %s sin solución (%s)", semana_actual, terminacion)
+                semanas_sin_solucion.append(semana_actual)
+                metricas.contar("optimizacion_estado_solver_total", modelo="coloracion", estado="sin_solucion")
+                metricas.contar("optimizacion_semanas_procesadas_total")
+                progreso.emitir("semana_omitida", etapa="coloracion", semana=semana_actual,
+                                motivo="sin solución", indice=indice, total=total_semanas)
+                continue
+            logger.info("✅ Semana %s factible. Cargando solución…", semana_actual)
+            resolutor.cargar_solucion(res)
+            metricas.contar("optimizacion_estado_solver_total", modelo="coloracion",
+                            estado=ESTADOS_TERMINACION.get(terminacion, str(terminacion)))
+            objetivo_semana = value(model.objective)
+            gap_semana = progreso.gap_mip(res)
     
     
             # Calcular distancia para exportación (expo)
@@ -572,6 +669,7 @@ def ejecutar_instancias_coloracion(semanas, participacion, resultados_dir):
             df_turno_bloque = pd.DataFrame(datos_turno_bloque)
             df_pivot_turno_bloque = df_turno_bloque.pivot(index='Turno', columns='Bloque', values='Contenedores')
             df_pivot_turno_bloque = df_pivot_turno_bloque.fillna(0) 
+            cronometro.marcar("extraccion")
             
             with pd.ExcelWriter(resultado_file_semana, engine='openpyxl') as writer:
                 df_gen.to_excel(writer, sheet_name="General", index=False)
@@ -593,6 +691,8 @@ def ejecutar_instancias_coloracion(semanas, participacion, resultados_dir):
     
         except Exception as e:
             print(f"Error procesando semana {semana_actual}: Error - {str(e)}")
+            progreso.emitir("semana_omitida", etapa="coloracion", semana=semana_actual,
+                            motivo=str(e), indice=indice, total=total_semanas)
             continue # Continuar con la siguiente semana en caso de error
     
         # Crear DataFrames a partir de las listas de la semana actual
@@ -607,13 +707,24 @@ def ejecutar_instancias_coloracion(semanas, participacion, resultados_dir):
                 df_resultados_segregacion_actual_df.to_excel(writer, sheet_name='Resultados por Segregación', index=False)
                 df_detalle_movimientos_actual_df.to_excel(writer, sheet_name='Detalle de Movimientos', index=False)
             print(f"Resumen de distancias para {semana_actual} guardado en {resultado_distancias_file_semana}")
+            cronometro.marcar("escritura_excel")
+            cache.guardar(huella, {
+                "estado": "factible", "semana": semana_actual, "participacion": PARTICIPACION_C,
+                "objetivo": objetivo_semana, "gap": gap_semana,
+                "archivos": [resultado_file_semana, resultado_distancias_file_semana]
+            })
         except Exception as e:
             print(f"Error al guardar el archivo de resumen de distancias para {semana_actual}: {str(e)}")
+
+        metricas.contar("optimizacion_semanas_procesadas_total")
+        progreso.emitir("semana_resuelta", etapa="coloracion", semana=semana_actual,
+                        objetivo=objetivo_semana, gap=gap_semana,
+                        indice=indice, total=total_semanas)
     
     print("\nProceso completado para todas las semanas.")
     
     semanas_filtradas = [s for s in semanas_a_procesar 
-                         if s not in semanas_infactibles]
+                         if s not in semanas_infactibles and s not in semanas_sin_solucion]
     
     # Imprimimos en el formato literal Python que pedías
     print("\nsemanas_a_procesar = [")
@@ -622,3 +733,26 @@ def ejecutar_instancias_coloracion(semanas, participacion, resultados_dir):
     print("]")
     
     return semanas_filtradas, semanas_infactibles
+
+
+def leer_plan_semana(semana, participacion, resultados_dir):
+    """Resumen, distancias por segregación y asignación segregación-bloque de una semana resuelta"""
+    carpeta = os.path.join(resultados_dir, "resultados_magdalena", semana)
+    archivo_distancias = os.path.join(carpeta, f"Distancias_Modelo_{semana}_{participacion}.xlsx")
+    archivo_resultado = os.path.join(carpeta, f"resultado_{semana}_{participacion}_K.xlsx")
+    if not (os.path.exists(archivo_distancias) and os.path.exists(archivo_resultado)):
+        return None
+
+    distancias = pd.read_excel(archivo_distancias, sheet_name=['Resumen Semanal', 'Resultados por Segregación'])
+    asignado = pd.read_excel(archivo_resultado, sheet_name='Asignado')
+    asignado = asignado[asignado['Asignado'].fillna(0).round() == 1]
+    asignado = asignado[['Segregación', 'Bloque', 'Periodo']].rename(
+        columns={'Segregación': 'segregacion', 'Bloque': 'bloque', 'Periodo': 'periodo'}
+    )
+    # to_json convierte los tipos numpy a tipos JSON nativos
+    resumen = json.loads(distancias['Resumen Semanal'].to_json(orient='records'))
+    return {
+        'resumen': resumen[0] if resumen else None,
+        'segregaciones': json.loads(distancias['Resultados por Segregación'].to_json(orient='records')),
+        'asignaciones': json.loads(asignado.to_json(orient='records'))
+    }
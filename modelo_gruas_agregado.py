@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import time
+import logging
+from collections import deque
+
+from pyomo.environ import (
+    ConcreteModel, Set, Var, Expression, Constraint, NonNegativeIntegers, NonNegativeReals, value
+)
+
+import progreso
+import cancelacion
+import metricas
+import solvers
+from modelo_gruas_maxmin import (
+    cargar_datos, cliques_maximales, variables_flujo, restricciones_flujo, construir_modelo_gruas,
+    ESTADOS_TERMINACION
+)
+
+logger = logging.getLogger("camila")
+
+# Holgura al verificar la solución desagregada contra el modelo completo
+TOLERANCIA = 1e-5
+
+VARIABLES_FLUJO = ("fc_sbt", "fd_sbt", "fr_sbt", "fe_sbt")
+
+
+def clases_compatibles(m):
+    """Conjuntos maximales de bloques que puede atender una misma grúa (todos sus pares con ex = 2)"""
+    bloques = list(m.B)
+    vecinos = {b1: {b2 for b2 in bloques if b2 != b1 and value(m.ex[b1,b2]) >= 2} for b1 in bloques}
+    return cliques_maximales(bloques, vecinos)
+
+
+def construir_modelo_agregado(datos, inventario="acumulado"):
+    """Fase 1: los mismos flujos, con grúas contadas por clase de bloques compatibles en vez de individuales.
+
+    Toda grúa del modelo completo atiende bloques de alguna clase (la exclusividad
+    Z_gb), así que el modelo agregado es una relajación: su óptimo es una cota
+    superior, y cualquier solución suya se puede asignar a grúas individuales.
+    """
+    m = ConcreteModel()
+    cargar_datos(m, datos)
+    clases = clases_compatibles(m)
+    m.C = Set(initialize=range(len(clases)))
+    m.CB = Set(dimen=2, initialize=[(c, b) for c, clase in enumerate(clases) for b in clase])
+
+    variables_flujo(m)
+    m.n_cbt = Var(m.CB, m.T, domain=NonNegativeIntegers)  # grúas de la clase c en el bloque b
+    m.a_cbt = Var(m.CB, m.T, domain=NonNegativeIntegers)  # grúas de la clase c que inician un tramo en b
+    m.m_c = Var(m.C, domain=NonNegativeIntegers)          # grúas asignadas a la clase c
+    m.min_diff_val = Var(domain=NonNegativeReals, name="min_diff_val")
+
+    def n_bt(m, b, t):
+        return sum(m.n_cbt[c,bb,t] for c, bb in m.CB if bb == b)
+    m.n_bt = Expression(m.B, m.T, rule=n_bt)
+
+    restricciones_flujo(m, lambda m, b, t: m.n_bt[b,t], inventario)
+
+    # Grúas simultáneas por bloque (W) y en total (Rmax)
+    def max_collision(m, b, t):
+        return m.n_bt[b,t] <= m.W
+    m.max_collision = Constraint(m.B, m.T, rule=max_collision)
+
+    def max_cranes(m, t):
+        return sum(m.n_bt[b,t] for b in m.B) <= m.Rmax
+    m.max_cranes = Constraint(m.T, rule=max_cranes)
+
+    # Cada grúa de una clase atiende un solo bloque por período
+    def gruas_clase(m, c, t):
+        return sum(m.n_cbt[cc,b,t] for cc, b in m.CB if cc == c) <= m.m_c[c]
+    m.gruas_clase = Constraint(m.C, m.T, rule=gruas_clase)
+
+    def gruas_disponibles(m):
+        return sum(m.m_c[c] for c in m.C) <= len(m.G)
+    m.gruas_disponibles = Constraint(rule=gruas_disponibles)
+
+    # Cada grúa que llega a un bloque inicia un tramo...
+    def inicio_tramo(m, c, b, t):
+        anterior = m.n_cbt[c,b,t-1] if t > min(m.T) else 0
+        return m.n_cbt[c,b,t] - anterior <= m.a_cbt[c,b,t]
+    m.inicio_tramo = Constraint(m.CB, m.T, rule=inicio_tramo)
+
+    # ...y se queda al menos K períodos o hasta el final del turno: las grúas
+    # que iniciaron en los últimos K períodos siguen en el bloque
+    def duracion_minima(m, c, b, t):
+        K_int = int(value(m.K))
+        return sum(m.a_cbt[c,b,r] for r in m.T if t - K_int < r <= t) <= m.n_cbt[c,b,t]
+    m.duracion_minima = Constraint(m.CB, m.T, rule=duracion_minima)
+    return m
+
+
+def descomponer_tramos(agregado):
+    """Tramos (clase, bloque, inicio, fin) que cubren n_cbt; cuando baja la dotación salen primero las grúas más antiguas"""
+    periodos = sorted(agregado.T)
+    tramos = []
+    for c, b in agregado.CB:
+        activos = deque()
+        for i, t in enumerate(periodos):
+            n = int(round(agregado.n_cbt[c,b,t].value or 0))
+            while len(activos) > n:
+                tramos.append((c, b, activos.popleft(), periodos[i-1]))
+            while len(activos) < n:
+                activos.append(t)
+        tramos.extend((c, b, inicio, periodos[-1]) for inicio in activos)
+    return tramos
+
+
+def asignar_tramos(agregado, tramos):
+    """Fase 2: lista de (tramo, grúa), o None si algún tramo no cabe.
+
+    Dentro de una clase no hay más de m_c tramos simultáneos, así que recorrerlos
+    por inicio y dar a cada uno una grúa libre de la clase siempre alcanza
+    (coloración de un grafo de intervalos). Se prefiere la grúa que ya estaba en
+    el mismo bloque.
+    """
+    gruas = iter(agregado.G)
+    asignacion = []
+    for c in agregado.C:
+        propias = [next(gruas) for _ in range(int(round(agregado.m_c[c].value or 0)))]
+        ultimo = {g: (None, None) for g in propias}  # grúa -> (bloque, fin) de su último tramo
+        for tramo in sorted((tr for tr in tramos if tr[0] == c), key=lambda tr: (tr[2], tr[3])):
+            _, b, inicio, fin = tramo
+            libres = [g for g in propias if ultimo[g][1] is None or ultimo[g][1] < inicio]
+            if not libres:
+                return None
+            g = next((g for g in libres if ultimo[g][0] == b), libres[0])
+            asignacion.append((tramo, g))
+            ultimo[g] = (b, fin)
+    return asignacion
+
+
+def desagregar(datos, agregado, asignacion, inventario="acumulado"):
+    """Modelo completo con la solución cargada: flujos de la fase 1 e ygbt, alpha_gbt y Z_gb de los tramos"""
+    m = construir_modelo_gruas(datos, inventario=inventario)
+    for v in m.component_data_objects(Var):
+        v.set_value(0)
+    for nombre in VARIABLES_FLUJO:
+        origen, destino = getattr(agregado, nombre), getattr(m, nombre)
+        for idx in origen:
+            destino[idx].set_value(round(origen[idx].value or 0))
+    if inventario == "estado":
+        for idx in agregado.inv_bst:
+            m.inv_bst[idx].set_value(agregado.inv_bst[idx].value)
+    m.min_diff_val.set_value(agregado.min_diff_val.value)
+
+    for (_, b, inicio, fin), g in asignacion:
+        m.alpha_gbt[g,b,inicio].set_value(1)
+        m.Z_gb[g,b].set_value(1)
+        for t in m.T:
+            if inicio <= t <= fin:
+                m.ygbt[g,b,t].set_value(1)
+    return m
+
+
+def primera_violacion(m, tolerancia=TOLERANCIA):
+    """Nombre de la primera restricción activa que la solución cargada no cumple, o None"""
+    for c in m.component_data_objects(Constraint, active=True):
+        cuerpo = value(c.body)
+        if c.has_lb() and cuerpo < value(c.lower) - tolerancia:
+            return c.name
+        if c.has_ub() and cuerpo > value(c.upper) + tolerancia:
+            return c.name
+    return None
+
+
+def resolver_dos_fases(datos, opciones, log=None, cronometro=None, inventario="acumulado"):
+    """Resuelve el turno con el modelo agregado y luego asigna las grúas individuales.
+
+    Retorna (modelo completo con la solución, estado, gap, segundos) o None si
+    hay que resolver el modelo completo: fase 1 sin solución (la infactibilidad
+    y su IIS se tratan sobre el modelo completo) o solución desagregada que no
+    cumple el modelo completo. La cota y el gap de la fase 1 valen para la
+    solución desagregada, que tiene el mismo objetivo.
+    """
+    agregado = construir_modelo_agregado(datos, inventario)
+    resolutor = solvers.Resolutor(agregado, opciones, log=log, callback=cancelacion.callback_gurobi)
+    if cronometro is not None:
+        cronometro.marcar("construccion")
+
+    inicio = time.perf_counter()
+    res = resolutor.resolver()
+    terminacion = res.solver.termination_condition
+    gap = progreso.gap_mip(res, maximizar=True)
+    if cancelacion.solicitada():
+        return construir_modelo_gruas(datos, inventario=inventario), 'cancelado', gap, time.perf_counter() - inicio
+    if not resolutor.hay_solucion(res):
+        logger.warning("Fase 1 sin solución (%s)", terminacion)
+        metricas.contar("optimizacion_dos_fases_total", resultado="respaldo")
+        return None
+    resolutor.cargar_solucion(res)
+
+    tramos = descomponer_tramos(agregado)
+    asignacion = asignar_tramos(agregado, tramos)
+    if asignacion is None:
+        logger.warning("Fase 2: %d tramos sin asignación a las grúas", len(tramos))
+        metricas.contar("optimizacion_dos_fases_total", resultado="respaldo")
+        return None
+
+    m = desagregar(datos, agregado, asignacion, inventario)
+    violada = primera_violacion(m)
+    if violada is not None:
+        logger.warning(f"La solución desagregada no cumple {violada}")
+        metricas.contar("optimizacion_dos_fases_total", resultado="respaldo")
+        return None
+    tiempo = time.perf_counter() - inicio
+    if cronometro is not None:
+        cronometro.marcar("resolucion")
+    metricas.contar("optimizacion_dos_fases_total", resultado="desagregada")
+    logger.info("Dos fases: %d tramos asignados en %.1fs", len(tramos), tiempo)
+    return m, ESTADOS_TERMINACION.get(terminacion, str(terminacion)), gap, tiempo
@@ -2,194 +2,337 @@
 # coding: utf-8
 
 import os
+import time
 import logging
 import sys
+from functools import partial
 import pandas as pd
 from pyomo.environ import (
     ConcreteModel, Set, Param, Var, Constraint, ConstraintList,
     Objective, NonNegativeIntegers, Binary, NonNegativeReals, maximize,
-    SolverFactory, TerminationCondition, value
+    TerminationCondition, value
 )
-from pyomo.contrib.iis import write_iis
+from dataclasses import asdict
+from resultado_gruas import AsignacionGrua, ResultadoGruas
+from cache_resultados import CacheResultados, huella_instancia
+import progreso
+import cancelacion
+import metricas
+import solvers
+import portafolio
+import perfiles_solver
 
 logger = logging.getLogger("camila")
 
+ESTADOS_TERMINACION = {
+    TerminationCondition.optimal: 'optimo',
+    TerminationCondition.maxTimeLimit: 'limite_tiempo',
+    TerminationCondition.infeasible: 'infactible',
+}
 
-def ejecutar_instancias_camila(semanas, turnos, participacion, base_instancias, base_resultados):
-    
-    
-    for semana in semanas:
-        out_dir = os.path.join(base_resultados, f"resultados_turno_{semana}")
-        os.makedirs(out_dir, exist_ok=True)
-        
-        for turno in turnos:
-            logger.info(f"--- INICIANDO TURNO {turno} / SEMANA {semana} ---")
-            datos = pd.read_excel(
-                os.path.join(base_instancias,f"instancias_turno_{semana}",
-                             f"Instancia_{semana}_{participacion}_T{turno}.xlsx"),
-                sheet_name=None
-            )
-            
-            # -------------------------
-            # Modelo
-            # -------------------------
-            m = ConcreteModel()
-            
-            # Conjuntos
-            m.G   = Set(initialize=[r['G']   for r in datos['G'].to_dict('records')])
-            m.B   = Set(initialize=[r['B']   for r in datos['B'].to_dict('records')])
-            m.B_I = Set(initialize=[r['B_I'] for r in datos['B_I'].to_dict('records')])
-            m.B_E = Set(initialize=[r['B_E'] for r in datos['B_E'].to_dict('records')])
-            m.T   = Set(initialize=[r['T']   for r in datos['T'].to_dict('records')])
-            m.S   = Set(initialize=[r['S']   for r in datos['S'].to_dict('records')])
-            m.S_E = Set(initialize=[r['S_E'] for r in datos['S_E'].to_dict('records')])
-            m.S_I = Set(initialize=[r['S_I'] for r in datos['S_I'].to_dict('records')])
-            
-            # Parámetros matriciales
-            m.AEbs = Param(
-                m.B, m.S,
-                initialize={(r['B_E'], r['S_E']): r['AEbs'] for r in datos['AEbs'].to_dict('records')},
-                default=0, mutable=True
-            )
-            m.AIbs = Param(
-                m.B, m.S,
-                initialize={(r['B_I'], r['S_I']): r['AIbs'] for r in datos['AIbs'].to_dict('records')},
-                default=0, mutable=True
-            )
-            m.Gs    = Param(
-                m.S_E,
-                initialize={r['S_E']: r['Gs'] for r in datos['Gs'].to_dict('records')},
-                default=0, mutable=True
-            )
-            m.DMEst = Param(
-                m.S_E, m.T,
-                initialize={(r['S_E'], r['T']): r['DMEst'] for r in datos['DMEst'].to_dict('records')},
-                default=0, mutable=True
-            )
-            m.DMIst = Param(
-                m.S_I, m.T,
-                initialize={(r['S_I'], r['T']): r['DMIst'] for r in datos['DMIst'].to_dict('records')},
-                default=0, mutable=True
-            )
-            m.Cbs   = Param(
-                m.B, m.S,
-                initialize={(r['B'], r['S']): r['Cbs'] for r in datos['Cbs'].to_dict('records')},
-                default=0, mutable=True
-            )
-            
-            # Parámetros escalares
-            m.mu   = Param(initialize=datos['mu' ].iloc[0,0], mutable=True)
-            m.W    = Param(initialize=datos['W'  ].iloc[0,0], mutable=True)
-            m.K    = Param(initialize=datos['K'  ].iloc[0,0], mutable=True)
-            m.Rmax = Param(initialize=datos['Rmax'].iloc[0,0], mutable=True)
-            
-            # Exclusividad de bloques
-            adyac_no_exc = {
-                ('b1','b3'),('b1','b1'),('b2','b4'),('b2','b2'),
-                ('b3','b3'),('b6','b3'),('b4','b4'),('b5','b5'),
-                ('b6','b6'),('b7','b7'),('b8','b8'),('b9','b9'),
-                ('b7','b4'),('b5','b8')
-            }
-            def init_ex(m, b1, b2):
-                return 2 if (b1,b2) in adyac_no_exc or (b2,b1) in adyac_no_exc or b1==b2 else 1
-            m.ex = Param(m.B, m.B, initialize=init_ex, mutable=True)
-            
-            # Variables
-            m.fc_sbt    = Var(m.S, m.B, m.T, domain=NonNegativeIntegers)
-            m.fd_sbt    = Var(m.S, m.B, m.T, domain=NonNegativeIntegers)
-            m.fr_sbt    = Var(m.S, m.B, m.T, domain=NonNegativeIntegers)
-            m.fe_sbt    = Var(m.S, m.B, m.T, domain=NonNegativeIntegers)
-            m.ygbt      = Var(m.G, m.B, m.T, domain=Binary)
-            m.alpha_gbt = Var(m.G, m.B, m.T, domain=Binary)
-            m.Z_gb      = Var(m.G, m.B,      domain=Binary)
-            m.min_diff_val = Var(domain=NonNegativeReals, name="min_diff_val")
-            
-            # ----------------------------------------------------------------
-            # 1) “Forzar cero” fuera de dominios (bloques vs. flujos y segregaciones)
-            # ----------------------------------------------------------------
-            m.bloque_I = ConstraintList()
-            for b in m.B:
-                for t in m.T:
-                    if b not in m.B_I:
-                        for s in m.S_I:
-                            m.bloque_I.add(m.fd_sbt[s,b,t] == 0)
-                            m.bloque_I.add(m.fe_sbt[s,b,t] == 0)
-                    if b not in m.B_E:
-                        for s in m.S_E:
-                            m.bloque_I.add(m.fc_sbt[s,b,t] == 0)
-                            m.bloque_I.add(m.fr_sbt[s,b,t] == 0)
-            
-            m.seg_I = ConstraintList()
-            for b in m.B:
-                for t in m.T:
-                    for s in m.S:
-                        if s not in m.S_I:
-                            m.seg_I.add(m.fd_sbt[s,b,t] == 0)
-                            m.seg_I.add(m.fe_sbt[s,b,t] == 0)
-                        if s not in m.S_E:
-                            m.seg_I.add(m.fc_sbt[s,b,t] == 0)
-                            m.seg_I.add(m.fr_sbt[s,b,t] == 0)
-            
-            # -------------------------
-            # 2) Demanda por turno
-            # -------------------------
-            def dem_carga(m, s, t):
+# Subir al cambiar la formulación: invalida los resultados cacheados
+VERSION_MODELO = 1
+
+OPCIONES_SOLVER = {
+    'LogToConsole': 1,
+    'TimeLimit':    15,
+}
+
+# Ruptura de simetría entre grúas (SIMETRIA_GRUAS=ninguna|uso|lex)
+MODOS_SIMETRIA = ("ninguna", "uso", "lex")
+SIMETRIA = os.getenv("SIMETRIA_GRUAS", "ninguna")
+
+# Inventario por sumas acumuladas o con variables de estado (INVENTARIO_GRUAS=acumulado|estado)
+MODOS_INVENTARIO = ("acumulado", "estado")
+INVENTARIO = os.getenv("INVENTARIO_GRUAS", "acumulado")
+
+# Resolución: modelo completo o en dos fases (MODO_GRUAS=completo|dos_fases)
+MODOS_GRUAS = ("completo", "dos_fases")
+MODO = os.getenv("MODO_GRUAS", "completo")
+
+# Heurística golosa + búsqueda en vecindarios (HEURISTICA_GRUAS=ninguna|respaldo|arranque):
+# respaldo usa su plan cuando el solver termina sin una solución mejor;
+# arranque además lo entrega al solver como solución inicial. Por defecto no se usa
+MODOS_HEURISTICA = ("ninguna", "respaldo", "arranque")
+HEURISTICA = os.getenv("HEURISTICA_GRUAS", "ninguna")
+SEGUNDOS_HEURISTICA = float(os.getenv("HEURISTICA_GRUAS_SEGUNDOS", "1"))
+
+# Filas de exclusividad entre bloques y no-solapamiento de alphas (EXCLUSIVIDAD_GRUAS):
+#   completa: una por par (bloques o inicios), como en la formulación original
+#   cliques:  una por clique de bloques incompatibles y por ventana de K períodos
+#   perezosa: ninguna al inicio; se separan en un callback de Gurobi (con otro
+#             backend se usa cliques)
+MODOS_EXCLUSIVIDAD = ("completa", "cliques", "perezosa")
+EXCLUSIVIDAD = os.getenv("EXCLUSIVIDAD_GRUAS", "completa")
+
+# Estados que no se reutilizan: la corrida no terminó normalmente
+ESTADOS_NO_CACHEABLES = {'cancelado', 'sin_solucion'}
+
+
+def cargar_datos(m, datos):
+    """Conjuntos y parámetros de la instancia (comunes al modelo completo y al agregado)"""
+    # Conjuntos
+    m.G   = Set(initialize=[r['G']   for r in datos['G'].to_dict('records')])
+    m.B   = Set(initialize=[r['B']   for r in datos['B'].to_dict('records')])
+    m.B_I = Set(initialize=[r['B_I'] for r in datos['B_I'].to_dict('records')])
+    m.B_E = Set(initialize=[r['B_E'] for r in datos['B_E'].to_dict('records')])
+    m.T   = Set(initialize=[r['T']   for r in datos['T'].to_dict('records')])
+    m.S   = Set(initialize=[r['S']   for r in datos['S'].to_dict('records')])
+    m.S_E = Set(initialize=[r['S_E'] for r in datos['S_E'].to_dict('records')])
+    m.S_I = Set(initialize=[r['S_I'] for r in datos['S_I'].to_dict('records')])
+
+    # Parámetros matriciales
+    m.AEbs = Param(
+        m.B, m.S,
+        initialize={(r['B_E'], r['S_E']): r['AEbs'] for r in datos['AEbs'].to_dict('records')},
+        default=0, mutable=True
+    )
+    m.AIbs = Param(
+        m.B, m.S,
+        initialize={(r['B_I'], r['S_I']): r['AIbs'] for r in datos['AIbs'].to_dict('records')},
+        default=0, mutable=True
+    )
+    m.Gs    = Param(
+        m.S_E,
+        initialize={r['S_E']: r['Gs'] for r in datos['Gs'].to_dict('records')},
+        default=0, mutable=True
+    )
+    m.DMEst = Param(
+        m.S_E, m.T,
+        initialize={(r['S_E'], r['T']): r['DMEst'] for r in datos['DMEst'].to_dict('records')},
+        default=0, mutable=True
+    )
+    m.DMIst = Param(
+        m.S_I, m.T,
+        initialize={(r['S_I'], r['T']): r['DMIst'] for r in datos['DMIst'].to_dict('records')},
+        default=0, mutable=True
+    )
+    m.Cbs   = Param(
+        m.B, m.S,
+        initialize={(r['B'], r['S']): r['Cbs'] for r in datos['Cbs'].to_dict('records')},
+        default=0, mutable=True
+    )
+
+    # Parámetros escalares
+    m.mu   = Param(initialize=datos['mu' ].iloc[0,0], mutable=True)
+    m.W    = Param(initialize=datos['W'  ].iloc[0,0], mutable=True)
+    m.K    = Param(initialize=datos['K'  ].iloc[0,0], mutable=True)
+    m.Rmax = Param(initialize=datos['Rmax'].iloc[0,0], mutable=True)
+
+    # Exclusividad de bloques
+    adyac_no_exc = {
+        ('b1','b3'),('b1','b1'),('b2','b4'),('b2','b2'),
+        ('b3','b3'),('b6','b3'),('b4','b4'),('b5','b5'),
+        ('b6','b6'),('b7','b7'),('b8','b8'),('b9','b9'),
+        ('b7','b4'),('b5','b8')
+    }
+    def init_ex(m, b1, b2):
+        return 2 if (b1,b2) in adyac_no_exc or (b2,b1) in adyac_no_exc or b1==b2 else 1
+    m.ex = Param(m.B, m.B, initialize=init_ex, mutable=True)
+
+
+def cliques_maximales(nodos, vecinos):
+    """Cliques maximales (Bron-Kerbosch) del grafo con adyacencias `vecinos[nodo]`"""
+    cliques = []
+
+    def extender(clique, candidatos, excluidos):
+        if not candidatos and not excluidos:
+            cliques.append(tuple(clique))
+            return
+        for v in list(candidatos):
+            extender(clique + [v], [u for u in candidatos if u in vecinos[v]],
+                     [u for u in excluidos if u in vecinos[v]])
+            candidatos.remove(v)
+            excluidos.append(v)
+
+    extender([], list(nodos), [])
+    return cliques
+
+
+def variables_flujo(m):
+    m.fc_sbt    = Var(m.S, m.B, m.T, domain=NonNegativeIntegers)
+    m.fd_sbt    = Var(m.S, m.B, m.T, domain=NonNegativeIntegers)
+    m.fr_sbt    = Var(m.S, m.B, m.T, domain=NonNegativeIntegers)
+    m.fe_sbt    = Var(m.S, m.B, m.T, domain=NonNegativeIntegers)
+
+
+def restricciones_flujo(m, dotacion, inventario="acumulado"):
+    """Flujos, inventarios, capacidad y objetivo max-min.
+
+    `dotacion(m, b, t)` es la expresión con el número de grúas del bloque b en
+    el período t (suma de ygbt en el modelo completo, n_bt en el agregado).
+    `inventario` elige la formulación de los inventarios (MODOS_INVENTARIO).
+    """
+    # ----------------------------------------------------------------
+    # 1) “Forzar cero” fuera de dominios (bloques vs. flujos y segregaciones)
+    # ----------------------------------------------------------------
+    m.bloque_I = ConstraintList()
+    for b in m.B:
+        for t in m.T:
+            if b not in m.B_I:
+                for s in m.S_I:
+                    m.bloque_I.add(m.fd_sbt[s,b,t] == 0)
+                    m.bloque_I.add(m.fe_sbt[s,b,t] == 0)
+            if b not in m.B_E:
+                for s in m.S_E:
+                    m.bloque_I.add(m.fc_sbt[s,b,t] == 0)
+                    m.bloque_I.add(m.fr_sbt[s,b,t] == 0)
+
+    m.seg_I = ConstraintList()
+    for b in m.B:
+        for t in m.T:
+            for s in m.S:
+                if s not in m.S_I:
+                    m.seg_I.add(m.fd_sbt[s,b,t] == 0)
+                    m.seg_I.add(m.fe_sbt[s,b,t] == 0)
+                if s not in m.S_E:
+                    m.seg_I.add(m.fc_sbt[s,b,t] == 0)
+                    m.seg_I.add(m.fr_sbt[s,b,t] == 0)
+
+    # -------------------------
+    # 2) Demanda por turno
+    # -------------------------
+    def dem_carga(m, s, t):
+        if s in m.S_E:
+            return sum(m.fc_sbt[s,b,t] for b in m.B_E) == m.DMEst[s,t]
+        return Constraint.Skip
+    m.dem_carga = Constraint(m.S, m.T, rule=dem_carga)
+
+    def dem_descarga(m, s, t):
+        if s in m.S_I:
+            return sum(m.fd_sbt[s,b,t] for b in m.B_I) == m.DMIst[s,t]
+        return Constraint.Skip
+    m.dem_descarga = Constraint(m.S, m.T, rule=dem_descarga)
+
+    # -------------------------
+    # 3) Inventario final
+    # -------------------------
+    def dem_recibir(m, s):
+        return sum(m.fr_sbt[s,b,t] for b in m.B_E for t in m.T) == m.Gs[s]
+    m.dem_recibir = Constraint(m.S_E, rule=dem_recibir)
+
+    def inv_entregar(m, b, s):
+        if s in m.S_I and b in m.B_I:
+            return sum(m.fe_sbt[s,b,t] for t in m.T) == m.AIbs[b,s]
+        return Constraint.Skip
+    m.inv_entregar = Constraint(m.B, m.S, rule=inv_entregar)
+
+    # ---------------------------------
+    # 4) Restricciones de diferencia
+    # ---------------------------------
+    def diff_rule(m, b, t):
+        carga     = sum(m.fc_sbt[s,b,t] + m.fr_sbt[s,b,t] for s in m.S_E)
+        descarga  = sum(m.fd_sbt[s,b,t] + m.fe_sbt[s,b,t] for s in m.S_I)
+        return m.mu * dotacion(m, b, t) - (carga + descarga) >= m.min_diff_val
+    m.diff_constr = Constraint(m.B, m.T, rule=diff_rule)
+
+    # -------------------------
+    # 5) Objetivo
+    # -------------------------
+    m.obj = Objective(expr=m.min_diff_val, sense=maximize)
+
+    # -------------------------
+    # 8) Capacidad por turno
+    # -------------------------
+    def cap_bloque(m, b, t):
+        carg = sum(m.fc_sbt[s,b,t] + m.fr_sbt[s,b,t] for s in m.S_E)
+        desc = sum(m.fd_sbt[s,b,t] + m.fe_sbt[s,b,t] for s in m.S_I)
+        return carg + desc <= m.mu * dotacion(m, b, t)
+    m.capacidad = Constraint(m.B, m.T, rule=cap_bloque)
+
+    # ---------------------------------
+    # 9) Inventario dinámico (min/max)
+    # ---------------------------------
+    if inventario == "estado":
+        # Inventario como variable de estado: un balance por período (como
+        # constraint_2 en coloración) en vez de rehacer la suma acumulada en
+        # cada (b, s, t); los límites min/max quedan como cotas de la variable
+        def cotas_inv(m, b, s, t):
+            return (0, m.Cbs[b,s])
+        m.inv_bst = Var(m.B, m.S, m.T, bounds=cotas_inv)
+
+        def balance_inv(m, b, s, t):
+            inv = m.inv_bst[b,s,t-1] if t > min(m.T) else m.AEbs[b,s] + m.AIbs[b,s]
+            if s in m.S_I:
+                inv += m.fd_sbt[s,b,t] - m.fe_sbt[s,b,t]
+            if s in m.S_E:
+                inv += m.fr_sbt[s,b,t] - m.fc_sbt[s,b,t]
+            return m.inv_bst[b,s,t] == inv
+        m.balance_inv = Constraint(m.B, m.S, m.T, rule=balance_inv)
+    else:
+        def inv_min(m, b, s, t):
+            inv = m.AEbs[b,s] + m.AIbs[b,s]
+            for i in range(1, t+1):
+                if s in m.S_I:
+                    inv += m.fd_sbt[s,b,i] - m.fe_sbt[s,b,i]
                 if s in m.S_E:
-                    return sum(m.fc_sbt[s,b,t] for b in m.B_E) == m.DMEst[s,t]
-                return Constraint.Skip
-            m.dem_carga = Constraint(m.S, m.T, rule=dem_carga)
-            
-            def dem_descarga(m, s, t):
+                    inv += m.fr_sbt[s,b,i] - m.fc_sbt[s,b,i]
+            return inv >= 0
+        m.inv_min = Constraint(m.B, m.S, m.T, rule=inv_min)
+
+        def inv_max(m, b, s, t):
+            inv = m.AEbs[b,s] + m.AIbs[b,s]
+            for i in range(1, t+1):
                 if s in m.S_I:
-                    return sum(m.fd_sbt[s,b,t] for b in m.B_I) == m.DMIst[s,t]
-                return Constraint.Skip
-            m.dem_descarga = Constraint(m.S, m.T, rule=dem_descarga)
-            
-            # -------------------------
-            # 3) Inventario final
-            # -------------------------
-            def dem_recibir(m, s):
-                return sum(m.fr_sbt[s,b,t] for b in m.B_E for t in m.T) == m.Gs[s]
-            m.dem_recibir = Constraint(m.S_E, rule=dem_recibir)
-            
-            def inv_entregar(m, b, s):
-                if s in m.S_I and b in m.B_I:
-                    return sum(m.fe_sbt[s,b,t] for t in m.T) == m.AIbs[b,s]
-                return Constraint.Skip
-            m.inv_entregar = Constraint(m.B, m.S, rule=inv_entregar)
-            
-            # ---------------------------------
-            # 4) Restricciones de diferencia
-            # ---------------------------------
-            def diff_rule(m, b, t):
-                carga     = sum(m.fc_sbt[s,b,t] + m.fr_sbt[s,b,t] for s in m.S_E)
-                descarga  = sum(m.fd_sbt[s,b,t] + m.fe_sbt[s,b,t] for s in m.S_I)
-                return m.mu * sum(m.ygbt[g,b,t] for g in m.G) - (carga + descarga) >= m.min_diff_val
-            m.diff_constr = Constraint(m.B, m.T, rule=diff_rule)
-            
-            # -------------------------
-            # 5) Objetivo
-            # -------------------------
-            m.obj = Objective(expr=m.min_diff_val, sense=maximize)
-            
-            # -------------------------
-            # 6) Vincular Z y ygbt
-            # -------------------------
-            m.Z_y_up = ConstraintList()
-            m.y_Z_up = ConstraintList()
-            for g in m.G:
-                for b in m.B:
-                    m.Z_y_up.add(
-                        m.Z_gb[g,b] <= sum(m.ygbt[g,b,t] for t in m.T)
-                    )
-                    m.y_Z_up.add(
-                        sum(m.ygbt[g,b,t] for t in m.T) <= m.Z_gb[g,b] * len(m.T)
-                    )
-            
-            # ---------------------------------
-            # 7) Exclusividad entre bloques (Z)
-            # ---------------------------------
-            m.excl = ConstraintList()
+                    inv += m.fd_sbt[s,b,i] - m.fe_sbt[s,b,i]
+                if s in m.S_E:
+                    inv += m.fr_sbt[s,b,i] - m.fc_sbt[s,b,i]
+            return inv <= m.Cbs[b,s]
+        m.inv_max = Constraint(m.B, m.S, m.T, rule=inv_max)
+
+
+def construir_modelo_gruas(datos, simetria="ninguna", inventario="acumulado", exclusividad="completa"):
+    """Construye el modelo max-min de asignación de grúas a partir de las hojas de la instancia"""
+    if simetria not in MODOS_SIMETRIA:
+        raise ValueError(f"Modo de simetría desconocido: {simetria}. Disponibles: {list(MODOS_SIMETRIA)}")
+    if inventario not in MODOS_INVENTARIO:
+        raise ValueError(f"Formulación de inventario desconocida: {inventario}. Disponibles: {list(MODOS_INVENTARIO)}")
+    if exclusividad not in MODOS_EXCLUSIVIDAD:
+        raise ValueError(f"Modo de exclusividad desconocido: {exclusividad}. "
+                         f"Disponibles: {list(MODOS_EXCLUSIVIDAD)}")
+    m = ConcreteModel()
+    cargar_datos(m, datos)
+
+    # Variables
+    variables_flujo(m)
+    m.ygbt      = Var(m.G, m.B, m.T, domain=Binary)
+    m.alpha_gbt = Var(m.G, m.B, m.T, domain=Binary)
+    m.Z_gb      = Var(m.G, m.B,      domain=Binary)
+    m.min_diff_val = Var(domain=NonNegativeReals, name="min_diff_val")
+
+    restricciones_flujo(m, lambda m, b, t: sum(m.ygbt[g,b,t] for g in m.G), inventario)
+
+    # -------------------------
+    # 6) Vincular Z y ygbt
+    # -------------------------
+    m.Z_y_up = ConstraintList()
+    m.y_Z_up = ConstraintList()
+    for g in m.G:
+        for b in m.B:
+            m.Z_y_up.add(
+                m.Z_gb[g,b] <= sum(m.ygbt[g,b,t] for t in m.T)
+            )
+            m.y_Z_up.add(
+                sum(m.ygbt[g,b,t] for t in m.T) <= m.Z_gb[g,b] * len(m.T)
+            )
+
+    # ---------------------------------
+    # 7) Exclusividad entre bloques (Z)
+    # ---------------------------------
+    if exclusividad == "cliques":
+        # Con Z binaria solo importan los pares con ex = 1: a lo más un bloque
+        # por cada clique maximal de bloques incompatibles entre sí
+        bloques = list(m.B)
+        incompatibles = {b1: {b2 for b2 in bloques if b2 != b1 and value(m.ex[b1,b2]) < 2} for b1 in bloques}
+        cliques = [c for c in cliques_maximales(bloques, incompatibles) if len(c) > 1]
+
+        def excl_clique(m, g, i):
+            return sum(m.Z_gb[g,b] for b in cliques[i]) <= 1
+        m.excl = Constraint(m.G, range(len(cliques)), rule=excl_clique)
+    else:
+        # perezosa: la lista queda vacía y la llena separar_exclusividad
+        m.excl = ConstraintList()
+        if exclusividad == "completa":
             for g in m.G:
                 for b1 in m.B:
                     for b2 in m.B:
@@ -197,94 +340,72 @@ def ejecutar_instancias_camila(semanas, turnos, participacion, base_instancias,
                             m.excl.add(
                                 m.Z_gb[g,b1] + m.Z_gb[g,b2] <= m.ex[b1,b2]
                             )
-            
-            # -------------------------
-            # 8) Capacidad por turno
-            # -------------------------
-            def cap_bloque(m, b, t):
-                carg = sum(m.fc_sbt[s,b,t] + m.fr_sbt[s,b,t] for s in m.S_E)
-                desc = sum(m.fd_sbt[s,b,t] + m.fe_sbt[s,b,t] for s in m.S_I)
-                return carg + desc <= m.mu * sum(m.ygbt[g,b,t] for g in m.G)
-            m.capacidad = Constraint(m.B, m.T, rule=cap_bloque)
-            
-            # ---------------------------------
-            # 9) Inventario dinámico (min/max)
-            # ---------------------------------
-            def inv_min(m, b, s, t):
-                inv = m.AEbs[b,s] + m.AIbs[b,s]
-                for i in range(1, t+1):
-                    if s in m.S_I:
-                        inv += m.fd_sbt[s,b,i] - m.fe_sbt[s,b,i]
-                    if s in m.S_E:
-                        inv += m.fr_sbt[s,b,i] - m.fc_sbt[s,b,i]
-                return inv >= 0
-            m.inv_min = Constraint(m.B, m.S, m.T, rule=inv_min)
-            
-            def inv_max(m, b, s, t):
-                inv = m.AEbs[b,s] + m.AIbs[b,s]
-                for i in range(1, t+1):
-                    if s in m.S_I:
-                        inv += m.fd_sbt[s,b,i] - m.fe_sbt[s,b,i]
-                    if s in m.S_E:
-                        inv += m.fr_sbt[s,b,i] - m.fc_sbt[s,b,i]
-                return inv <= m.Cbs[b,s]
-            m.inv_max = Constraint(m.B, m.S, m.T, rule=inv_max)
-            
-            # -------------------------
-            # 10) Exclusividad de grúas
-            # -------------------------
-            def one_block(m, g, t):
-                return sum(m.ygbt[g,b,t] for b in m.B) <= 1
-            m.one_block = Constraint(m.G, m.T, rule=one_block)
-            
-            def max_cranes(m, t):
-                return sum(m.ygbt[g,b,t] for g in m.G for b in m.B) <= m.Rmax
-            m.max_cranes = Constraint(m.T, rule=max_cranes)
-            
-            def max_collision(m, b, t):
-                return sum(m.ygbt[g,b,t] for g in m.G) <= m.W
-            m.max_collision = Constraint(m.B, m.T, rule=max_collision)
-            
-            # -------------------------------------------------
-            # 11) Duración mínima: normal y tramo final
-            # -------------------------------------------------
-            def lb_constraint(m, g, b, t):
-                K_int = int(value(m.K))
-                if t <= max(m.T) - K_int + 1:
-                    return K_int*m.alpha_gbt[g,b,t] <= sum(
-                        m.ygbt[g,b,r] for r in m.T if r>=t and r< t+K_int
-                    )
-                return Constraint.Skip
-            m.lb_constraint = Constraint(m.G, m.B, m.T, rule=lb_constraint)
-            
-            def lb1_constraint(m, g, b, t):
-                K_int = int(value(m.K))
-                if t > max(m.T) - K_int + 1:
-                    return (max(m.T)-t+1)*m.alpha_gbt[g,b,t] <= sum(
-                        m.ygbt[g,b,r] for r in m.T if r>=t
-                    )
-                return Constraint.Skip
-            m.lb1_constraint = Constraint(m.G, m.B, m.T, rule=lb1_constraint)
-            
-            # -------------------------------------------------
-            # 12) Upper‐bound (activaciones)
-            # -------------------------------------------------
-            def ub_constraint(m, g, b, t):
-                if t > min(m.T):
-                    return m.ygbt[g,b,t] <= m.ygbt[g,b,t-1] + m.alpha_gbt[g,b,t]
-                return Constraint.Skip
-            m.ub_constraint = Constraint(m.G, m.B, m.T, rule=ub_constraint)
-            
-            def ub1_constraint(m, g, b):
-                t0 = min(m.T)
-                return m.ygbt[g,b,t0] <= m.alpha_gbt[g,b,t0]
-            m.ub1_constraint = Constraint(m.G, m.B, rule=ub1_constraint)
-            
-            # -------------------------------------------------
-            # 13) No‐solapamiento de alphas
-            # -------------------------------------------------
-            m.alpha_nosolapa = ConstraintList()
-            K_int = int(value(m.K))
+
+    # -------------------------
+    # 10) Exclusividad de grúas
+    # -------------------------
+    def one_block(m, g, t):
+        return sum(m.ygbt[g,b,t] for b in m.B) <= 1
+    m.one_block = Constraint(m.G, m.T, rule=one_block)
+
+    def max_cranes(m, t):
+        return sum(m.ygbt[g,b,t] for g in m.G for b in m.B) <= m.Rmax
+    m.max_cranes = Constraint(m.T, rule=max_cranes)
+
+    def max_collision(m, b, t):
+        return sum(m.ygbt[g,b,t] for g in m.G) <= m.W
+    m.max_collision = Constraint(m.B, m.T, rule=max_collision)
+
+    # -------------------------------------------------
+    # 11) Duración mínima: normal y tramo final
+    # -------------------------------------------------
+    def lb_constraint(m, g, b, t):
+        K_int = int(value(m.K))
+        if t <= max(m.T) - K_int + 1:
+            return K_int*m.alpha_gbt[g,b,t] <= sum(
+                m.ygbt[g,b,r] for r in m.T if r>=t and r< t+K_int
+            )
+        return Constraint.Skip
+    m.lb_constraint = Constraint(m.G, m.B, m.T, rule=lb_constraint)
+
+    def lb1_constraint(m, g, b, t):
+        K_int = int(value(m.K))
+        if t > max(m.T) - K_int + 1:
+            return (max(m.T)-t+1)*m.alpha_gbt[g,b,t] <= sum(
+                m.ygbt[g,b,r] for r in m.T if r>=t
+            )
+        return Constraint.Skip
+    m.lb1_constraint = Constraint(m.G, m.B, m.T, rule=lb1_constraint)
+
+    # -------------------------------------------------
+    # 12) Upper‐bound (activaciones)
+    # -------------------------------------------------
+    def ub_constraint(m, g, b, t):
+        if t > min(m.T):
+            return m.ygbt[g,b,t] <= m.ygbt[g,b,t-1] + m.alpha_gbt[g,b,t]
+        return Constraint.Skip
+    m.ub_constraint = Constraint(m.G, m.B, m.T, rule=ub_constraint)
+
+    def ub1_constraint(m, g, b):
+        t0 = min(m.T)
+        return m.ygbt[g,b,t0] <= m.alpha_gbt[g,b,t0]
+    m.ub1_constraint = Constraint(m.G, m.B, rule=ub1_constraint)
+
+    # -------------------------------------------------
+    # 13) No‐solapamiento de alphas
+    # -------------------------------------------------
+    K_int = int(value(m.K))
+    if exclusividad == "cliques":
+        # Una fila por ventana de K períodos cubre todos los pares t < r < t + K
+        t_max = max(m.T)
+        ventanas = [t for t in m.T if t <= max(t_max - K_int + 1, min(m.T))]
+
+        def alpha_ventana(m, g, b, t):
+            return sum(m.alpha_gbt[g,b,r] for r in m.T if t <= r < t + K_int) <= 1
+        m.alpha_nosolapa = Constraint(m.G, m.B, ventanas, rule=alpha_ventana)
+    else:
+        m.alpha_nosolapa = ConstraintList()
+        if exclusividad == "completa":
             for g in m.G:
                 for b in m.B:
                     for t in m.T:
@@ -293,32 +414,268 @@ def ejecutar_instancias_camila(semanas, turnos, participacion, base_instancias,
                                 m.alpha_nosolapa.add(
                                     m.alpha_gbt[g,b,t] <= 1 - m.alpha_gbt[g,b,r]
                                 )
-            
-            # -------------------------
-            # Solver
-            # -------------------------
-            solver = SolverFactory('gurobi')
-            solver.options.update({
-                'LogToConsole': 1,
-                'LogFile':      os.path.join(out_dir, f'gurobi_{turno}.log'),
-                'TimeLimit':    15
-            })
-
-            res = solver.solve(m, tee=False, load_solutions=False)
-            if res.solver.termination_condition in (TerminationCondition.infeasible,):
-                logger.error("Infactible, escribiendo IIS…")
-                write_iis(m, os.path.join(out_dir, f"IIS_{semana}_{turno}.ilp"), solver="gurobi")
-
-            solver.solve(m, tee=False)
-            # guardar
-            df = []
-            for v in m.component_objects(Var, active=True):
-                for idx in v:
-                    val = v[idx].value
-                    if val:
-                        df.append({'var': v.name, 'idx': idx, 'val': val})
-            pd.DataFrame(df).to_excel(
-                os.path.join(out_dir, f"resultados_{semana}_{participacion}_T{turno}.xlsx"),
-                index=False
+
+    # -------------------------------------------------
+    # 14) Ruptura de simetría entre grúas (opcional)
+    # -------------------------------------------------
+    # Las grúas no tienen parámetros propios, así que cualquier permutación de
+    # una solución es otra solución con el mismo objetivo. Se ordenan las grúas
+    # consecutivas por una clave no creciente:
+    #   uso: turnos activos de la grúa
+    #   lex: patrón de bloques Z_gb leído como número binario y, a igual
+    #        patrón, turnos activos (uso <= |T| por one_block)
+    if simetria != "ninguna":
+        gruas = list(m.G)
+        bloques = list(m.B)
+        n_t = len(m.T)
+
+        def clave(g):
+            uso = sum(m.ygbt[g,b,t] for b in m.B for t in m.T)
+            if simetria == "uso":
+                return uso
+            patron = sum(2**(len(bloques)-1-i) * m.Z_gb[g,b] for i, b in enumerate(bloques))
+            return (n_t + 1) * patron + uso
+
+        def orden_gruas(m, i):
+            return clave(gruas[i]) >= clave(gruas[i+1])
+        m.simetria = Constraint(range(len(gruas) - 1), rule=orden_gruas)
+    return m
+
+
+def separar_exclusividad(m):
+    """Agrega a excl / alpha_nosolapa las filas que viola la solución cargada y las retorna.
+
+    Con exclusividad perezosa, toda solución entera que no viola ninguna es
+    factible para el modelo completo: basta revisar los pares de bloques usados
+    por cada grúa y los inicios consecutivos en cada bloque.
+    """
+    K_int = int(value(m.K))
+    periodos = sorted(m.T)
+    nuevas = []
+    for g in m.G:
+        usados = [b for b in m.B if (m.Z_gb[g,b].value or 0) > 0.5]
+        for i, b1 in enumerate(usados):
+            for b2 in usados[i+1:]:
+                if value(m.ex[b1,b2]) < 2:
+                    nuevas.append(m.excl.add(m.Z_gb[g,b1] + m.Z_gb[g,b2] <= m.ex[b1,b2]))
+        for b in m.B:
+            inicios = [t for t in periodos if (m.alpha_gbt[g,b,t].value or 0) > 0.5]
+            for t, r in zip(inicios, inicios[1:]):
+                if r < t + K_int:
+                    nuevas.append(m.alpha_nosolapa.add(m.alpha_gbt[g,b,t] <= 1 - m.alpha_gbt[g,b,r]))
+    return nuevas
+
+
+def callback_exclusividad(m, siguiente=None):
+    """Callback de gurobi_persistent que separa las filas perezosas en cada incumbente.
+
+    Requiere LazyConstraints=1. `siguiente` es otro callback que se sigue
+    llamando (p.ej. el de cancelación).
+    """
+    from gurobipy import GRB
+
+    variables = [m.Z_gb[g,b] for g in m.G for b in m.B] + [m.alpha_gbt[idx] for idx in m.alpha_gbt]
+
+    def callback(cb_m, cb_opt, cb_where):
+        if siguiente is not None:
+            siguiente(cb_m, cb_opt, cb_where)
+        if cb_where == GRB.Callback.MIPSOL:
+            cb_opt.cbGetSolution(variables)
+            for fila in separar_exclusividad(m):
+                cb_opt.cbLazy(fila)
+    return callback
+
+
+def extraer_resultado(m, semana, turno, participacion, estado, tiempo_resolucion, gap=None):
+    """Arma el ResultadoGruas a partir de los valores cargados en el modelo"""
+    asignaciones = []
+    for g in m.G:
+        for b in m.B:
+            for t in m.T:
+                activa = round(m.ygbt[g,b,t].value or 0) == 1
+                inicio = round(m.alpha_gbt[g,b,t].value or 0) == 1
+                if activa or inicio:
+                    asignaciones.append(AsignacionGrua(g, b, int(t), activa, inicio))
+    min_diff = m.min_diff_val.value
+    return ResultadoGruas(
+        semana=semana,
+        turno=int(turno),
+        participacion=participacion,
+        estado=estado,
+        min_diff_val=float(min_diff) if min_diff is not None else None,
+        tiempo_resolucion=tiempo_resolucion,
+        gap=gap,
+        asignaciones=asignaciones
+    )
+
+
+def _resolver_completo(datos, opciones, simetria, inventario, heuristica, exclusividad, out_dir, semana, turno,
+                       cronometro):
+    """Resuelve el modelo completo; retorna (modelo, estado, gap, segundos)"""
+    plan = None
+    if heuristica != "ninguna":
+        # Import diferido: heuristica_gruas importa este módulo
+        from heuristica_gruas import construir_plan, cargar_plan
+        plan = construir_plan(datos, SEGUNDOS_HEURISTICA)
+        cronometro.marcar("heuristica")
+
+    m = construir_modelo_gruas(datos, simetria, inventario, exclusividad)
+    if plan is not None and heuristica == "arranque":
+        cargar_plan(m, plan, simetria)
+    callback = cancelacion.callback_gurobi
+    if exclusividad == "perezosa":
+        opciones = {**opciones, 'LazyConstraints': 1}
+        callback = callback_exclusividad(m, siguiente=callback)
+
+    # -------------------------
+    # Solver
+    # -------------------------
+    # Con Gurobi, interfaz persistente (gurobipy en proceso) para poder
+    # interrumpir la optimización desde un callback cuando se cancela el trabajo.
+    log = os.path.join(out_dir, f'gurobi_{turno}.log')
+    if portafolio.PORTAFOLIO:
+        # Carrera de configuraciones: cada proceso reconstruye el modelo y arma su callback
+        fabrica_callback = None
+        if exclusividad == "perezosa":
+            fabrica_callback = partial(callback_exclusividad, siguiente=cancelacion.callback_gurobi)
+        resolutor = portafolio.Resolutor(
+            m, partial(construir_modelo_gruas, datos, simetria, inventario, exclusividad), opciones, log=log,
+            fabrica_callback=fabrica_callback, familia="gruas"
+        )
+    else:
+        resolutor = solvers.Resolutor(m, opciones, log=log, callback=callback)
+    cronometro.marcar("construccion")
+
+    inicio = time.perf_counter()
+    res = resolutor.resolver(arranque=plan is not None and heuristica == "arranque")
+    tiempo_resolucion = time.perf_counter() - inicio
+    cronometro.marcar("resolucion")
+    terminacion = res.solver.termination_condition
+    estado = ESTADOS_TERMINACION.get(terminacion, str(terminacion))
+    gap = progreso.gap_mip(res, maximizar=True)
+    hay_solucion = resolutor.hay_solucion(res)
+
+    if cancelacion.solicitada():
+        # Interrumpida: se conserva la mejor solución encontrada, si la hay
+        logger.warning("Turno %s cancelado tras %.1fs", turno, tiempo_resolucion)
+        estado = 'cancelado'
+        if hay_solucion:
+            resolutor.cargar_solucion(res)
+    elif terminacion in (TerminationCondition.infeasible,):
+        logger.error("Infactible, escribiendo IIS…")
+        resolutor.escribir_iis(os.path.join(out_dir, f"IIS_{semana}_{turno}.ilp"))
+    elif hay_solucion:
+        resolutor.cargar_solucion(res)
+    else:
+        estado = 'sin_solucion'
+
+    # Sin incumbente, o con una peor que la heurística (p.ej. por TimeLimit): se usa el plan
+    if plan is not None and estado in ('sin_solucion', 'limite_tiempo'):
+        if not hay_solucion or (m.min_diff_val.value or 0) < plan.min_diff_val:
+            logger.warning("Turno %s: se usa el plan de la heurística (min_diff_val %s)", turno, plan.min_diff_val)
+            cargar_plan(m, plan, simetria)
+            estado = 'heuristica'
+    if plan is not None:
+        metricas.contar("optimizacion_heuristica_total", resultado="plan" if estado == 'heuristica' else "solver")
+    return m, estado, gap, tiempo_resolucion
+
+
+def resolver_turno(semana, turno, participacion, base_instancias, base_resultados, forzar=False,
+                   tiempo_limite=None, simetria=None, modo=None, inventario=None, heuristica=None,
+                   exclusividad=None):
+    """Resuelve un turno y devuelve su ResultadoGruas (además guarda el Excel de variables)"""
+    simetria = simetria or SIMETRIA
+    inventario = inventario or INVENTARIO
+    modo = modo or MODO
+    heuristica = heuristica or HEURISTICA
+    exclusividad = exclusividad or EXCLUSIVIDAD
+    if modo not in MODOS_GRUAS:
+        raise ValueError(f"Modo de resolución desconocido: {modo}. Disponibles: {list(MODOS_GRUAS)}")
+    if heuristica not in MODOS_HEURISTICA:
+        raise ValueError(f"Modo de heurística desconocido: {heuristica}. Disponibles: {list(MODOS_HEURISTICA)}")
+    if exclusividad not in MODOS_EXCLUSIVIDAD:
+        raise ValueError(f"Modo de exclusividad desconocido: {exclusividad}. "
+                         f"Disponibles: {list(MODOS_EXCLUSIVIDAD)}")
+    if exclusividad == "perezosa" and solvers.BACKEND != "gurobi":
+        logger.warning("Exclusividad perezosa requiere callbacks de Gurobi; con %s se usa cliques", solvers.BACKEND)
+        exclusividad = "cliques"
+    opciones = perfiles_solver.opciones_solver("gruas", OPCIONES_SOLVER, solvers.BACKEND)
+    if tiempo_limite is not None:
+        opciones['TimeLimit'] = tiempo_limite
+    out_dir = os.path.join(base_resultados, f"resultados_turno_{semana}")
+    os.makedirs(out_dir, exist_ok=True)
+    archivo_resultados = os.path.join(out_dir, f"resultados_{semana}_{participacion}_T{turno}.xlsx")
+
+    logger.info(f"--- INICIANDO TURNO {turno} / SEMANA {semana} ---")
+    datos = pd.read_excel(
+        os.path.join(base_instancias,f"instancias_turno_{semana}",
+                     f"Instancia_{semana}_{participacion}_T{turno}.xlsx"),
+        sheet_name=None
+    )
+
+    cache = CacheResultados("gruas")
+    huella = huella_instancia(datos, VERSION_MODELO, opciones, backend=solvers.BACKEND, simetria=simetria,
+                              modo=modo, inventario=inventario, heuristica=heuristica, exclusividad=exclusividad,
+                              segundos_heuristica=SEGUNDOS_HEURISTICA, portafolio=portafolio.PORTAFOLIO,
+                              semana=semana, turno=turno, participacion=participacion)
+    entrada = None if forzar else cache.obtener(huella)
+    if entrada is not None:
+        logger.info("Turno %s: resultado en cache (%s), se omite la resolución", turno, entrada["resultado"]["estado"])
+        metricas.contar("optimizacion_cache_total", modelo="gruas", resultado="acierto")
+        metricas.contar("optimizacion_turnos_procesados_total")
+        return ResultadoGruas.desde_dict(entrada["resultado"])
+    metricas.contar("optimizacion_cache_total", modelo="gruas", resultado="fallo")
+
+    cronometro = metricas.Cronometro("gruas")
+    solucion = None
+    if modo == "dos_fases":
+        # Import diferido: modelo_gruas_agregado importa este módulo
+        from modelo_gruas_agregado import resolver_dos_fases
+        solucion = resolver_dos_fases(datos, opciones, log=os.path.join(out_dir, f'gurobi_{turno}.log'),
+                                      cronometro=cronometro, inventario=inventario)
+        if solucion is None:
+            logger.warning("Turno %s: se resuelve con el modelo completo", turno)
+    if solucion is None:
+        solucion = _resolver_completo(datos, opciones, simetria, inventario, heuristica, exclusividad, out_dir,
+                                      semana, turno, cronometro)
+    m, estado, gap, tiempo_resolucion = solucion
+    metricas.contar("optimizacion_estado_solver_total", modelo="gruas", estado=estado)
+
+    # guardar
+    cronometro.reiniciar()
+    df = []
+    for v in m.component_objects(Var, active=True):
+        for idx in v:
+            val = v[idx].value
+            if val:
+                df.append({'var': v.name, 'idx': idx, 'val': val})
+    pd.DataFrame(df).to_excel(archivo_resultados, index=False)
+    cronometro.marcar("escritura_excel")
+    logger.info("Turno %s completado.", turno)
+    resultado = extraer_resultado(m, semana, turno, participacion, estado, tiempo_resolucion, gap)
+    cronometro.marcar("extraccion")
+    metricas.contar("optimizacion_turnos_procesados_total")
+    if estado not in ESTADOS_NO_CACHEABLES:
+        cache.guardar(huella, {"resultado": asdict(resultado), "archivos": [archivo_resultados]})
+    return resultado
+
+
+def ejecutar_instancias_camila(semanas, turnos, participacion, base_instancias, base_resultados, forzar=False):
+    """Resuelve todos los turnos de cada semana y devuelve la lista de ResultadoGruas"""
+    resultados = []
+    total = len(semanas) * len(turnos)
+    for semana in semanas:
+        for turno in turnos:
+            if cancelacion.solicitada():
+                return resultados
+            # Contexto de los eventos gap_mip que emite el callback durante la resolución
+            with progreso.contexto(etapa="gruas", semana=semana, turno=int(turno)):
+                resultado = resolver_turno(semana, turno, participacion, base_instancias, base_resultados, forzar)
+            resultados.append(resultado)
+            progreso.emitir(
+                "turno_resuelto", etapa="gruas", semana=semana, turno=resultado.turno,
+                estado=resultado.estado, min_diff_val=resultado.min_diff_val, gap=resultado.gap,
+                tiempo_resolucion=resultado.tiempo_resolucion,
+                indice=len(resultados), total=total
             )
-            logger.info("Turno %s completado.", turno)
+    return resultados
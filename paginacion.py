@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import json
+import base64
+
+# Recursos expuestos como historial paginado. 'clave' define el orden y el
+# cursor (keyset); 'semana' indica si la columna es DATE o número de semana ISO.
+HISTORIAL = {
+    'coloracion': {
+        'tabla': 'optimization_coloracion_results',
+        'columnas': ['id', 'semana', 'participacion', 'criterio', 'distancia_total',
+                     'distancia_load', 'distancia_dlvr', 'movimientos_dlvr',
+                     'movimientos_load', 'estado', 'created_at'],
+        'clave': ['semana', 'id'],
+        'semana': 'fecha',
+        'turno': False,
+    },
+    'gruas': {
+        'tabla': 'optimization_gruas_results',
+        'columnas': ['id', 'semana', 'turno', 'participacion', 'min_diff_val',
+                     'gruas_utilizadas', 'bloques_activos', 'tiempo_resolucion',
+                     'estado', 'created_at'],
+        'clave': ['semana', 'turno', 'id'],
+        'semana': 'fecha',
+        'turno': True,
+    },
+    'semanas': {
+        'tabla': 'optimization_semanas_procesadas',
+        'columnas': ['id', 'semana', 'participacion', 'coloracion_factible',
+                     'gruas_procesado', 'fecha_procesamiento'],
+        'clave': ['semana', 'id'],
+        'semana': 'fecha',
+        'turno': False,
+    },
+    'magdalena_runs': {
+        'tabla': 'magdalena_runs',
+        'columnas': ['id', 'semana', 'participacion', 'con_dispersion', 'total_movimientos',
+                     'total_bloques', 'total_segregaciones', 'periodos', 'fecha_carga'],
+        'clave': ['semana', 'id'],
+        'semana': 'iso',
+        'turno': False,
+    },
+    'camila_runs': {
+        'tabla': 'camila_runs',
+        'columnas': ['semana', 'turno', 'participacion', 'min_diff_val',
+                     'gruas_utilizadas', 'fecha_carga'],
+        'clave': ['semana', 'turno', 'participacion'],
+        'semana': 'iso',
+        'turno': True,
+    },
+}
+
+
+def codificar_cursor(valores):
+    """Codifica los valores de la clave de la última fila como cursor opaco"""
+    crudo = json.dumps(list(valores), default=str).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Decodifica un cursor generado por codificar_cursor"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except Exception:
+        raise ValueError("Cursor inválido")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Perfiles de opciones del solver sintonizados por familia de modelo y backend.
+# benchmarks/sintonizar_perfiles.py los genera y verifica que no hayan empeorado
+ARCHIVO = os.getenv("PERFILES_SOLVER_ARCHIVO", os.path.join(BASE_DIR, "perfiles_solver.json"))
+
+# Subir al cambiar la estructura del archivo
+VERSION_FORMATO = 1
+
+# sintonizado: el perfil del archivo se agrega a las opciones del modelo; ninguno: solo las del modelo
+MODOS_PERFIL = ("sintonizado", "ninguno")
+PERFIL = os.getenv("PERFIL_SOLVER", "sintonizado")
+
+_cache = {}
+# (familia, backend) sin perfil ya avisados
+_sin_perfil = set()
+
+
+def cargar(ruta=None):
+    """Contenido del archivo de perfiles ({"version_formato", "familias"}); vacío si no existe"""
+    ruta = ruta or ARCHIVO
+    try:
+        marca = os.path.getmtime(ruta)
+    except OSError:
+        return {"version_formato": VERSION_FORMATO, "familias": {}}
+    if ruta not in _cache or _cache[ruta][0] != marca:
+        with open(ruta, encoding="utf-8") as f:
+            contenido = json.load(f)
+        if contenido.get("version_formato") != VERSION_FORMATO:
+            raise ValueError(f"{ruta} tiene formato {contenido.get('version_formato')}; "
+                             f"se esperaba {VERSION_FORMATO}")
+        _cache[ruta] = (marca, contenido)
+    return _cache[ruta][1]
+
+
+def guardar(contenido, ruta=None):
+    ruta = ruta or ARCHIVO
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(contenido, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    _cache.pop(ruta, None)
+
+
+def perfil(familia, backend):
+    """Entrada sintonizada de la familia para el backend (opciones, versión y métricas), o None.
+
+    Unas opciones vacías son un resultado de la sintonización: ningún candidato
+    mejoró al perfil por defecto.
+    """
+    return cargar()["familias"].get(familia, {}).get(backend)
+
+
+def opciones_solver(familia, opciones, backend, modo=None):
+    """Opciones del modelo con el perfil sintonizado de su familia encima (si hay y el modo lo pide)"""
+    modo = modo or PERFIL
+    if modo not in MODOS_PERFIL:
+        raise ValueError(f"Modo de perfil de solver desconocido: {modo}. Disponibles: {list(MODOS_PERFIL)}")
+    opciones = dict(opciones)
+    if modo == "ninguno":
+        return opciones
+    entrada = perfil(familia, backend)
+    if entrada is None:
+        if (familia, backend) not in _sin_perfil:
+            _sin_perfil.add((familia, backend))
+            logger.warning("Sin perfil de solver sintonizado para %s/%s en %s; se usan las opciones del modelo",
+                           familia, backend, ARCHIVO)
+        return opciones
+    logger.info("Perfil de solver %s/%s v%s: %s", familia, backend, entrada["version"], entrada["opciones"])
+    opciones.update(entrada["opciones"])
+    return opciones
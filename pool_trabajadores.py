@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import os
+import sys
+import shutil
+import logging
+import importlib
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTADOS_DIR = os.path.join(BASE_DIR, "resultados_generados")
+ESTATICOS_DIR = os.path.join(BASE_DIR, "archivos_estaticos")
+LOGS_DIR = os.path.join(RESULTADOS_DIR, "logs")
+BARRIDOS_DIR = os.path.join(RESULTADOS_DIR, "barridos")
+
+# Módulos que cada trabajador importa una sola vez al arrancar
+MODULOS_PRECARGA = [
+    "pandas",
+    "pyomo.environ",
+    "instancias_coloracion",
+    "instancias_gruas",
+    "modelo_coloracion",
+    "modelo_gruas_maxmin",
+    "main_integrated",
+]
+
+
+def _inicializar_trabajador(cola_eventos=None, publicar_progreso=True):
+    """Inicializador de cada proceso: precarga módulos pesados y el entorno de Gurobi"""
+    os.chdir(BASE_DIR)
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    if cola_eventos is not None:
+        import progreso
+        import metricas
+        metricas.configurar(cola_eventos.put)
+        if publicar_progreso:
+            progreso.configurar(cola_eventos.put)
+    for modulo in MODULOS_PRECARGA:
+        try:
+            importlib.import_module(modulo)
+        except Exception as e:
+            logger.warning(f"No se pudo precargar {modulo}: {e}")
+
+    import solvers
+    if solvers.BACKEND == "gurobi":
+        import entorno_gurobi
+        entorno_gurobi.calentar()
+
+
+def _calentar():
+    return os.getpid()
+
+
+@contextlib.contextmanager
+def _capturar_salida(archivo_log):
+    """Redirige stdout/stderr y el logging del trabajo al archivo de log"""
+    os.makedirs(os.path.dirname(archivo_log), exist_ok=True)
+    with open(archivo_log, "a", encoding="utf-8", buffering=1) as f:
+        handler = logging.StreamHandler(f)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s"))
+        raiz = logging.getLogger()
+        raiz.addHandler(handler)
+        try:
+            with contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+                yield
+        finally:
+            raiz.removeHandler(handler)
+
+
+def _ejecutar_trabajo(id_tarea, ruta_cola, funcion):
+    """Corre `funcion()` con la salida en el log del trabajo, sus eventos y su cancelación"""
+    import progreso
+    import cancelacion
+    from cola_trabajos import ColaTrabajos
+
+    # La cancelación se lee de la misma cola SQLite en la que la pide la API
+    cola = ColaTrabajos(ruta=ruta_cola)
+    with _capturar_salida(ruta_log(id_tarea)), progreso.contexto(id_tarea=id_tarea), \
+            cancelacion.contexto(lambda: cola.cancelacion_solicitada(id_tarea)):
+        try:
+            return funcion()
+        except Exception as e:
+            progreso.emitir("pipeline_error", error=str(e))
+            raise
+
+
+def ejecutar_pipeline_en_trabajador(id_tarea, parametros, ruta_cola=None):
+    """Tarea del pool: corre main_integrated.ejecutar_pipeline con la salida en su log"""
+    from main_integrated import conectar_db, ejecutar_pipeline
+
+    resumen = _ejecutar_trabajo(id_tarea, ruta_cola, lambda: ejecutar_pipeline(
+        anio=parametros["anio"],
+        participacion=parametros["participacion"],
+        criterio=parametros.get("criterio", "criterioII"),
+        semanas=parametros.get("semanas"),
+        db=conectar_db(parametros.get("usar_db", False)),
+        forzar=parametros.get("forzar", False)
+    ))
+    # Archivos que dejó este trabajo, leídos al terminar (otro trabajo puede escribir después)
+    resumen["artefactos"] = artefactos_trabajo(parametros["participacion"], resumen["semanas_filtradas"])
+    return resumen
+
+
+def ejecutar_barrido_en_trabajador(id_tarea, parametros, ruta_cola=None):
+    """Tarea del pool: corre main_integrated.ejecutar_barrido con la salida en su log"""
+    from main_integrated import conectar_db, ejecutar_barrido
+
+    artefactos = []
+
+    def guardar_combinacion(criterio, participacion, resumen_combinacion):
+        # La siguiente combinación reescribe los mismos archivos: se copian ahora
+        # a una carpeta propia del trabajo y de la combinación
+        carpeta = f"{criterio}_{participacion}"
+        for nombre, ruta in artefactos_trabajo(participacion, resumen_combinacion["semanas_filtradas"]):
+            copia = os.path.join(BARRIDOS_DIR, id_tarea, carpeta, nombre)
+            os.makedirs(os.path.dirname(copia), exist_ok=True)
+            shutil.copy2(ruta, copia)
+            artefactos.append((f"{carpeta}/{nombre}", copia))
+
+    resumen = _ejecutar_trabajo(id_tarea, ruta_cola, lambda: ejecutar_barrido(
+        anio=parametros["anio"],
+        participaciones=parametros["participaciones"],
+        criterios=parametros["criterios"],
+        semanas=parametros.get("semanas"),
+        db=conectar_db(parametros.get("usar_db", False)),
+        forzar=parametros.get("forzar", False),
+        al_terminar_combinacion=guardar_combinacion
+    ))
+    resumen["artefactos"] = artefactos
+    return resumen
+
+
+def resolver_turno_en_trabajador(semana, turno, participacion, tiempo_limite=None, forzar=False):
+    """Tarea interactiva: resuelve un único turno de grúas y devuelve su plan"""
+    from modelo_gruas_maxmin import resolver_turno
+
+    base_instancias = os.path.join(RESULTADOS_DIR, "instancias_camila")
+    instancia = os.path.join(base_instancias, f"instancias_turno_{semana}",
+                             f"Instancia_{semana}_{participacion}_T{turno}.xlsx")
+    if not os.path.exists(instancia):
+        raise FileNotFoundError(f"No existe la instancia del turno {turno} de la semana {semana} "
+                                f"(participación {participacion}); ejecute antes la semana")
+    resultado = resolver_turno(
+        semana, turno, participacion, base_instancias,
+        os.path.join(RESULTADOS_DIR, "resultados_camila"),
+        forzar=forzar, tiempo_limite=tiempo_limite
+    )
+    return resultado.to_dict()
+
+
+def resolver_semana_en_trabajador(semana, participacion, criterio="criterioII", anio=None,
+                                  tiempo_limite=None, forzar=False):
+    """Tarea interactiva: genera (si hace falta) y resuelve la coloración de una semana"""
+    from datetime import date
+    from main_integrated import generar_semanas_iso
+    from instancias_coloracion import generar_instancias_coloracion
+    from modelo_coloracion import ejecutar_instancias_coloracion, leer_plan_semana
+
+    anio = anio or date.fromisoformat(semana).isocalendar()[0]
+    instancia = os.path.join(RESULTADOS_DIR, "instancias_magdalena", semana,
+                             f"Instancia_{semana}_{participacion}_K.xlsx")
+    if forzar or not os.path.exists(instancia):
+        generar_instancias_coloracion([semana], criterio, anio, participacion, RESULTADOS_DIR,
+                                      ESTATICOS_DIR, todas_semanas=generar_semanas_iso(anio))
+
+    _, infactibles = ejecutar_instancias_coloracion(
+        [semana], participacion, RESULTADOS_DIR, forzar=forzar, tiempo_limite=tiempo_limite
+    )
+    plan = None if infactibles else leer_plan_semana(semana, participacion, RESULTADOS_DIR)
+    if infactibles:
+        estado = "infactible"
+    elif plan is None:
+        estado = "sin_resultado"
+    else:
+        estado = "factible"
+    return {"semana": semana, "participacion": participacion, "criterio": criterio,
+            "estado": estado, **(plan or {})}
+
+
+def artefactos_trabajo(participacion, semanas):
+    """Archivos de resultados de las semanas de un trabajo: [(nombre relativo, ruta absoluta)]"""
+    artefactos = []
+    for semana in semanas:
+        candidatos = [
+            os.path.join("resultados_magdalena", semana, f"resultado_{semana}_{participacion}_K.xlsx"),
+            os.path.join("resultados_magdalena", semana, f"Distancias_Modelo_{semana}_{participacion}.xlsx"),
+        ]
+        carpeta_gruas = os.path.join("resultados_camila", f"resultados_turno_{semana}")
+        try:
+            candidatos.extend(
+                os.path.join(carpeta_gruas, nombre)
+                for nombre in sorted(os.listdir(os.path.join(RESULTADOS_DIR, carpeta_gruas)))
+                if nombre.startswith(f"resultados_{semana}_{participacion}_T")
+            )
+        except FileNotFoundError:
+            pass
+        for nombre in candidatos:
+            ruta = os.path.join(RESULTADOS_DIR, nombre)
+            if os.path.isfile(ruta):
+                artefactos.append((nombre.replace(os.sep, "/"), ruta))
+    return artefactos
+
+
+def ruta_log(id_tarea):
+    return os.path.join(LOGS_DIR, f"{id_tarea}.log")
+
+
+def eliminar_log(id_tarea):
+    try:
+        os.remove(ruta_log(id_tarea))
+    except FileNotFoundError:
+        pass
+
+
+def eliminar_artefactos(id_tarea):
+    """Borra las copias de resultados de un barrido (no existen para los demás trabajos)"""
+    shutil.rmtree(os.path.join(BARRIDOS_DIR, id_tarea), ignore_errors=True)
+
+
+class PoolTrabajadores:
+    """Pool de procesos de larga vida con pandas/pyomo/gurobipy ya importados"""
+
+    def __init__(self, max_trabajadores=None, publicar_eventos=True):
+        self.max_trabajadores = max_trabajadores or int(os.getenv("POOL_TRABAJADORES", "2"))
+        self.publicar_eventos = publicar_eventos
+        self._executor = None
+        self.eventos = None
+
+    def iniciar(self):
+        if self._executor is not None:
+            return
+        contexto = multiprocessing.get_context("spawn")
+        # Cola por la que los trabajadores publican sus métricas y, si corresponde,
+        # sus eventos de progreso
+        self.eventos = contexto.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_trabajadores,
+            mp_context=contexto,
+            initializer=_inicializar_trabajador,
+            initargs=(self.eventos, self.publicar_eventos)
+        )
+        # Forzar el arranque de todos los procesos ahora y no en el primer trabajo
+        pids = {f.result() for f in [self._executor.submit(_calentar) for _ in range(self.max_trabajadores)]}
+        logger.info(f"Pool de trabajadores iniciado ({len(pids)} procesos)")
+
+    def enviar(self, funcion, *args, **kwargs):
+        """Envía una llamada estructurada al pool y devuelve su Future"""
+        if self._executor is None:
+            self.iniciar()
+        return self._executor.submit(funcion, *args, **kwargs)
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
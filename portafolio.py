@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from pyomo.environ import Var, Objective, maximize, value
+from pyomo.opt import SolverResults, TerminationCondition
+
+import cancelacion
+import metricas
+import solvers
+
+logger = logging.getLogger(__name__)
+
+# Configuraciones que compiten en el portafolio, con nombres de Gurobi: cada
+# backend traduce las que entiende (en HiGHS, Heuristics y Seed).
+# minmax es el perfil fijado a mano en modelo_camila_minmax.py
+PERFILES = {
+    "base": {},
+    "factibilidad": {"MIPFocus": 1, "Heuristics": 0.2},
+    "cota": {"MIPFocus": 2, "Cuts": 2},
+    "minmax": {"MIPFocus": 2, "Heuristics": 1, "Cuts": 3},
+    "semilla": {"Seed": 7},
+}
+
+# Carrera de configuraciones (PORTAFOLIO_SOLVER=base,factibilidad,...; vacío = una sola resolución)
+PORTAFOLIO = [p.strip() for p in os.getenv("PORTAFOLIO_SOLVER", "").split(",") if p.strip()]
+# Gap relativo con el que una configuración gana la carrera (vacío = el MIPGap del modelo)
+GAP_OBJETIVO = float(os.getenv("PORTAFOLIO_GAP")) if os.getenv("PORTAFOLIO_GAP") else None
+# Núcleos que se reparten entre las configuraciones (0 = todos los disponibles)
+NUCLEOS = int(os.getenv("PORTAFOLIO_NUCLEOS", "0"))
+
+# Segundos que se espera a que las perdedoras se detengan antes de terminar sus procesos
+ESPERA_CANCELACION = 2.0
+
+# Terminaciones que cierran la carrera: la configuración llegó al gap o probó infactibilidad
+TERMINACIONES_GANADORAS = {TerminationCondition.optimal, TerminationCondition.infeasible}
+
+
+def nucleos_disponibles():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def configuraciones(opciones, perfiles, backend, gap=None, nucleos=None):
+    """Opciones de cada perfil del portafolio, con los núcleos repartidos.
+
+    Se omiten los perfiles que, traducidos al backend, quedan iguales a uno
+    anterior (p.ej. cota y base en HiGHS): correrían la misma resolución. Con
+    menos núcleos que perfiles se corren solo los primeros.
+    """
+    desconocidos = [p for p in perfiles if p not in PERFILES]
+    if desconocidos:
+        raise ValueError(f"Perfiles de portafolio desconocidos: {desconocidos}. Disponibles: {list(PERFILES)}")
+    nucleos = nucleos or NUCLEOS or nucleos_disponibles()
+    configs, vistas = {}, {}
+    for perfil in perfiles:
+        config = {**opciones, **PERFILES[perfil]}
+        if gap is not None:
+            config["MIPGap"] = gap
+        traducidas = tuple(sorted(solvers.traducir_opciones(backend, config).items()))
+        if traducidas in vistas:
+            logger.info("Perfil %s equivale a %s con %s; se omite", perfil, vistas[traducidas], backend)
+            continue
+        vistas[traducidas] = perfil
+        configs[perfil] = config
+    if len(configs) > nucleos:
+        # Más procesos que núcleos solo se reparten el mismo tiempo de CPU
+        logger.warning("Portafolio de %d configuraciones con %d núcleos; se usan %s",
+                       len(configs), nucleos, list(configs)[:nucleos])
+        configs = dict(list(configs.items())[:nucleos])
+    for config in configs.values():
+        config["Threads"] = max(1, nucleos // len(configs))
+        config["LogToConsole"] = 0
+    return configs
+
+
+def _log_perfil(log, perfil):
+    if log is None:
+        return None
+    base, extension = os.path.splitext(log)
+    return f"{base}_{perfil}{extension}"
+
+
+def _cota(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+# Procesos de la carrera, persistentes entre semanas y turnos: se crean (con el
+# mismo inicializador que el pool de trabajadores) la primera vez y solo se
+# reemplazan si hacen falta más, o si hubo que terminar a una perdedora
+_pool = None
+_pool_tamano = 0
+_detener = None
+_candado = threading.Lock()
+# Evento de detención visto desde cada proceso de la carrera
+_detener_corredor = None
+
+
+def _inicializar_corredor(detener):
+    global _detener_corredor
+    _detener_corredor = detener
+    from pool_trabajadores import _inicializar_trabajador
+    _inicializar_trabajador()
+
+
+def _obtener_pool(tamano):
+    """Pool de la carrera con al menos `tamano` procesos"""
+    global _pool, _pool_tamano, _detener
+    if _pool is None or _pool_tamano < tamano:
+        _cerrar_pool()
+        contexto = multiprocessing.get_context("spawn")
+        _detener = contexto.Event()
+        _pool = ProcessPoolExecutor(max_workers=tamano, mp_context=contexto,
+                                    initializer=_inicializar_corredor, initargs=(_detener,))
+        _pool_tamano = tamano
+        # Arrancar todos los procesos ahora y no dentro del tiempo de la carrera
+        pids = {f.result() for f in [_pool.submit(os.getpid) for _ in range(tamano)]}
+        logger.info("Pool del portafolio iniciado (%d procesos)", len(pids))
+    return _pool
+
+
+def calentar(procesos):
+    """Deja listos `procesos` procesos de la carrera (p.ej. al iniciar un trabajador)"""
+    with _candado:
+        _obtener_pool(procesos)
+
+
+def _cerrar_pool(terminar=False):
+    """Cierra el pool de la carrera; terminar=True mata los procesos que sigan resolviendo"""
+    global _pool, _pool_tamano
+    if _pool is None:
+        return
+    if terminar:
+        # HiGHS no tiene callback: una perdedora solo se detiene terminando su proceso
+        for proceso in list((_pool._processes or {}).values()):
+            proceso.terminate()
+    _pool.shutdown(wait=terminar, cancel_futures=True)
+    _pool, _pool_tamano = None, 0
+
+
+def _correr(perfil, construir, fabrica_callback, opciones, backend, log, valores_iniciales, inicio):
+    """Una configuración: reconstruye el modelo, lo resuelve y retorna el resultado.
+
+    El TimeLimit se cuenta desde `inicio` (time.time() al lanzar la carrera),
+    descontando la espera y la reconstrucción del modelo.
+    """
+    inicio_perfil = time.perf_counter()
+    try:
+        modelo = construir()
+        variables = list(modelo.component_data_objects(Var))
+        if valores_iniciales is not None:
+            for v, valor in zip(variables, valores_iniciales):
+                v.set_value(valor, skip_validation=True)
+        if opciones.get("TimeLimit") is not None:
+            opciones = {**opciones, "TimeLimit": max(1.0, opciones["TimeLimit"] - (time.time() - inicio))}
+        if backend == "highs":
+            # HiGHS fija los hilos del proceso en su primera resolución; el proceso
+            # se reutiliza entre carreras con otro reparto de núcleos
+            import highspy
+            highspy.Highs.resetGlobalScheduler(True)
+        callback = fabrica_callback(modelo) if fabrica_callback else cancelacion.callback_gurobi
+        resolutor = solvers.Resolutor(modelo, opciones, backend=backend, log=log, callback=callback)
+        # Con Gurobi, el callback detiene a la configuración cuando otra ya ganó
+        with cancelacion.contexto(_detener_corredor.is_set):
+            res = resolutor.resolver(arranque=valores_iniciales is not None)
+        valores = objetivo = None
+        if resolutor.hay_solucion(res):
+            resolutor.cargar_solucion(res)
+            valores = [v.value for v in variables]
+            objetivo = value(next(modelo.component_data_objects(Objective, active=True)))
+        return {
+            "perfil": perfil,
+            "terminacion": res.solver.termination_condition,
+            "inferior": _cota(res.problem.lower_bound),
+            "superior": _cota(res.problem.upper_bound),
+            "objetivo": objetivo,
+            "valores": valores,
+            "segundos": time.perf_counter() - inicio_perfil,
+        }
+    except Exception as e:
+        return {"perfil": perfil, "error": f"{type(e).__name__}: {e}", "segundos": time.perf_counter() - inicio_perfil}
+
+
+class Resolutor:
+    """Carrera de configuraciones del solver sobre un mismo modelo, con la interfaz de solvers.Resolutor.
+
+    Cada perfil corre en un proceso persistente (spawn, inicializado como el
+    pool de trabajadores) con su parte de los núcleos; el modelo no se puede
+    serializar, así que cada proceso lo reconstruye con `construir()` (una
+    función importable, p.ej. un functools.partial). Gana la primera
+    configuración que llega al gap objetivo (o prueba infactibilidad); las demás
+    se cancelan por callback con Gurobi, y con HiGHS se terminan sus procesos
+    (el pool se vuelve a crear en la siguiente carrera). Si ninguna llega antes
+    del TimeLimit, se queda la mejor incumbente. `fabrica_callback(modelo)` arma
+    el callback de Gurobi de cada proceso (por defecto, el de cancelación).
+    """
+
+    def __init__(self, modelo, construir, opciones, perfiles=None, backend=None, log=None,
+                 fabrica_callback=None, familia="modelo", gap=None, nucleos=None):
+        self.modelo = modelo
+        self.construir = construir
+        self.backend = backend or solvers.BACKEND
+        if self.backend not in solvers.BACKENDS:
+            raise ValueError(f"Backend de solver desconocido: {self.backend}. Disponibles: {list(solvers.BACKENDS)}")
+        self.opciones = dict(opciones)
+        self.configs = configuraciones(self.opciones, perfiles or PORTAFOLIO, self.backend,
+                                       gap if gap is not None else GAP_OBJETIVO, nucleos)
+        self.log = log
+        self.fabrica_callback = fabrica_callback
+        self.familia = familia
+        self.ganador = None
+        self.resultados = []
+        self._valores = None
+
+    @property
+    def soporta_iis(self):
+        return solvers.BACKENDS[self.backend]["iis"]
+
+    def resolver(self, tee=False, cargar=False, arranque=False):
+        """Corre la carrera y retorna resultados de Pyomo con la terminación y cotas de la elegida.
+
+        tee no aplica: cada configuración escribe su propio log (<log>_<perfil>).
+        """
+        variables = list(self.modelo.component_data_objects(Var))
+        iniciales = [v.value for v in variables] if arranque else None
+        with _candado:
+            self._carrera(iniciales)
+
+        elegido = self._elegir()
+        self._registrar(elegido)
+        res = SolverResults()
+        if elegido is None:
+            if not cancelacion.solicitada():
+                errores = "; ".join(f"{r['perfil']}: {r['error']}" for r in self.resultados)
+                raise RuntimeError(f"Ninguna configuración del portafolio terminó ({errores or 'sin resultados'})")
+            res.solver.termination_condition = TerminationCondition.userInterrupt
+            return res
+        res.solver.termination_condition = elegido["terminacion"]
+        res.problem.lower_bound = elegido["inferior"]
+        res.problem.upper_bound = elegido["superior"]
+        self._valores = elegido["valores"]
+        if cargar and self._valores is not None:
+            self.cargar_solucion(res)
+        return res
+
+    def _carrera(self, iniciales):
+        pool = _obtener_pool(len(self.configs))
+        _detener.clear()
+        inicio = time.time()
+        pendientes = {}
+        for perfil, opciones in self.configs.items():
+            futuro = pool.submit(_correr, perfil, self.construir, self.fabrica_callback, opciones, self.backend,
+                                 _log_perfil(self.log, perfil), iniciales, inicio)
+            pendientes[futuro] = perfil
+
+        self.ganador, self.resultados, self._valores = None, [], None
+        while pendientes and self.ganador is None and not cancelacion.solicitada():
+            hechos, _ = wait(pendientes, timeout=cancelacion.INTERVALO_VERIFICACION, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                perfil = pendientes.pop(futuro)
+                try:
+                    resultado = futuro.result()
+                except BrokenProcessPool as e:
+                    # Un proceso murió sin publicar (p.ej. sin memoria)
+                    resultado = {"perfil": perfil, "error": f"proceso terminado ({e})", "segundos": None}
+                self.resultados.append(resultado)
+                if "error" in resultado:
+                    logger.error("Portafolio: la configuración %s falló: %s", perfil, resultado["error"])
+                elif resultado["terminacion"] in TERMINACIONES_GANADORAS and self.ganador is None:
+                    self.ganador = perfil
+
+        _detener.set()
+        _, sin_terminar = wait(pendientes, timeout=ESPERA_CANCELACION)
+        if sin_terminar or pool._broken:
+            logger.info("Portafolio: se terminan %d configuraciones que no se detuvieron", len(sin_terminar))
+            _cerrar_pool(terminar=True)
+
+    def _elegir(self):
+        """Resultado de la ganadora o, sin ganadora, el de mejor incumbente"""
+        validos = [r for r in self.resultados if "error" not in r]
+        if self.ganador is not None:
+            return next(r for r in validos if r["perfil"] == self.ganador)
+        con_solucion = [r for r in validos if r["valores"] is not None]
+        if not con_solucion:
+            return validos[0] if validos else None
+        objetivo = next(self.modelo.component_data_objects(Objective, active=True))
+        signo = 1 if objetivo.sense == maximize else -1
+        return max(con_solucion, key=lambda r: signo * r["objetivo"])
+
+    def _registrar(self, elegido):
+        for r in self.resultados:
+            if "error" not in r:
+                logger.info("Portafolio %s: %s terminó %s en %.1fs (objetivo %s)", self.familia, r["perfil"],
+                            r["terminacion"], r["segundos"], r["objetivo"])
+        if elegido is None:
+            return
+        resultado = "ganador" if self.ganador is not None else "mejor_incumbente"
+        logger.info("Portafolio %s: se usa %s (%s, %.1fs)", self.familia, elegido["perfil"], resultado,
+                    elegido["segundos"])
+        metricas.contar("optimizacion_portafolio_total", modelo=self.familia, perfil=elegido["perfil"],
+                        resultado=resultado)
+
+    def hay_solucion(self, resultados):
+        return self._valores is not None
+
+    def cargar_solucion(self, resultados):
+        """Carga en el modelo la solución de la configuración elegida"""
+        variables = list(self.modelo.component_data_objects(Var))
+        if len(variables) != len(self._valores):
+            raise RuntimeError(f"El modelo reconstruido tiene {len(self._valores)} variables y el original "
+                               f"{len(variables)}")
+        for v, valor in zip(variables, self._valores):
+            v.set_value(valor, skip_validation=True)
+
+    def escribir_iis(self, ruta):
+        """Escribe el IIS con una resolución normal en este proceso, si el backend lo permite"""
+        return solvers.Resolutor(self.modelo, self.opciones, backend=self.backend).escribir_iis(ruta)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import os
+import math
+import time
+import queue
+import logging
+import threading
+import contextlib
+from collections import OrderedDict, deque
+
+import metricas
+
+logger = logging.getLogger(__name__)
+
+# Eventos guardados por tarea (ring buffer) y número de tareas recordadas
+MAX_EVENTOS_TAREA = int(os.getenv("MAX_EVENTOS_TAREA", "500"))
+MAX_TAREAS_EVENTOS = int(os.getenv("MAX_TAREAS_EVENTOS", "200"))
+
+# Tramo de progreso (%) que cubre cada etapa del pipeline
+TRAMOS_ETAPA = {
+    "coloracion": (0, 40),
+    "gruas": (40, 100),
+}
+
+# Eventos tras los que ya no llegará nada más para la tarea
+EVENTOS_FINALES = {"pipeline_completado", "pipeline_cancelado", "pipeline_error"}
+
+_destino = None
+_contexto = {}
+
+
+def configurar(destino):
+    """Define la función que recibe cada evento (None para desactivar)"""
+    global _destino
+    _destino = destino
+
+
+@contextlib.contextmanager
+def contexto(**campos):
+    """Agrega campos (p.ej. id_tarea) a todos los eventos emitidos dentro del bloque"""
+    anterior = dict(_contexto)
+    _contexto.update(campos)
+    try:
+        yield
+    finally:
+        _contexto.clear()
+        _contexto.update(anterior)
+
+
+def emitir(tipo, **datos):
+    """Emite un evento de progreso estructurado; sin destino configurado no hace nada"""
+    if _destino is None:
+        return
+    evento = {"tipo": tipo, "ts": time.time(), **_contexto, **datos}
+    try:
+        _destino(evento)
+    except Exception as e:
+        logger.debug(f"No se pudo emitir el evento {tipo}: {e}")
+
+
+def porcentaje(evento):
+    """Progreso global (0-100) implícito en un evento con etapa/indice/total, o None"""
+    tramo = TRAMOS_ETAPA.get(evento.get("etapa"))
+    total = evento.get("total")
+    if tramo is None or not total:
+        return None
+    desde, hasta = tramo
+    avance = desde + (hasta - desde) * min(evento.get("indice", 0), total) / total
+    if evento.get("combinaciones"):
+        # Barrido: cada combinación ocupa una fracción igual del progreso total
+        avance = (evento.get("combinacion", 0) * 100 + avance) / evento["combinaciones"]
+    return int(avance)
+
+
+def gap_relativo(incumbente, cota):
+    """Gap relativo |cota - incumbente| / |incumbente|, o None sin incumbente o sin cota finitos"""
+    # Gurobi informa 1e100 (GRB.INFINITY) mientras no hay incumbente
+    if not all(math.isfinite(v) and abs(v) < 1e100 for v in (incumbente, cota)):
+        return None
+    return abs(cota - incumbente) / max(abs(incumbente), 1e-10)
+
+
+def gap_mip(resultados, maximizar=False):
+    """Gap relativo |cota - incumbente| / |incumbente| a partir de los resultados de Pyomo"""
+    try:
+        inferior = float(resultados.problem.lower_bound)
+        superior = float(resultados.problem.upper_bound)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if maximizar:
+        return gap_relativo(inferior, superior)
+    return gap_relativo(superior, inferior)
+
+
+class BufferEventos:
+    """Últimos eventos de cada tarea en memoria acotada (deque por tarea + LRU de tareas)"""
+
+    def __init__(self, max_eventos=None, max_tareas=None):
+        self.max_eventos = max_eventos or MAX_EVENTOS_TAREA
+        self.max_tareas = max_tareas or MAX_TAREAS_EVENTOS
+        self._tareas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def agregar(self, id_tarea, evento):
+        with self._lock:
+            entrada = self._tareas.get(id_tarea)
+            if entrada is None:
+                entrada = {"secuencia": 0, "eventos": deque(maxlen=self.max_eventos)}
+                self._tareas[id_tarea] = entrada
+                while len(self._tareas) > self.max_tareas:
+                    self._tareas.popitem(last=False)
+            else:
+                self._tareas.move_to_end(id_tarea)
+            entrada["secuencia"] += 1
+            evento = {**evento, "id": entrada["secuencia"]}
+            entrada["eventos"].append(evento)
+            return evento
+
+    def desde(self, id_tarea, ultimo_id=0):
+        """Eventos de la tarea con id mayor que `ultimo_id` (los más antiguos pueden haberse descartado)"""
+        with self._lock:
+            entrada = self._tareas.get(id_tarea)
+            if entrada is None:
+                return []
+            return [e for e in entrada["eventos"] if e["id"] > ultimo_id]
+
+    def eliminar(self, id_tarea):
+        with self._lock:
+            self._tareas.pop(id_tarea, None)
+
+
+class ReceptorEventos:
+    """Hilo que vacía la cola de eventos de los trabajadores hacia el buffer (y las métricas al registro)"""
+
+    def __init__(self, cola_eventos, buffer, al_recibir=None):
+        self.cola_eventos = cola_eventos
+        self.buffer = buffer
+        self.al_recibir = al_recibir
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="receptor-eventos", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                evento = self.cola_eventos.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if evento.get("tipo") == "_metrica":
+                try:
+                    metricas.registro.aplicar(evento)
+                except Exception as e:
+                    logger.debug(f"Métrica inválida recibida: {e}")
+                continue
+            id_tarea = evento.get("id_tarea")
+            if id_tarea is None:
+                continue
+            evento = self.buffer.agregar(id_tarea, evento)
+            if self.al_recibir is not None:
+                try:
+                    self.al_recibir(evento)
+                except Exception as e:
+                    logger.error(f"Error procesando evento de la tarea {id_tarea}: {e}")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import json
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+
+@dataclass
+class AsignacionGrua:
+    """Estado de una grúa en un bloque y hora del turno"""
+    grua: str
+    bloque: str
+    hora: int
+    activa: bool
+    inicio: bool
+
+
+@dataclass
+class ResultadoGruas:
+    """Resultado estructurado de la resolución de un turno del modelo de grúas"""
+    semana: str
+    turno: int
+    participacion: int
+    estado: str
+    min_diff_val: Optional[float]
+    tiempo_resolucion: float
+    gap: Optional[float] = None
+    asignaciones: List[AsignacionGrua] = field(default_factory=list)
+
+    @property
+    def gruas_utilizadas(self) -> int:
+        return len({a.grua for a in self.asignaciones if a.activa})
+
+    @property
+    def bloques_activos(self) -> int:
+        return len({a.bloque for a in self.asignaciones if a.activa})
+
+    def resumen(self) -> dict:
+        """Fila agregada para optimization_gruas_results"""
+        return {
+            'semana': self.semana,
+            'turno': self.turno,
+            'participacion': self.participacion,
+            'min_diff_val': self.min_diff_val,
+            'gruas_utilizadas': self.gruas_utilizadas,
+            'bloques_activos': self.bloques_activos,
+            'tiempo_resolucion': self.tiempo_resolucion,
+            'estado': self.estado,
+            'detalles': json.dumps({
+                'horas_grua': sum(1 for a in self.asignaciones if a.activa),
+                'inicios': sum(1 for a in self.asignaciones if a.inicio),
+                'gap': self.gap,
+            })
+        }
+
+    def filas_plan(self) -> List[dict]:
+        """Filas normalizadas (grúa, bloque, hora) para optimization_gruas_plan"""
+        return [asdict(a) for a in self.asignaciones]
+
+    def to_dict(self) -> dict:
+        datos = self.resumen()
+        datos['detalles'] = json.loads(datos['detalles'])
+        datos['plan'] = self.filas_plan()
+        return datos
+
+    @classmethod
+    def desde_dict(cls, datos: dict) -> 'ResultadoGruas':
+        """Reconstruye el resultado a partir de asdict() (p.ej. desde la cache)"""
+        datos = dict(datos)
+        datos['asignaciones'] = [AsignacionGrua(**a) for a in datos.get('asignaciones', [])]
+        return cls(**datos)
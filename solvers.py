@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import os
+import logging
+
+from pyomo.environ import SolverFactory
+from pyomo.contrib.iis import write_iis
+
+import entorno_gurobi
+
+logger = logging.getLogger(__name__)
+
+# Backend por defecto (SOLVER_BACKEND=gurobi|highs|cbc)
+BACKEND = os.getenv("SOLVER_BACKEND", "gurobi")
+
+# Los perfiles de opciones de los modelos usan los nombres de Gurobi; cada
+# backend traduce los que entiende y descarta el resto.
+BACKENDS = {
+    "gurobi": {
+        "fabrica": "gurobi_persistent",
+        "opciones": None,  # sin traducción
+        "log": "LogFile",
+        "iis": True,
+    },
+    "highs": {
+        "fabrica": "appsi_highs",
+        "opciones": {
+            "TimeLimit": "time_limit",
+            "MIPGap": "mip_rel_gap",
+            "FeasibilityTol": "primal_feasibility_tolerance",
+            "OptimalityTol": "dual_feasibility_tolerance",
+            "IntFeasTol": "mip_feasibility_tolerance",
+            "Threads": "threads",
+            "Heuristics": "mip_heuristic_effort",
+            "Seed": "random_seed",
+        },
+        "log": "log_file",
+        "iis": False,
+    },
+    "cbc": {
+        "fabrica": "cbc",
+        "opciones": {
+            "TimeLimit": "sec",
+            "MIPGap": "ratio",
+            "FeasibilityTol": "primalTolerance",
+            "OptimalityTol": "dualTolerance",
+            "IntFeasTol": "integerTolerance",
+            "Threads": "threads",
+        },
+        "log": None,  # se pasa como logfile a solve()
+        "iis": False,
+    },
+}
+
+
+def backends_disponibles():
+    """Backends cuyo solver está instalado (y con licencia, en el caso de Gurobi)"""
+    disponibles = []
+    for nombre, config in BACKENDS.items():
+        try:
+            if SolverFactory(config["fabrica"]).available(exception_flag=False):
+                disponibles.append(nombre)
+        except Exception:
+            pass
+    return disponibles
+
+
+def traducir_opciones(backend, opciones):
+    """Opciones de un perfil (nombres de Gurobi) con los nombres del backend"""
+    traduccion = BACKENDS[backend]["opciones"]
+    if traduccion is None:
+        return dict(opciones)
+    traducidas = {}
+    for nombre, valor in opciones.items():
+        if nombre in traduccion:
+            traducidas[traduccion[nombre]] = valor
+        else:
+            logger.debug(f"Opción {nombre} sin equivalente en {backend}; se omite")
+    return traducidas
+
+
+class Resolutor:
+    """Resolución de un modelo Pyomo con el backend elegido y una interfaz común.
+
+    Con Gurobi se usa la interfaz persistente (admite callback, p.ej. para
+    cancelar); con HiGHS y CBC el callback se ignora y la cancelación solo se
+    atiende entre resoluciones.
+
+    Los Resolutor de Gurobi de un mismo proceso comparten el solver persistente:
+    solo el último creado puede resolver o cargar su solución.
+    """
+
+    def __init__(self, modelo, opciones, backend=None, log=None, callback=None):
+        self.modelo = modelo
+        self.backend = backend or BACKEND
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Backend de solver desconocido: {self.backend}. Disponibles: {list(BACKENDS)}")
+        config = BACKENDS[self.backend]
+        if self.backend == "gurobi":
+            # Un único solver persistente (y gurobipy.Env) por proceso; set_instance
+            # libera el modelo de Gurobi de la resolución anterior
+            self.solver = entorno_gurobi.solver_persistente()
+            self.solver.options.clear()
+        else:
+            self.solver = SolverFactory(config["fabrica"])
+        self._logfile = None
+
+        opciones = traducir_opciones(self.backend, opciones)
+        if log is not None:
+            if config["log"]:
+                opciones[config["log"]] = log
+            else:
+                self._logfile = log
+
+        if self.backend == "gurobi":
+            self.solver.set_instance(modelo)
+            self.solver.set_callback(callback)
+        self.solver.options.update(opciones)
+
+    @property
+    def soporta_iis(self):
+        return BACKENDS[self.backend]["iis"]
+
+    def resolver(self, tee=False, cargar=False, arranque=False):
+        """Resuelve y retorna los resultados de Pyomo; con cargar=True deja la solución en el modelo.
+
+        Con arranque=True los valores cargados en las variables se entregan
+        como solución inicial (MIP start); los tres backends lo admiten.
+        """
+        if self.backend == "gurobi":
+            return self.solver.solve(tee=tee, load_solutions=cargar, save_results=False, warmstart=arranque)
+        return self.solver.solve(self.modelo, tee=tee, load_solutions=cargar, logfile=self._logfile,
+                                 warmstart=arranque)
+
+    def hay_solucion(self, resultados):
+        if self.backend == "gurobi":
+            return (resultados.problem.number_of_solutions or 0) > 0
+        return len(resultados.solution) > 0
+
+    def cargar_solucion(self, resultados):
+        """Carga en el modelo la mejor solución de una resolución hecha con cargar=False"""
+        if self.backend == "gurobi":
+            self.solver.load_vars()
+        else:
+            self.modelo.solutions.load_from(resultados)
+
+    def escribir_iis(self, ruta):
+        """Escribe el IIS del modelo infactible si el backend lo permite. Retorna True si se escribió"""
+        if not self.soporta_iis:
+            logger.warning(f"El backend {self.backend} no calcula IIS; no se escribe {ruta}")
+            return False
+        write_iis(self.modelo, ruta, solver=self.backend)
+        return True